@@ -0,0 +1,44 @@
+"""
+Compare the ports per second of the scan engines.
+
+By default the closed ports of the loopback interface are scanned, which answer
+immediately, so the numbers measure the per probe overhead of each engine rather
+than the network.
+
+    python benchmarks/bench_engines.py --ports 20000 --limit 500
+"""
+import argparse
+import time
+
+from os import sys, path
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+from pyportscanner import pyscanner
+
+
+def bench(engine, host, ports, limit, timeout):
+    scanner = pyscanner.PortScanner(ports, thread_limit=limit, timeout=timeout, engine=engine)
+    start_time = time.perf_counter()
+    output = scanner.scan(host)
+    elapsed = time.perf_counter() - start_time
+    return len(output), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--ports', type=int, default=20000, help='scan ports 1 to PORTS')
+    parser.add_argument('--limit', type=int, default=500, help='probes in flight')
+    parser.add_argument('--timeout', type=int, default=1)
+    parser.add_argument('--engines', nargs='+', default=list(pyscanner.ENGINES))
+    args = parser.parse_args()
+
+    ports = list(range(1, args.ports + 1))
+    print('{:>10} {:>10} {:>10} {:>14}'.format('engine', 'ports', 'seconds', 'ports/second'))
+    for engine in args.engines:
+        scanned, elapsed = bench(engine, args.host, ports, args.limit, args.timeout)
+        print('{:>10} {:>10} {:>10.3f} {:>14.0f}'.format(engine, scanned, elapsed, scanned / elapsed))
+
+
+if __name__ == '__main__':
+    main()
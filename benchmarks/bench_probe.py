@@ -0,0 +1,78 @@
+"""
+Measure the CPU time spent per probe by the setup work of a connect probe.
+
+The legacy setup is the work every probe used to repeat before ProbeContext: resolve the
+platform, encode the message, and open and close a UDP socket to send the alert message.
+The prepared setup shares one ProbeContext between all probes. Both run full connects to
+closed ports of the loopback interface, which answer immediately.
+
+    python benchmarks/bench_probe.py --probes 20000 --message hello
+"""
+import argparse
+import platform
+import socket
+import time
+
+from os import sys, path
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+from pyportscanner.probe import ProbeContext
+
+
+def legacy_probe(ip, port, message):
+    if platform.system() == 'Windows':
+        reuse_opt = socket.SO_REUSEADDR
+    else:
+        reuse_opt = socket.SO_REUSEPORT
+    TCP_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    TCP_sock.setsockopt(socket.SOL_SOCKET, reuse_opt, 1)
+    TCP_sock.settimeout(1)
+    b_message = message.encode('utf-8', errors='replace')
+    UDP_sock = None
+    try:
+        if message:
+            UDP_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            UDP_sock.sendto(b_message, (ip, port))
+        return TCP_sock.connect_ex((ip, port))
+    finally:
+        if UDP_sock:
+            UDP_sock.close()
+        TCP_sock.close()
+
+
+def prepared_probe(ip, port, context):
+    TCP_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    TCP_sock.setsockopt(socket.SOL_SOCKET, context.reuse_option, 1)
+    TCP_sock.settimeout(1)
+    try:
+        context.notify((ip, port))
+        return TCP_sock.connect_ex((ip, port))
+    finally:
+        TCP_sock.close()
+
+
+def bench(probe, argument, host, ports):
+    start_time = time.process_time()
+    for port in ports:
+        probe(host, port, argument)
+    return (time.process_time() - start_time) / len(ports)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--probes', type=int, default=20000)
+    parser.add_argument('--message', default='hello')
+    args = parser.parse_args()
+
+    ports = [1 + port % 1000 for port in range(args.probes)]
+    legacy = bench(legacy_probe, args.message, args.host, ports)
+    with ProbeContext(args.message) as context:
+        prepared = bench(prepared_probe, context, args.host, ports)
+    print('{:>10} {:>18}'.format('setup', 'CPU us/probe'))
+    print('{:>10} {:>18.2f}'.format('legacy', legacy * 1e6))
+    print('{:>10} {:>18.2f}'.format('prepared', prepared * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""
+Report how the throughput of ShardedScanner scales with the number of worker processes.
+
+By default the closed ports of a few loopback addresses are scanned, which answer
+immediately, so the numbers show the CPU bound part of the scan.
+
+    python benchmarks/bench_shards.py --hosts 127.0.0.1-4 --ports 10000 --workers 1 2 4
+"""
+import argparse
+
+from os import sys, path
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+from pyportscanner.shardscanner import ShardedScanner
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hosts', default='127.0.0.1-4')
+    parser.add_argument('--ports', type=int, default=10000, help='scan ports 1 to PORTS')
+    parser.add_argument('--limit', type=int, default=500, help='probes in flight per worker')
+    parser.add_argument('--timeout', type=int, default=1)
+    parser.add_argument('--engine', default='selector')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    args = parser.parse_args()
+
+    ports = list(range(1, args.ports + 1))
+    print('{:>8} {:>10} {:>10} {:>14} {:>8}'.format('workers', 'probes', 'seconds', 'probes/second', 'speedup'))
+    baseline = None
+    for workers in args.workers:
+        scanner = ShardedScanner(ports, args.limit, args.timeout, args.engine, workers=workers)
+        for _ in scanner.scan_many_iter(args.hosts):
+            pass
+        stats = scanner.stats
+        baseline = baseline or stats['probes_per_second']
+        print('{:>8} {:>10} {:>10.3f} {:>14.0f} {:>7.2f}x'.format(
+            workers, stats['probes'], stats['seconds'], stats['probes_per_second'],
+            stats['probes_per_second'] / baseline))
+
+
+if __name__ == '__main__':
+    main()
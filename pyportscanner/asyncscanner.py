@@ -0,0 +1,284 @@
+import asyncio
+import errno
+import socket
+import time
+from socket import error as socket_error
+
+from pyportscanner.concurrency import EXHAUSTED
+from pyportscanner.probe import ProbeContext
+from pyportscanner.pyscanner import _MAX_STALLED, _MIN_TIMEOUT, _STALL_DELAY, PortScanner
+from pyportscanner.result import ScanResult
+
+
+class AsyncPortScanner(PortScanner):
+    """
+    An asyncio flavour of PortScanner.
+
+    Instead of giving every port a thread, each probe is a non-blocking connect issued on the
+    running event loop, so a single thread can keep up to thread_limit probes in flight.
+    The results are the same {port: status} dicts returned by PortScanner.scan().
+    """
+    def __init__(self, target_ports=None, thread_limit=5000, timeout=10, verbose=False, engine='thread',
+                 resolver=None, timing=None, retry=None, rate=None, discovery=True,
+                 schedule=None, checkpoint=None, resume=False, sink=None, protocol=None):
+        """
+        Constructor of an AsyncPortScanner object. The arguments are the same as the ones of
+        PortScanner, except that thread_limit is the maximum number of probes in flight on the
+        event loop rather than a number of threads. The coroutines only probe with TCP connects,
+        in order, without journal nor sink, so engine must be 'thread', protocol 'tcp', and
+        schedule, checkpoint and sink None.
+        """
+        unsupported = [name for name, value in (('engine', engine != 'thread'), ('schedule', schedule is not None),
+                                                ('checkpoint', checkpoint is not None), ('sink', sink is not None),
+                                                ('protocol', protocol not in (None, 'tcp'))) if value]
+        if unsupported:
+            raise ValueError('Invalid {}. AsyncPortScanner does not support them'.format(', '.join(unsupported)))
+        super().__init__(target_ports, thread_limit, timeout, verbose, engine=engine, resolver=resolver,
+                         timing=timing, retry=retry, rate=rate, discovery=discovery, schedule=schedule,
+                         checkpoint=checkpoint, resume=resume, sink=sink, protocol=protocol)
+        if self.protocol != 'tcp':
+            raise ValueError('Invalid protocol {}. AsyncPortScanner only supports \'tcp\''.format(self.protocol))
+
+    async def scan(self, objective, message='', deadline=None):
+        """
+        Coroutine version of PortScanner.scan().
+
+        :param objective: the objective that is going to be scanned. Could be a host name or an IPv4 address.
+        :param message: the message that is going to be included in the scanning packets
+        in order to prevent ethical problem (default: '').
+        :param deadline: optional time budget of the scan in seconds, see PortScanner.scan().
+        :return: a ScanResult containing the scan results for a given host in the form of
+        {port_number: status}
+        :rtype: ScanResult
+        """
+        deadline = self._deadline(deadline)
+        loop = asyncio.get_running_loop()
+        # name resolution is blocking, keep it off the event loop
+        server_ip = await loop.run_in_executor(None, self._resolve, objective)
+        if server_ip is None:
+            return ScanResult()
+
+        start_time = time.time()
+        output = await self._scan_ports(server_ip, message, deadline)
+        stop_time = time.time()
+
+        if self.verbose:
+            print('Target {} scanned in  {} seconds'.format(objective, stop_time - start_time))
+            print('Scan completed!\n')
+
+        return output
+
+    async def scan_iter(self, objective, message='', deadline=None):
+        """
+        Async generator version of PortScanner.scan_iter().
+
+        :param objective: the objective that is going to be scanned. Could be a host name or an IPv4 address.
+        :param message: the message that is going to be included in the scanning packets
+        in order to prevent ethical problem (default: '').
+        :param deadline: optional time budget of the scan in seconds, see PortScanner.scan().
+        :return: async generator of (port, status, latency) tuples in completion order.
+        """
+        deadline = self._deadline(deadline)
+        loop = asyncio.get_running_loop()
+        server_ip = await loop.run_in_executor(None, self._resolve, objective)
+        if server_ip is None:
+            return
+
+        async for result in self._probe_iter(server_ip, message, deadline):
+            yield result
+
+    async def _scan_ports(self, ip, message, deadline=None):
+        """
+        Probe all target ports of ip and collect the results.
+
+        :param ip: the ip address that is being scanned
+        :type ip: str
+        :param message: the message that is going to be included in the scanning packets,
+        in order to prevent ethical problem, default to ''.
+        :type message: str
+        :param deadline: optional time.monotonic() time at which the scan stops.
+        :return: a ScanResult that stores result in {port, status} style pairs.
+        status can be 'OPEN', 'CLOSE' or 'FILTERED'.
+        """
+        output = ScanResult()
+        if not deadline:
+            output.fill(self.targets)
+
+        async for port, status, latency in self._probe_iter(ip, message, deadline):
+            output.set(port, status, latency)
+
+        if deadline:
+            output.complete = len(output) == len(self.targets)
+
+        if self.verbose:
+            self._report(output)
+
+        return output
+
+    async def _probe_iter(self, ip, message, deadline=None):
+        """
+        Probe all target ports of ip with at most thread_limit connects in flight, then probe
+        the filtered ones again as configured by the retry policy. With a deadline, the ports
+        are probed by frequency rank and no round is started after it.
+
+        :return: async generator of (port, status, latency) tuples in completion order.
+        """
+        retries = self.retry.retries if self.retry else 0
+
+        if deadline:
+            ports = [port for _, port in self._ranked_jobs([ip])]
+        else:
+            ports = self.targets
+        with ProbeContext(message) as context:
+            for attempt in range(retries + 1):
+                filtered = []
+                async for port, status, latency in self._probe_round(ip, ports, context, deadline):
+                    if status == 'FILTERED' and attempt < retries:
+                        filtered.append((port, status, latency))
+                    else:
+                        yield port, status, latency
+                if not filtered:
+                    return
+                delay = self.retry.delay(attempt + 1)
+                if deadline and time.monotonic() + delay >= deadline:
+                    break
+                await asyncio.sleep(delay)
+                ports = [result[0] for result in filtered]
+            for result in filtered:
+                yield result
+
+    async def _probe_round(self, ip, targets, context, deadline=None):
+        """
+        Probe every port of targets once. Probes failing for lack of sockets are sent again
+        once the concurrency window backed off.
+
+        :param deadline: optional time.monotonic() time at which the probes still pending are
+        cancelled and the generator stops.
+        :return: async generator of (port, status, latency) tuples in completion order.
+        """
+        loop = asyncio.get_running_loop()
+
+        # A fixed set of workers pulling from one shared iterator keeps the number of pending
+        # coroutines bounded by thread_limit instead of by the number of ports. The bounded
+        # queue stops the workers when the consumer does not keep up, and the window stops
+        # them when the process runs out of sockets.
+        ports = iter(targets)
+        completed = asyncio.Queue(maxsize=self.thread_limit)
+        window = self._window()
+        slots = asyncio.Condition()
+        # number of probes deferred in a row while none was in flight
+        stalled = 0
+
+        async def probe(port):
+            nonlocal stalled
+            while True:
+                async with slots:
+                    await slots.wait_for(window.available)
+                    window.acquire()
+                start_time = loop.time()
+                port, status = await self._TCP_connect(ip, port, context, deadline)
+                latency = loop.time() - start_time
+                async with slots:
+                    window.release(latency if status in ('OPEN', 'CLOSE') else None, exhausted=status is None)
+                    slots.notify_all()
+                if status is not None:
+                    return port, status, latency
+                # out of sockets, send the probe again once others completed
+                if window.in_flight:
+                    stalled = 0
+                    continue
+                stalled += 1
+                if stalled > _MAX_STALLED:
+                    raise OSError(errno.EMFILE, 'Out of sockets with no probe in flight')
+                # no probe in flight will release a socket, give the rest of the system some time
+                await asyncio.sleep(_STALL_DELAY * stalled)
+
+        async def worker():
+            for port in ports:
+                if self.rate:
+                    wait = self.rate.reserve(ip)
+                    if wait:
+                        await asyncio.sleep(wait)
+                result = await probe(port)
+                if self.rate:
+                    self.rate.record(ip, result[1])
+                await completed.put(result)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(min(self.thread_limit, len(targets)))]
+        finished = asyncio.ensure_future(asyncio.gather(*workers))
+        try:
+            while not (finished.done() and completed.empty()):
+                getter = asyncio.ensure_future(completed.get())
+                timeout = max(0, deadline - time.monotonic()) if deadline else None
+                await asyncio.wait([getter, finished], timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if getter.done():
+                    yield getter.result()
+                else:
+                    getter.cancel()
+                    if deadline and time.monotonic() >= deadline:
+                        return
+            # surface errors raised by the workers
+            await finished
+        finally:
+            for task in workers:
+                task.cancel()
+            finished.cancel()
+
+    async def _TCP_connect(self, ip, port_number, context, deadline=None):
+        """
+        Perform status checking for a given port on a given ip address using a non-blocking
+        TCP handshake.
+
+        :param ip: the ip address that is being scanned
+        :type ip: str
+        :param port_number: the port that is going to be checked
+        :type port_number: int
+        :param context: the ProbeContext of the scan.
+        :type context: ProbeContext
+        :param deadline: optional time.monotonic() time by which the probe has to end.
+        :return: a tuple of (port_number, status), status being None if the probe failed for lack
+        of sockets, buffers or local ports and has to be sent again.
+        """
+        loop = asyncio.get_running_loop()
+        address = (ip, int(port_number))
+        try:
+            TCP_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        except socket_error as e:
+            if e.errno in EXHAUSTED:
+                return port_number, None
+            raise
+        TCP_sock.setsockopt(socket.SOL_SOCKET, context.reuse_option, 1)
+        TCP_sock.setblocking(False)
+
+        start_time = None
+        try:
+            context.notify(address)
+
+            timeout = self.timing.timeout_for(ip) if self.timing else self.timeout_val
+            if deadline:
+                timeout = max(_MIN_TIMEOUT, min(timeout, deadline - time.monotonic()))
+            start_time = loop.time()
+            await asyncio.wait_for(loop.sock_connect(TCP_sock, address), timeout)
+        except asyncio.TimeoutError:
+            # No reply, the probe or its answer may have been dropped by a firewall.
+            return port_number, 'FILTERED'
+        except socket_error as e:
+            if e.errno in EXHAUSTED:
+                # out of buffers or local ports, not a closed port
+                return port_number, None
+            # Failed to perform a TCP handshake means the port is probably close.
+            # A refused handshake still measures the round trip time of the host.
+            if self.timing and start_time is not None:
+                self.timing.observe(ip, loop.time() - start_time)
+            return port_number, 'CLOSE'
+        else:
+            if self.timing:
+                self.timing.observe(ip, loop.time() - start_time)
+            if context.payload:
+                try:
+                    TCP_sock.send(context.payload)
+                except socket_error:
+                    pass
+            return port_number, 'OPEN'
+        finally:
+            TCP_sock.close()
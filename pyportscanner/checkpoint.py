@@ -0,0 +1,125 @@
+import os
+import socket
+import struct
+import time
+from array import array
+from bisect import bisect_right
+
+from pyportscanner.result import STATUSES
+
+# magic, version
+_header = struct.Struct('<4sH')
+_MAGIC = b'PPSJ'
+_VERSION = 1
+# address, first port, last port, status code of a run of ports sharing the same status
+_record = struct.Struct('<IHHB')
+
+
+class Checkpoint(object):
+    """
+    On-disk journal of the completed probes of a scan, used to resume the scan after a crash.
+
+    Results are buffered and appended to the journal every interval seconds, as runs of
+    consecutive ports of a host sharing the same status, in 9 bytes each. A full range sweep
+    of a host whose ports are mostly closed therefore takes a few records. Loading a journal
+    indexes its runs per host, so that probes already recorded can be skipped.
+    """
+    def __init__(self, path, interval=5.0):
+        """
+        :param path: the path of the journal file.
+        :param interval: the time in seconds between two writes of the buffered results.
+        """
+        self.path = path
+        self.interval = interval
+        # {address: (sorted first ports, last ports, status codes)} of the loaded runs
+        self.__index = dict()
+        self.__buffer = dict()
+        self.__flushed = time.monotonic()
+
+    def __len__(self):
+        """
+        Return the number of loaded runs.
+        """
+        return sum(len(firsts) for firsts, _, _ in self.__index.values())
+
+    def reset(self):
+        """
+        Start a new, empty journal.
+        """
+        self.__index = dict()
+        self.__buffer = dict()
+        with open(self.path, 'wb') as journal:
+            journal.write(_header.pack(_MAGIC, _VERSION))
+
+    def load(self):
+        """
+        Load the runs recorded in the journal, starting a new journal if there is none.
+        A record truncated by a crash is ignored.
+        """
+        try:
+            with open(self.path, 'rb') as journal:
+                data = journal.read()
+        except FileNotFoundError:
+            self.reset()
+            return
+        if len(data) < _header.size or _header.unpack_from(data) != (_MAGIC, _VERSION):
+            raise ValueError('Invalid checkpoint journal {}'.format(self.path))
+
+        runs = dict()
+        end = len(data) - (len(data) - _header.size) % _record.size
+        for address, first, last, code in _record.iter_unpack(data[_header.size:end]):
+            runs.setdefault(address, []).append((first, last, code))
+        self.__index = dict()
+        for address, host_runs in runs.items():
+            host_runs.sort()
+            self.__index[socket.inet_ntoa(struct.pack('!I', address))] = (
+                array('H', (run[0] for run in host_runs)),
+                array('H', (run[1] for run in host_runs)),
+                bytes(run[2] for run in host_runs),
+            )
+
+    def status(self, ip, port):
+        """
+        Return the status recorded for a port of ip, or None if it was not probed.
+        """
+        runs = self.__index.get(ip)
+        if runs is None:
+            return None
+        firsts, lasts, codes = runs
+        i = bisect_right(firsts, port) - 1
+        if i >= 0 and port <= lasts[i]:
+            return STATUSES[codes[i] - 1]
+        return None
+
+    def record(self, ip, port, status):
+        """
+        Buffer the result of a probe, writing the buffer to the journal when the interval elapsed.
+        """
+        self.__buffer.setdefault(ip, []).append((port, STATUSES.index(status) + 1))
+        if time.monotonic() - self.__flushed >= self.interval:
+            self.flush()
+
+    def flush(self):
+        """
+        Append the buffered results to the journal.
+        """
+        self.__flushed = time.monotonic()
+        if not self.__buffer:
+            return
+        records = bytearray()
+        for ip, results in self.__buffer.items():
+            address = struct.unpack('!I', socket.inet_aton(ip))[0]
+            results.sort()
+            first, last, code = results[0][0], results[0][0], results[0][1]
+            for port, port_code in results[1:]:
+                if port == last + 1 and port_code == code:
+                    last = port
+                else:
+                    records += _record.pack(address, first, last, code)
+                    first, last, code = port, port, port_code
+            records += _record.pack(address, first, last, code)
+        with open(self.path, 'ab') as journal:
+            journal.write(records)
+            journal.flush()
+            os.fsync(journal.fileno())
+        self.__buffer = dict()
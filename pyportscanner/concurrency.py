@@ -0,0 +1,135 @@
+import errno
+import threading
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+# errors meaning the process or the system ran out of sockets, rather than a port status
+EXHAUSTED = {errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.EADDRNOTAVAIL}
+
+# file descriptors left to the rest of the process when the limit is derived from RLIMIT_NOFILE
+FD_HEADROOM = 64
+# limit used when the file descriptor limit of the process cannot be read
+DEFAULT_FD_LIMIT = 512
+MAX_LIMIT = 50000
+
+
+def fd_limit(fds_per_probe=1, headroom=FD_HEADROOM):
+    """
+    Return the maximum number of probes that can be in flight without running out of file
+    descriptors, based on the soft RLIMIT_NOFILE limit of the process.
+
+    :param fds_per_probe: number of file descriptors held by a probe.
+    :param headroom: number of file descriptors reserved for the rest of the process.
+    :rtype: int
+    """
+    limit = DEFAULT_FD_LIMIT
+    if resource is not None:
+        soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+        if soft != resource.RLIM_INFINITY:
+            limit = soft
+        else:
+            limit = MAX_LIMIT
+    return max(1, min(MAX_LIMIT, (limit - headroom) // fds_per_probe))
+
+
+class ConcurrencyWindow(object):
+    """
+    Number of probes allowed in flight, adjusted at runtime.
+
+    It is used like a semaphore: acquire() before sending a probe and release() once it is done.
+    Running out of sockets (EMFILE, ENOBUFS...) halves the window, so that the failed probe can
+    be sent again once others completed. A fixed window then grows back by one probe per
+    completion up to max_limit, once the probes sent before the back off drained. If adaptive,
+    the window also starts small and grows by one probe per completion (slow start) until the
+    first congestion signal, then by one probe per window of completions, and shrinks by a
+    quarter when the smoothed latency of the answered probes rises above twice the lowest
+    latency seen, i.e. when probes start queuing.
+    """
+    ALPHA = 1 / 8
+    LATENCY_FACTOR = 2
+    # latency increase in seconds below which jitter is not taken for queuing
+    LATENCY_SLACK = 0.005
+    DECREASE = 0.75
+
+    def __init__(self, max_limit, adaptive=False, initial=100, min_limit=1):
+        """
+        :param max_limit: maximum number of probes in flight.
+        :param adaptive: if True, adjust the window to the measured latency, otherwise only back
+        off when running out of sockets.
+        :param initial: initial number of probes in flight of an adaptive window.
+        :param min_limit: minimum number of probes in flight.
+        """
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.adaptive = adaptive
+        self.limit = min(initial, max_limit) if adaptive else max_limit
+        self.in_flight = 0
+        self.__slow_start = adaptive
+        self.__base_latency = None
+        self.__latency = None
+        self.__completions = 0
+        self.__condition = threading.Condition()
+
+    def available(self):
+        """
+        Return True if a probe can be sent without waiting.
+        """
+        return self.in_flight < int(self.limit)
+
+    def acquire(self, timeout=None):
+        """
+        Wait until a probe can be sent and count it in flight.
+
+        :param timeout: maximum time in seconds to wait, default to no limit.
+        :return: True, or False if the timeout expired first.
+        """
+        with self.__condition:
+            if not self.__condition.wait_for(self.available, timeout):
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self, latency=None, exhausted=False):
+        """
+        Count a probe out of flight and adjust the window.
+
+        :param latency: the time in seconds it took to answer the probe, None if it got no answer.
+        :param exhausted: True if the probe could not be sent for lack of sockets.
+        """
+        with self.__condition:
+            if exhausted:
+                self.__back_off(self.in_flight / 2)
+            elif self.adaptive:
+                if latency is not None:
+                    self.__observe(latency)
+            elif self.in_flight <= self.limit:
+                self.limit = min(self.max_limit, self.limit + 1)
+            self.in_flight -= 1
+            self.__condition.notify_all()
+
+    def __observe(self, latency):
+        if self.__base_latency is None or latency < self.__base_latency:
+            self.__base_latency = latency
+        if self.__latency is None:
+            self.__latency = latency
+        else:
+            self.__latency += self.ALPHA * (latency - self.__latency)
+
+        self.__completions += 1
+        if self.__completions < self.limit and not self.__slow_start:
+            return
+        self.__completions = 0
+        if self.__latency > self.LATENCY_FACTOR * self.__base_latency + self.LATENCY_SLACK:
+            self.__back_off(self.limit * self.DECREASE)
+            # measure again from the new window
+            self.__latency = self.__base_latency
+        else:
+            self.limit = min(self.max_limit, self.limit + 1)
+
+    def __back_off(self, limit):
+        self.__slow_start = False
+        self.limit = max(self.min_limit, min(self.limit, limit))
@@ -0,0 +1,84 @@
+import errno
+import itertools
+
+from pyportscanner.etc.helper import load_port_table
+from pyportscanner.selectorengine import SelectorEngine
+
+# connect results of a handshake refused by the host itself
+REFUSED = {errno.ECONNREFUSED}
+if hasattr(errno, 'WSAECONNREFUSED'):
+    REFUSED.add(errno.WSAECONNREFUSED)
+
+
+def discovery_status(result):
+    """
+    Translate the errno of a discovery handshake to a port status. Only an accepted or refused
+    handshake comes from the host, an unreachable error may come from a router in front of a
+    dead host, so it is reported 'FILTERED' like a timeout.
+    """
+    if result == 0:
+        return 'OPEN'
+    return 'CLOSE' if result in REFUSED else 'FILTERED'
+
+
+class HostDiscovery(object):
+    """
+    Fast host discovery, run before sweeping the ports of many hosts.
+
+    Every host is probed on a few of the most used TCP ports with a short timeout. An accepted or
+    refused connection tells that something is behind the address, while a host whose probes all
+    time out or are unreachable is considered down and is not swept. Hosts are checked concurrently,
+    in batches of batch_size hosts taken lazily from the targets, and the probes left for a host
+    are skipped as soon as it answered one.
+    """
+    def __init__(self, ports=None, timeout=1.0, max_in_flight=1000, batch_size=256):
+        """
+        :param ports: the ports probed on each host, default to the 5 most used TCP ports.
+        :type ports: list
+        :param timeout: the time in seconds a probe is given before it is considered unanswered.
+        :param max_in_flight: maximum number of probes in flight.
+        :param batch_size: number of hosts checked together.
+        """
+        self.ports = ports if ports is not None else load_port_table().top_ports(5, 'tcp')
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+        self.batch_size = batch_size
+
+    def alive(self, ips):
+        """
+        Return the addresses of ips that answered a probe.
+
+        :param ips: iterable of IPv4 addresses.
+        :rtype: set
+        """
+        up = set()
+
+        def jobs():
+            for ip in ips:
+                for port in self.ports:
+                    if ip in up:
+                        break
+                    yield ip, port
+
+        engine = SelectorEngine(self.max_in_flight, self.timeout, classify=discovery_status)
+        for ip, _, status, _ in engine.run(jobs()):
+            if status != 'FILTERED':
+                up.add(ip)
+        return up
+
+    def filter(self, items, key=None):
+        """
+        Generate the items of hosts that answered a probe, in the order of items.
+
+        :param items: iterable of IPv4 addresses, or of items key maps to an IPv4 address.
+        :param key: optional callable(item) returning the address of an item.
+        """
+        items = iter(items)
+        while True:
+            batch = list(itertools.islice(items, self.batch_size))
+            if not batch:
+                return
+            up = self.alive([key(item) if key else item for item in batch])
+            for item in batch:
+                if (key(item) if key else item) in up:
+                    yield item
@@ -1,21 +1,87 @@
+import ipaddress
+import os
 import re
+import struct
+import sys
+import threading
+from array import array
+from collections import namedtuple
 from urllib.parse import urlparse
 import pkg_resources
 
-from pyportscanner.etc.service_port import ServicePort
+from pyportscanner.etc.port_table import PortTable
+
+
+ServiceRecords = namedtuple('ServiceRecords', ['names', 'protos', 'ports', 'proto_idx', 'freqs', 'name_idx'])
+ServiceRecords.__doc__ = """
+Column oriented content of the 'nmap-services.dat' file. The i-th service is made of
+names[name_idx[i]], ports[i], protos[proto_idx[i]] and freqs[i].
+"""
+
+_CACHE_MAGIC = b'PPSV'
+_CACHE_VERSION = 1
+# magic, version, size and mtime of the .dat file, number of services, names blob size, protos blob size
+_cache_header = struct.Struct('<4sHQqIII')
+
+_services_lock = threading.Lock()
+_services = None
+_port_table = None
 
 
 def read_input():
     """
     Read the 'nmap-services.txt' file and store all the information into
     a dict() of {port, ServicePort} pairs for reference later.
+    The returned mapping is a read only view of load_port_table(), shared by the whole process.
+    """
+    return load_port_table().port_map
+
+
+def load_port_table():
+    """
+    Return the PortTable of the 'nmap-services.dat' file.
+    It is built once per process and shared.
+    """
+    global _port_table
+    with _services_lock:
+        if _port_table is None:
+            _port_table = PortTable.from_records(_load_services())
+        return _port_table
+
+
+def load_services():
     """
-    resource_package = __name__
-    resource_path = 'nmap-services.dat'
-    resource = pkg_resources.resource_stream(resource_package, resource_path)
+    Return the ServiceRecords of the 'nmap-services.dat' file.
+    They are loaded once per process and shared.
+    """
+    with _services_lock:
+        return _load_services()
+
+
+def _load_services():
+    global _services
+    if _services is None:
+        dat_path = pkg_resources.resource_filename(__name__, 'nmap-services.dat')
+        stat = os.stat(dat_path)
+        cache_path = os.path.join(_cache_dir(), 'nmap-services-{}.bin'.format(sys.byteorder))
+        records = _read_cache(cache_path, stat)
+        if records is None:
+            with open(dat_path, 'rb') as resource:
+                records = _parse_services(resource)
+            _write_cache(cache_path, stat, records)
+        _services = records
+    return _services
 
-    port_map = dict()
-    line_regex = '([a-zA-Z0-9-]+)\s+(\d+)/(\w+)\s+(\d+\.\d+)\s+(\#.*)'
+
+def _parse_services(resource):
+    """
+    Parse the lines of the 'nmap-services.dat' file into ServiceRecords.
+    """
+    names, name_index = [], dict()
+    protos, proto_index = [], dict()
+    ports, proto_idx, freqs, name_idx = array('H'), array('B'), array('d'), array('I')
+
+    line_regex = r'([a-zA-Z0-9-]+)\s+(\d+)/(\w+)\s+(\d+\.\d+)\s+(\#.*)'
     pattern = re.compile(line_regex)
     for line in resource:
         line = line.decode('utf-8')
@@ -25,17 +91,90 @@ def read_input():
         result = pattern.match(line)
         if result:
             service_name = result.group(1)
-            port_num = int(result.group(2))
             proto = result.group(3)
-            freq = float(result.group(4))
-            service_port = ServicePort(service_name, port_num, proto, freq)
-            if port_num not in port_map:
-                port_map[port_num] = service_port
-            elif port_map[port_num].freq < freq:
-                # only keeps the port and protocol with highest usage frequency
-                port_map[port_num] = service_port
+            if service_name not in name_index:
+                name_index[service_name] = len(names)
+                names.append(service_name)
+            if proto not in proto_index:
+                proto_index[proto] = len(protos)
+                protos.append(proto)
+            ports.append(int(result.group(2)))
+            proto_idx.append(proto_index[proto])
+            freqs.append(float(result.group(4)))
+            name_idx.append(name_index[service_name])
+
+    return ServiceRecords(names, protos, ports, proto_idx, freqs, name_idx)
+
+
+def _cache_dir():
+    """
+    Directory of the precompiled services database, $PYPORTSCANNER_CACHE_DIR if set,
+    otherwise pyportscanner/ under the user cache directory.
+    """
+    if os.environ.get('PYPORTSCANNER_CACHE_DIR'):
+        return os.environ['PYPORTSCANNER_CACHE_DIR']
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'pyportscanner')
+
+
+def _read_cache(cache_path, stat):
+    """
+    Load ServiceRecords from the cache file in a single read.
+    Return None if there is no cache file, or if it was built from another version of the .dat file.
+    """
+    try:
+        with open(cache_path, 'rb') as cache_file:
+            data = cache_file.read()
+    except OSError:
+        return None
+
+    try:
+        magic, version, size, mtime, count, names_len, protos_len = _cache_header.unpack_from(data)
+    except struct.error:
+        return None
+    if (magic, version, size, mtime) != (_CACHE_MAGIC, _CACHE_VERSION, stat.st_size, stat.st_mtime_ns):
+        return None
 
-    return port_map
+    offset = _cache_header.size
+    columns = []
+    for typecode in ('H', 'B', 'd', 'I'):
+        column = array(typecode)
+        end = offset + count * column.itemsize
+        column.frombytes(data[offset:end])
+        columns.append(column)
+        offset = end
+    names = data[offset:offset + names_len].decode('utf-8').split('\n')
+    offset += names_len
+    protos = data[offset:offset + protos_len].decode('utf-8').split('\n')
+    return ServiceRecords(names, protos, *columns)
+
+
+def _write_cache(cache_path, stat, records):
+    """
+    Store ServiceRecords in the cache file. Failures are ignored, the .dat file
+    will simply be parsed again next time.
+    """
+    names = '\n'.join(records.names).encode('utf-8')
+    protos = '\n'.join(records.protos).encode('utf-8')
+    header = _cache_header.pack(
+        _CACHE_MAGIC, _CACHE_VERSION, stat.st_size, stat.st_mtime_ns, len(records.ports), len(names), len(protos)
+    )
+    tmp_path = '{}.{}.tmp'.format(cache_path, os.getpid())
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(tmp_path, 'wb') as cache_file:
+            cache_file.write(header)
+            for column in (records.ports, records.proto_idx, records.freqs, records.name_idx):
+                cache_file.write(column.tobytes())
+            cache_file.write(names)
+            cache_file.write(protos)
+        # readers see either the old file or the complete new one
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
 
 
 def get_domain(url):
@@ -55,3 +194,51 @@ def get_domain(url):
         full_url = url
     parse_result = urlparse(full_url)
     return parse_result.hostname
+
+
+def iter_targets(targets):
+    """
+    Lazily expand scan targets into single hosts.
+    e.g. '10.0.0.0/30' gives '10.0.0.1' and '10.0.0.2', '10.0.0.1-3' and '10.0.0.1-10.0.0.3'
+    give '10.0.0.1', '10.0.0.2' and '10.0.0.3'. Anything else, such as a host name, an url or
+    an IPv4 address, is returned as is.
+    :param targets: a target string, or an iterable of target strings
+    :return: generator of host names and IPv4 addresses
+    """
+    if isinstance(targets, str):
+        targets = [targets]
+    for target in targets:
+        for host in _expand_target(target.strip()):
+            yield host
+
+
+_range_regex = re.compile(r'^(\d+\.\d+\.\d+\.\d+)-(\d+(?:\.\d+\.\d+\.\d+)?)$')
+
+
+def _expand_target(target):
+    """
+    Expand a single CIDR block or IPv4 range, see iter_targets().
+    """
+    result = _range_regex.match(target)
+    if result:
+        first = ipaddress.IPv4Address(result.group(1))
+        last = result.group(2)
+        if '.' not in last:
+            # only the last octet is given
+            last = '{}.{}'.format(result.group(1).rsplit('.', 1)[0], last)
+        last = ipaddress.IPv4Address(last)
+        if last < first:
+            raise ValueError('Invalid range {}. The last address is before the first one'.format(target))
+        return (str(ipaddress.IPv4Address(ip)) for ip in range(int(first), int(last) + 1))
+
+    if '/' in target and '://' not in target:
+        try:
+            network = ipaddress.IPv4Network(target, strict=False)
+        except ValueError:
+            pass
+        else:
+            # /31 and /32 networks have no network and broadcast addresses to skip
+            hosts = network.hosts() if network.prefixlen < 31 else iter(network)
+            return (str(ip) for ip in hosts)
+
+    return iter([target])
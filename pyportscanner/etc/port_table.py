@@ -0,0 +1,192 @@
+from array import array
+from collections.abc import Mapping
+
+from pyportscanner.etc.service_port import ServicePort
+
+
+class PortTable(object):
+    """
+    Column oriented table of the services parsed out from nmap-services.txt file.
+
+    Services are stored in parallel arrays of port, protocol, frequency and service name
+    index, and are ranked once when the table is built, following the ordering of ServicePort:
+    higher frequency first, smaller port number first for the same frequency.
+    Top K lookups are then O(K), and rank, frequency and service lookups are O(1).
+
+    When a port is used by several protocols, the protocol with the highest frequency
+    represents the port, like in the port_map returned by read_input().
+    """
+    def __init__(self, names, protos, ports, proto_idx, freqs, name_idx):
+        """
+        Build a table from the columns of ServiceRecords, see helper.load_services().
+        """
+        self.names = names
+        self.protos = protos
+        self.ports = ports
+        self.proto_idx = proto_idx
+        self.freqs = freqs
+        self.name_idx = name_idx
+
+        order = sorted(range(len(ports)), key=lambda i: (-freqs[i], ports[i]))
+
+        # row representing each port, -1 for unknown ports
+        self.__best_row = array('i', [-1]) * 65536
+        for i, port_num in enumerate(ports):
+            best = self.__best_row[port_num]
+            if best == -1 or freqs[best] < freqs[i]:
+                self.__best_row[port_num] = i
+
+        self.__ranked_ports = array('H', (ports[i] for i in order if self.__best_row[ports[i]] == i))
+        self.__sorted_ports = array('H', sorted(self.__ranked_ports))
+        self.__rank = array('i', [-1]) * 65536
+        for rank, port_num in enumerate(self.__ranked_ports):
+            self.__rank[port_num] = rank
+
+        # per protocol rankings, {proto: ports by rank} and {proto: {port: (rank, row)}}
+        self.__proto_ranked_ports = {proto: array('H') for proto in protos}
+        self.__proto_rank = {proto: dict() for proto in protos}
+        for i in order:
+            proto = protos[proto_idx[i]]
+            ranked_ports = self.__proto_ranked_ports[proto]
+            self.__proto_rank[proto].setdefault(ports[i], (len(ranked_ports), i))
+            ranked_ports.append(ports[i])
+
+        # {service name: rows}
+        self.__name_rows = dict()
+        for i in order:
+            self.__name_rows.setdefault(names[name_idx[i]], []).append(i)
+
+        self.port_map = PortMapView(self)
+
+    @classmethod
+    def from_records(cls, records):
+        """
+        :param records: ServiceRecords, see helper.load_services().
+        """
+        return cls(*records)
+
+    @classmethod
+    def from_port_map(cls, port_map):
+        """
+        Build a table from a dict() of {port, ServicePort} pairs.
+        A PortMapView gives back the table it is a view of.
+        """
+        if isinstance(port_map, PortMapView):
+            return port_map.table
+
+        names, name_index = [], dict()
+        protos, proto_index = [], dict()
+        ports, proto_idx, freqs, name_idx = array('H'), array('B'), array('d'), array('I')
+        for service in port_map.values():
+            name_idx.append(name_index.setdefault(service.service_name, len(names)))
+            if name_idx[-1] == len(names):
+                names.append(service.service_name)
+            proto_idx.append(proto_index.setdefault(service.proto, len(protos)))
+            if proto_idx[-1] == len(protos):
+                protos.append(service.proto)
+            ports.append(service.port_num)
+            freqs.append(service.freq)
+        return cls(names, protos, ports, proto_idx, freqs, name_idx)
+
+    def __len__(self):
+        return len(self.__ranked_ports)
+
+    def __contains__(self, port_num):
+        return 0 <= port_num < 65536 and self.__best_row[port_num] != -1
+
+    def __iter__(self):
+        """
+        Iterate over the known ports in increasing order.
+        """
+        return iter(self.__sorted_ports)
+
+    def top_ports(self, k, proto=None):
+        """
+        Return the top K commonly used ports, by frequency rank.
+
+        :param k: number of ports to be returned.
+        :param proto: only rank the ports of this protocol, e.g. 'tcp' or 'udp'.
+        :return: list of at most K ports, the most used one first.
+        :rtype: list
+        """
+        if proto is None:
+            return self.__ranked_ports[:k].tolist()
+        return self.__proto_ranked_ports.get(proto, array('H'))[:k].tolist()
+
+    def ranked_ports(self, proto=None):
+        """
+        Return the ports by frequency rank, the most used one first.
+
+        :rtype: array
+        """
+        if proto is None:
+            return self.__ranked_ports
+        return self.__proto_ranked_ports.get(proto, array('H'))
+
+    def rank(self, port_num, proto=None):
+        """
+        Return the frequency rank of a port, 0 being the most used port, or None for unknown ports.
+        """
+        if proto is not None:
+            rank_row = self.__proto_rank.get(proto, {}).get(port_num)
+            return rank_row[0] if rank_row else None
+        rank = self.__rank[port_num] if 0 <= port_num < 65536 else -1
+        return rank if rank != -1 else None
+
+    def freq(self, port_num, proto=None):
+        """
+        Return the open frequency of a port, or None for unknown ports.
+        """
+        row = self.__row(port_num, proto)
+        return self.freqs[row] if row is not None else None
+
+    def get(self, port_num, proto=None):
+        """
+        Return the ServicePort of a port, or None for unknown ports.
+        """
+        row = self.__row(port_num, proto)
+        return self.__service(row) if row is not None else None
+
+    def find_service(self, service_name):
+        """
+        Return the ServicePort objects of a service name, the most used one first.
+
+        :rtype: list
+        """
+        return [self.__service(row) for row in self.__name_rows.get(service_name, [])]
+
+    def __row(self, port_num, proto):
+        if proto is not None:
+            rank_row = self.__proto_rank.get(proto, {}).get(port_num)
+            return rank_row[1] if rank_row else None
+        row = self.__best_row[port_num] if 0 <= port_num < 65536 else -1
+        return row if row != -1 else None
+
+    def __service(self, row):
+        return ServicePort(
+            self.names[self.name_idx[row]], self.ports[row], self.protos[self.proto_idx[row]], self.freqs[row]
+        )
+
+
+class PortMapView(Mapping):
+    """
+    Read only {port, ServicePort} view of a PortTable. The ServicePort objects are built
+    on access, ports are iterated in increasing order.
+    """
+    def __init__(self, table):
+        self.table = table
+
+    def __getitem__(self, port_num):
+        service = self.table.get(port_num) if isinstance(port_num, int) else None
+        if service is None:
+            raise KeyError(port_num)
+        return service
+
+    def __contains__(self, port_num):
+        return isinstance(port_num, int) and port_num in self.table
+
+    def __iter__(self):
+        return iter(self.table)
+
+    def __len__(self):
+        return len(self.table)
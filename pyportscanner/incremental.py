@@ -0,0 +1,210 @@
+import os
+import socket
+import struct
+import sys
+import time
+from array import array
+from collections import namedtuple
+
+from pyportscanner.result import ScanResult
+
+# a port whose status changed since the previous run, before being None for a port never seen
+Change = namedtuple('Change', ['host', 'port', 'before', 'after'])
+# results of every host, list of Changes and number of probes sent by an incremental scan
+Report = namedtuple('Report', ['results', 'changes', 'probes'])
+
+# magic, version, run number, number of hosts
+_header = struct.Struct('<4sHII')
+# address, size of the serialized ScanResult, number of last seen times
+_host_header = struct.Struct('<III')
+_MAGIC = b'PPSI'
+_VERSION = 2
+# type code of the last seen times, unsigned 32 bits epoch seconds stored little-endian
+_TIMES = 'I'
+
+
+class ScanState(object):
+    """
+    Stored results of the previous runs of an incremental scan: the last status of every
+    (host, port) pair, and the time it was last probed.
+
+    The statuses of a host are a ScanResult and the times an array of 32 bits epoch seconds
+    indexed by port, both saved together in a binary file replaced atomically, which can be
+    moved between platforms.
+    """
+    def __init__(self, path):
+        """
+        :param path: the path of the state file, loaded if it exists.
+        """
+        self.path = path
+        self.run = 0
+        # {ip: (ScanResult, array of last seen times indexed by port)}
+        self.__hosts = dict()
+        self.load()
+
+    def __contains__(self, ip):
+        return ip in self.__hosts
+
+    def load(self):
+        """
+        Load the state file, if any.
+        """
+        try:
+            with open(self.path, 'rb') as state_file:
+                data = state_file.read()
+        except FileNotFoundError:
+            return
+        magic, version, self.run, hosts = _header.unpack_from(data)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError('Invalid scan state {}'.format(self.path))
+        offset = _header.size
+        self.__hosts = dict()
+        for _ in range(hosts):
+            address, result_size, times_count = _host_header.unpack_from(data, offset)
+            offset += _host_header.size
+            result = ScanResult.from_bytes(data[offset:offset + result_size])
+            offset += result_size
+            times = array(_TIMES)
+            times.frombytes(data[offset:offset + times_count * times.itemsize])
+            if sys.byteorder == 'big':
+                times.byteswap()
+            offset += times_count * times.itemsize
+            self.__hosts[socket.inet_ntoa(struct.pack('!I', address))] = (result, times)
+
+    def save(self):
+        """
+        Write the state file, readers seeing either the previous state or the new one.
+        """
+        tmp_path = '{}.{}.tmp'.format(self.path, os.getpid())
+        with open(tmp_path, 'wb') as state_file:
+            state_file.write(_header.pack(_MAGIC, _VERSION, self.run, len(self.__hosts)))
+            for ip, (result, times) in self.__hosts.items():
+                blob = result.to_bytes()
+                address = struct.unpack('!I', socket.inet_aton(ip))[0]
+                state_file.write(_host_header.pack(address, len(blob), len(times)))
+                state_file.write(blob)
+                if sys.byteorder == 'big':
+                    times = array(_TIMES, times)
+                    times.byteswap()
+                state_file.write(times.tobytes())
+        os.replace(tmp_path, self.path)
+
+    def status(self, ip, port):
+        """
+        Return the last status of a port of ip, or None if it was never probed.
+        """
+        host = self.__hosts.get(ip)
+        return host[0].get(port) if host else None
+
+    def last_seen(self, ip, port):
+        """
+        Return the epoch time in seconds a port of ip was last probed, or None if it was never probed.
+        """
+        host = self.__hosts.get(ip)
+        if host is None or port not in host[0]:
+            return None
+        return host[1][port]
+
+    def result(self, ip):
+        """
+        Return the ScanResult holding the last status of every port of ip ever probed.
+        """
+        host = self.__hosts.get(ip)
+        return host[0] if host else ScanResult()
+
+    def update(self, ip, port, status, when, latency=None):
+        """
+        Record the status of a port of ip probed at the epoch time when.
+        """
+        host = self.__hosts.get(ip)
+        if host is None:
+            host = self.__hosts[ip] = (ScanResult(), array(_TIMES))
+        result, times = host
+        result.set(port, status, latency)
+        if port >= len(times):
+            times.extend(array(_TIMES, [0]) * (port + 1 - len(times)))
+        times[port] = int(when)
+
+
+class IncrementalScanner(object):
+    """
+    Repeated scans of the same targets that only probe what may have changed.
+
+    Each run probes the ports that were open at the previous run, the ports never probed, and
+    a rotating sample of the other ones: with sample 0.1, a tenth of the closed and filtered
+    ports of each host is probed again at every run, so that all of them are checked once
+    every ten runs. Ports not probed for more than max_age seconds are always probed. The
+    other ports keep their previous status, and every run reports the changes it saw.
+    """
+    def __init__(self, scanner, state, sample=0.1, max_age=None):
+        """
+        :param scanner: the PortScanner probing the ports. Its target ports are the scanned ports.
+        :type scanner: PortScanner
+        :param state: the ScanState of the previous runs, or the path of its file.
+        :type state: ScanState or str
+        :param sample: the fraction of the closed and filtered ports probed again at every run.
+        :param max_age: the time in seconds after which a port is always probed again, default to no limit.
+        """
+        if not 0 < sample <= 1:
+            raise ValueError('Invalid sample {}. Sample must be within 0 and 1'.format(sample))
+        self.scanner = scanner
+        self.state = state if isinstance(state, ScanState) else ScanState(state)
+        self.sample = sample
+        self.max_age = max_age
+
+    def scan(self, targets, message=''):
+        """
+        Run an incremental scan of targets and save the new state.
+
+        :param targets: a target or an iterable of targets, see PortScanner.scan_many().
+        :param message: the message that is going to be included in the scanning packets
+        in order to prevent ethical problem (default: '').
+        :return: a Report of the {host: ScanResult} results, holding the latest status of every
+        target port, of the list of Changes since the previous run, and of the number of probes.
+        Ports never seen before are only reported as changes if they are open.
+        """
+        self.state.run += 1
+        now = time.time()
+        hosts_by_ip = dict()
+        results = dict()
+        for host, ip in self.scanner.resolve_many(targets):
+            if ip is None:
+                results[host] = ScanResult()
+            else:
+                hosts_by_ip.setdefault(ip, []).append(host)
+
+        changes = []
+        probes = 0
+        for ip, port, status, latency in self.scanner.probe_iter(self.__jobs(hosts_by_ip, now), message):
+            probes += 1
+            before = self.state.status(ip, port)
+            if before != status and (before is not None or status == 'OPEN'):
+                changes.extend(Change(host, port, before, status) for host in hosts_by_ip[ip])
+            self.state.update(ip, port, status, now, latency)
+        self.state.save()
+
+        ports = self.scanner.get_target_ports()
+        for ip, hosts in hosts_by_ip.items():
+            known = self.state.result(ip)
+            result = ScanResult()
+            for port in ports:
+                status = known.get(port)
+                if status is not None:
+                    result.set(port, status, known.latencies.get(port))
+            for host in hosts:
+                results[host] = result
+        return Report(results, changes, probes)
+
+    def __jobs(self, hosts_by_ip, now):
+        """
+        Generate the (ip, port) probes of the current run.
+        """
+        rotations = max(1, round(1 / self.sample))
+        ports = self.scanner.get_target_ports()
+        for ip in hosts_by_ip:
+            for port in ports:
+                status = self.state.status(ip, port)
+                if status is None or status == 'OPEN' or (port + self.state.run) % rotations == 0:
+                    yield ip, port
+                elif self.max_age is not None and now - self.state.last_seen(ip, port) > self.max_age:
+                    yield ip, port
@@ -0,0 +1,131 @@
+import heapq
+import re
+from array import array
+from bisect import bisect_right
+
+from pyportscanner.etc.helper import load_port_table
+
+
+class PortSpec(object):
+    """
+    A lazily evaluated set of ports, parsed out from a string such as '1-65535', 'top:1000',
+    '22,80,8000-9000' or 'proto:udp top:200'.
+
+    A specification is made of whitespace or comma separated terms:
+      1. 'N' is the single port N.
+      2. 'A-B' is every port from A to B, both included.
+      3. 'top:N' is the N most commonly used ports, based on usage frequency rank.
+      4. 'proto:P' restricts the ranking of the top:N terms to the protocol P, e.g. 'tcp' or 'udp',
+        and tells the engine which protocol the ports are meant for.
+
+    Ports are iterated in increasing order, without ever building the list of ports of a range.
+    len() and membership tests do not depend on the size of the ranges.
+    """
+    __term_regex = re.compile(r'^(?:(\d+)(?:-(\d+))?|top:(\d+)|proto:(\w+))$')
+
+    def __init__(self, spec, table=None):
+        """
+        :param spec: the port specification string.
+        :type spec: str
+        :param table: the PortTable used to rank ports for top:N terms, default to the nmap port table.
+        :type table: PortTable
+        """
+        self.spec = spec
+        self.proto = None
+        ranges = []
+        top = 0
+        for term in re.split(r'[\s,]+', spec.strip()):
+            result = self.__term_regex.match(term)
+            if not term or not result:
+                raise ValueError('Invalid port specification {!r}: unknown term {!r}'.format(spec, term))
+            first, last, top_k, proto = result.groups()
+            if proto:
+                self.proto = proto.lower()
+            elif top_k:
+                top = max(top, int(top_k))
+            else:
+                first = int(first)
+                last = int(last) if last else first
+                if not 0 < first <= last <= 65535:
+                    raise ValueError('Invalid port specification {!r}: bad range {!r}'.format(spec, term))
+                ranges.append((first, last))
+
+        # merged ranges, stored as sorted parallel arrays of first and last ports
+        self.__firsts, self.__lasts = array('H'), array('H')
+        for first, last in sorted(ranges):
+            if self.__lasts and first <= self.__lasts[-1] + 1:
+                self.__lasts[-1] = max(self.__lasts[-1], last)
+            else:
+                self.__firsts.append(first)
+                self.__lasts.append(last)
+
+        # top ranked ports that no range covers, in increasing order
+        self.__top = top
+        self.__table = None
+        self.__extra = array('H')
+        if top:
+            self.__table = table or load_port_table()
+            self.__extra = array('H', sorted(
+                port for port in self.__table.top_ports(top, self.proto) if not self.__in_ranges(port)
+            ))
+
+        # number of ports in the ranges before each range, plus the total as last item
+        self.__counts = array('L', [0])
+        for first, last in zip(self.__firsts, self.__lasts):
+            self.__counts.append(self.__counts[-1] + last - first + 1)
+        self.__len = self.__counts[-1] + len(self.__extra)
+
+    def __repr__(self):
+        return 'PortSpec({!r})'.format(self.spec)
+
+    def __len__(self):
+        return self.__len
+
+    def __contains__(self, port):
+        if not isinstance(port, int):
+            return False
+        if self.__in_ranges(port):
+            return True
+        if self.__top:
+            rank = self.__table.rank(port, self.proto)
+            return rank is not None and rank < self.__top
+        return False
+
+    def __iter__(self):
+        ranges = (range(first, last + 1) for first, last in zip(self.__firsts, self.__lasts))
+        range_ports = (port for ports in ranges for port in ports)
+        if not self.__extra:
+            return range_ports
+        return heapq.merge(range_ports, self.__extra)
+
+    def __getitem__(self, index):
+        """
+        Return the index-th port in increasing order, without iterating over the ports before it.
+        """
+        if index < 0:
+            index += self.__len
+        if not 0 <= index < self.__len:
+            raise IndexError('PortSpec index out of range')
+        # smallest port having more than index ports lower or equal to it
+        low, high = 1, 65535
+        while low < high:
+            middle = (low + high) // 2
+            if self.__count_upto(middle) > index:
+                high = middle
+            else:
+                low = middle + 1
+        return low
+
+    def __in_ranges(self, port):
+        i = bisect_right(self.__firsts, port) - 1
+        return i >= 0 and port <= self.__lasts[i]
+
+    def __count_upto(self, port):
+        """
+        Return the number of ports of the specification lower or equal to port.
+        """
+        i = bisect_right(self.__firsts, port)
+        count = self.__counts[i]
+        if i and self.__lasts[i - 1] > port:
+            count -= self.__lasts[i - 1] - port
+        return count + bisect_right(self.__extra, port)
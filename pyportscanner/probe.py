@@ -0,0 +1,54 @@
+import platform
+import socket
+from socket import error as socket_error
+
+
+def reuse_option():
+    """
+    Return the SOL_SOCKET option used to reuse local addresses on the current platform.
+    """
+    if platform.system() == 'Windows' or not hasattr(socket, 'SO_REUSEPORT'):
+        return socket.SO_REUSEADDR
+    return socket.SO_REUSEPORT
+
+
+class ProbeContext(object):
+    """
+    Per scan state shared by all the probes of a scan, prepared once instead of for every port:
+    the socket option resolved for the platform, the encoded message, and a single non-blocking
+    UDP socket sending the scanning alert datagrams.
+    """
+    def __init__(self, message=''):
+        """
+        :param message: the message that is going to be included in the scanning packets
+        in order to prevent ethical problem (default: '').
+        """
+        self.reuse_option = reuse_option()
+        self.payload = message.encode('utf-8', errors='replace')
+        self.udp_socket = None
+        if self.payload:
+            self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.udp_socket.setblocking(False)
+
+    def notify(self, address):
+        """
+        Send the scanning alert message to address, if any, without blocking. A datagram that
+        does not fit in the socket buffer is dropped.
+        """
+        if self.udp_socket is None:
+            return
+        try:
+            self.udp_socket.sendto(self.payload, address)
+        except socket_error:
+            pass
+
+    def close(self):
+        if self.udp_socket is not None:
+            self.udp_socket.close()
+            self.udp_socket = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,11 +1,39 @@
+import collections
 import concurrent.futures
-import platform
+import errno
+import functools
+import queue
 import socket
 import time
-from collections import deque
 from socket import error as socket_error
 
-from pyportscanner.etc.helper import read_input, get_domain
+from pyportscanner.checkpoint import Checkpoint
+from pyportscanner.concurrency import EXHAUSTED, ConcurrencyWindow, fd_limit
+from pyportscanner.discovery import HostDiscovery
+from pyportscanner.etc.helper import read_input, get_domain, iter_targets
+from pyportscanner.etc.port_table import PortTable
+from pyportscanner.portspec import PortSpec
+from pyportscanner.probe import ProbeContext
+from pyportscanner.ratelimit import RateController
+from pyportscanner.resolver import Resolver
+from pyportscanner.result import NO_REPLY, ScanResult, connect_status
+from pyportscanner.retry import RetryPolicy
+from pyportscanner.scheduler import InterleavedScheduler
+from pyportscanner.selectorengine import SelectorEngine
+from pyportscanner.sinks import ResultSink, open_sink
+from pyportscanner.synscan import SynEngine, syn_available
+from pyportscanner.timing import AdaptiveTiming
+from pyportscanner.udpscan import UdpEngine
+
+ENGINES = ('thread', 'selector', 'syn')
+PROTOCOLS = ('tcp', 'udp')
+
+# times a probe is sent again for lack of sockets while no other probe is in flight, and the
+# delay in seconds added before each of these attempts
+_MAX_STALLED = 10
+_STALL_DELAY = 0.01
+# shortest timeout in seconds given to a probe cut by the deadline of a scan
+_MIN_TIMEOUT = 0.001
 
 
 class PortScanner:
@@ -23,8 +51,8 @@ class PortScanner:
 
     @timeout_val.setter
     def timeout_val(self, timeout):
-        if timeout != int(timeout):
-            raise TypeError('Timeout must be an integer')
+        if isinstance(timeout, bool) or not isinstance(timeout, (int, float)):
+            raise TypeError('Timeout must be a number')
         elif timeout <= 0:
             raise ValueError(
                 'Invalid timeout value: {}.'
@@ -37,13 +65,48 @@ class PortScanner:
     def timeout_val(self):
         return self.__timeout
 
+    @property
+    def timing(self):
+        return self.__timing
+
+    @property
+    def retry(self):
+        return self.__retry
+
+    @property
+    def rate(self):
+        return self.__rate
+
+    @property
+    def discovery(self):
+        return self.__discovery
+
+    @property
+    def scheduler(self):
+        return self.__scheduler
+
+    @property
+    def checkpoint(self):
+        return self.__checkpoint
+
+    @property
+    def sink(self):
+        return self.__sink
+
     @property
     def thread_limit(self):
         return self.__thread_limit
 
+    @property
+    def auto_concurrency(self):
+        return self.__auto_concurrency
+
     @thread_limit.setter
     def thread_limit(self, thread_limit):
-        if thread_limit != int(thread_limit):
+        if thread_limit == 'auto':
+            self.__auto_concurrency = True
+            self.__thread_limit = fd_limit()
+        elif thread_limit != int(thread_limit):
             raise TypeError('thread limit must be an integer')
         elif thread_limit <= 0 or thread_limit > 50000:
             self.__thread_limit = 100
@@ -52,13 +115,16 @@ class PortScanner:
                 'Thread limit must be within 0 to 50000 '.format(thread_limit)
             )
         else:
+            self.__auto_concurrency = False
             self.__thread_limit = thread_limit
 
     @thread_limit.getter
     def thread_limit(self):
         return self.__thread_limit
 
-    def __init__(self, target_ports=None, thread_limit=100, timeout=10, verbose=False):
+    def __init__(self, target_ports=None, thread_limit=100, timeout=10, verbose=False, engine='thread',
+                 resolver=None, timing=None, retry=None, rate=None, discovery=True,
+                 schedule=None, checkpoint=None, resume=False, sink=None, protocol=None):
         """
         Constructor of a PortScanner object. If target_ports is a list, this list of ports will be used as
         the port list to be scanned. If the target_ports is a int, it should be 50, 100 or 1000, indicating
@@ -68,16 +134,128 @@ class PortScanner:
         default to all ports we have in file.
         If this args is an int, then it specifies the top X number of ports to be scanned based on usage
         frequency rank.
-        :type target_ports: list or int
+        If this args is a str or a PortSpec, then it is a port specification such as '22,80,8000-9000'
+        or 'proto:udp top:200', see PortSpec. The ports are generated lazily.
+        :type target_ports: list, int, str or PortSpec
+        :param thread_limit: the maximum number of probes in flight, or 'auto' to derive it from the
+        file descriptor limit of the process and adjust the probes in flight to the measured latency.
+        :type thread_limit: int or str
         :param verbose: If True, the scanner will print out scanning result. If False, the scanner
         will scan silently.
         :type verbose boolean
+        :param engine: 'thread' to probe each port with a blocking connect in a thread pool,
+        'selector' to probe ports with non-blocking connects from a single thread, 'syn' to
+        send SYN segments through a raw socket, falling back to 'thread' without the privileges
+        to open raw sockets. In all cases thread_limit is the maximum number of probes in flight.
+        :type engine: str
+        :param resolver: the Resolver used to resolve host names. Share one between scanners to
+        share its cache, default to a Resolver owned by this scanner.
+        :type resolver: Resolver
+        :param timing: None to wait timeout seconds for every probe. An AdaptiveTiming, or 'adaptive'
+        for an AdaptiveTiming bounded by timeout, to derive the timeout of each probe from the
+        round trip times measured for its host.
+        :type timing: AdaptiveTiming or str
+        :param retry: the RetryPolicy re-probing the filtered ports, the ones whose probe got no
+        reply, or an int number of retries with the default backoff. Default to no retry.
+        :type retry: RetryPolicy or int
+        :param rate: the RateController pacing the probes, or a number of probes per second used
+        as initial rate of a RateController. Default to no pacing besides thread_limit.
+        :type rate: RateController, int or float
+        :param discovery: the HostDiscovery run by scan_many() and scan_many_iter() to skip the
+        hosts that answer none of a few common ports, True for one probing the 5 most used TCP
+        ports with a timeout of at most 1 second, or False to sweep every host.
+        :type discovery: HostDiscovery or bool
+        :param schedule: None to probe the ports of each host in order, one host after another,
+        'interleaved' or an InterleavedScheduler to probe the (host, port) pairs in a seeded
+        pseudo random order spreading the probes over the hosts.
+        :type schedule: InterleavedScheduler or str
+        :param checkpoint: the Checkpoint journal, or the path of a journal, in which the results of
+        the scans are recorded as they complete. Default to no journal.
+        :type checkpoint: Checkpoint or str
+        :param resume: if True, load the results recorded in the checkpoint journal by a previous run
+        and do not probe these ports again, otherwise start a new journal.
+        :type resume: bool
+        :param sink: the ResultSink to which the result of every probe is written as it completes,
+        or the path of a file opened with open_sink(). Default to no sink.
+        :type sink: ResultSink or str
+        :param protocol: 'tcp' to probe the ports with the engine, or 'udp' to send them UDP probes,
+        see UdpEngine. Default to 'udp' if target_ports is a PortSpec with a 'proto:udp' term,
+        'tcp' otherwise. With 'udp', an int target_ports selects the top UDP ports.
+        :type protocol: str
         """
+        if engine not in ENGINES:
+            raise ValueError(
+                'Invalid engine {}. '
+                'Engine must be one of {}'.format(engine, ', '.join(ENGINES))
+            )
+        if protocol is not None and protocol not in PROTOCOLS:
+            raise ValueError(
+                'Invalid protocol {}. '
+                'Protocol must be one of {}'.format(protocol, ', '.join(PROTOCOLS))
+            )
+        if engine == 'syn' and not syn_available():
+            if verbose:
+                print('SYN scan requires root or CAP_NET_RAW, falling back to connect scan')
+            engine = 'thread'
+        self.__engine = engine
+        self.__resolver = resolver if resolver is not None else Resolver(lookup=socket.gethostbyname)
+
+        if timing == 'adaptive':
+            timing = AdaptiveTiming(initial_timeout=min(1, timeout), min_timeout=min(0.1, timeout), max_timeout=timeout)
+        elif timing is not None and not isinstance(timing, AdaptiveTiming):
+            raise ValueError('Invalid timing {}. Timing must be None, \'adaptive\' or an AdaptiveTiming'.format(timing))
+        self.__timing = timing
+
+        if type(retry) == int:
+            retry = RetryPolicy(retries=retry)
+        elif retry is not None and not isinstance(retry, RetryPolicy):
+            raise ValueError('Invalid retry {}. Retry must be None, an int or a RetryPolicy'.format(retry))
+        self.__retry = retry
+
+        if isinstance(rate, (int, float)) and not isinstance(rate, bool):
+            rate = RateController(rate=rate)
+        elif rate is not None and not isinstance(rate, RateController):
+            raise ValueError('Invalid rate {}. Rate must be None, a number or a RateController'.format(rate))
+        self.__rate = rate
+
         # default ports to be scanned are all ports in file
         self.__port_map = read_input()
+        self.__port_table = PortTable.from_port_map(self.__port_map)
 
         # default thread number limit
-        self.__thread_limit = thread_limit
+        self.__auto_concurrency = thread_limit == 'auto'
+        self.__thread_limit = fd_limit() if self.__auto_concurrency else thread_limit
+
+        if discovery is True:
+            discovery = HostDiscovery(timeout=min(1, timeout), max_in_flight=self.__thread_limit)
+        elif discovery is not False and discovery is not None and not isinstance(discovery, HostDiscovery):
+            raise ValueError('Invalid discovery {}. Discovery must be a bool or a HostDiscovery'.format(discovery))
+        self.__discovery = discovery or None
+
+        if schedule == 'interleaved':
+            schedule = InterleavedScheduler()
+        elif schedule is not None and not isinstance(schedule, InterleavedScheduler):
+            raise ValueError(
+                'Invalid schedule {}. Schedule must be None, \'interleaved\' or an InterleavedScheduler'.format(schedule)
+            )
+        self.__scheduler = schedule
+
+        if isinstance(checkpoint, str):
+            checkpoint = Checkpoint(checkpoint)
+        elif checkpoint is not None and not isinstance(checkpoint, Checkpoint):
+            raise ValueError('Invalid checkpoint {}. Checkpoint must be None, a path or a Checkpoint'.format(checkpoint))
+        if checkpoint is not None:
+            if resume:
+                checkpoint.load()
+            else:
+                checkpoint.reset()
+        self.__checkpoint = checkpoint
+
+        if isinstance(sink, str):
+            sink = open_sink(sink)
+        elif sink is not None and not isinstance(sink, ResultSink):
+            raise ValueError('Invalid sink {}. Sink must be None, a path or a ResultSink'.format(sink))
+        self.__sink = sink
 
         # default connection timeout time in seconds
         self.__timeout = timeout
@@ -87,16 +265,26 @@ class PortScanner:
         if target_ports is None:
             self.targets = self.__port_map.keys()
         elif type(target_ports) == list:
-            self.targets = target_ports
+            # ports given as strings are probed, journaled and exported as ints
+            self.targets = [int(port) for port in target_ports]
         elif type(target_ports) == int:
-            self.targets = self.extract_list(target_ports)
+            self.targets = self.extract_list(target_ports, 'udp' if protocol == 'udp' else None)
+        elif isinstance(target_ports, str):
+            self.targets = PortSpec(target_ports, self.__port_table)
+        elif isinstance(target_ports, PortSpec):
+            self.targets = target_ports
+
+        if protocol is None:
+            protocol = 'udp' if getattr(self.targets, 'proto', None) == 'udp' else 'tcp'
+        self.__protocol = protocol
 
-    def extract_list(self, target_port_rank):
+    def extract_list(self, target_port_rank, proto=None):
         """
         Extract the top X ranked ports based usage frequency.
         If a number greater than the total number of ports we have is specified, scan all ports.
 
         :param target_port_rank: top X commonly used port list to be returned.
+        :param proto: optional protocol, e.g. 'udp', restricting the ranking to its ports.
         :return: top X commonly used port list.
         """
         if target_port_rank <= 0:
@@ -104,9 +292,7 @@ class PortScanner:
                 'Invalid input {}. No ports can be selected'.format(target_port_rank)
             )
 
-        service_port_list = sorted(self.__port_map.values())
-        port_list = list(ele.port_num for ele in service_port_list)
-        return sorted(port_list[:target_port_rank])
+        return sorted(self.__port_table.top_ports(target_port_rank, proto))
 
     def get_target_ports(self):
         """
@@ -129,115 +315,562 @@ class PortScanner:
         port_list = self.extract_list(k)
         return port_list
 
-    def scan(self, objective, message=''):
+    @property
+    def engine(self):
+        return self.__engine
+
+    @property
+    def protocol(self):
+        return self.__protocol
+
+    @property
+    def verbose(self):
+        return self.__verbose
+
+    def scan(self, objective, message='', deadline=None):
         """
         This is the function need to be called to perform port scanning.
 
         :param objective: the objective that is going to be scanned. Could be a host name or an IPv4 address.
         :param message: the message that is going to be included in the scanning packets
         in order to prevent ethical problem (default: '').
-        :return: a dict object containing the scan results for a given host in the form of
-        {port_number: status}
-        :rtype: dict
+        :param deadline: optional time budget of the scan in seconds. Ports are then probed by
+        frequency rank, the most used ones first, and the probes still pending when the time
+        runs out are cancelled.
+        :return: a ScanResult containing the scan results for a given host in the form of
+        {port_number: status}. With a deadline, it only holds the probed ports, and its complete
+        attribute is False if some ports could not be probed in time.
+        :rtype: ScanResult
         """
-        try:
-            socket.inet_aton(objective)
-            host_name = objective
-        except OSError or socket_error:
-            # this is not an valid IPv4 address
-            host_name = get_domain(objective)
+        deadline = self._deadline(deadline)
+        server_ip = self._resolve(objective)
+        if server_ip is None:
+            return ScanResult()
+
+        start_time = time.time()
+        output = self.__scan_ports(server_ip, message, deadline)
+        stop_time = time.time()
+
+        if self.__verbose:
+            print('Target {} scanned in  {} seconds'.format(objective, stop_time - start_time))
+            print('Scan completed!\n')
+
+        return output
+
+    def _resolve(self, objective):
+        """
+        Resolve an objective to the IPv4 address that is going to be scanned.
+
+        :param objective: a host name, an url or an IPv4 address.
+        :return: the IPv4 address of the objective, or None if it cannot be resolved.
+        :rtype: str
+        """
+        host_name = self.__host_name(objective)
 
         if self.__verbose:
             print('\n')
             print('*' * 60 + '\n')
             print('Start scanning target: {}'.format(host_name))
 
-        try:
-            server_ip = socket.gethostbyname(host_name)
-            if self.__verbose:
-                print('Target IP is: {}'.format(str(server_ip)))
-
-        except Exception:
+        server_ip = self.__resolver.resolve(host_name)
+        if server_ip is None:
             # If the DNS resolution of a website cannot be finished, abort the host.
             if self.__verbose:
                 print('Target {} unknown! Scan failed.'.format(host_name))
                 self.__usage()
-            return {}
+            return None
 
-        start_time = time.time()
-        output = self.__scan_ports(server_ip, message)
-        stop_time = time.time()
+        if self.__verbose:
+            print('Target IP is: {}'.format(str(server_ip)))
+        return server_ip
+
+    def resolve_many(self, targets):
+        """
+        Expand targets lazily and resolve them concurrently, a few targets ahead of the consumer.
+
+        :param targets: a target or an iterable of targets, see scan_many().
+        :return: generator of (host, ip) tuples in the order of targets, ip being None if the
+        host cannot be resolved.
+        """
+        return self.__resolver.resolve_many(iter_targets(targets), key=self.__host_name)
+
+    @staticmethod
+    def __host_name(objective):
+        """
+        Return the host name part of an objective, which may be an url or an IPv4 address.
+        """
+        try:
+            socket.inet_aton(objective)
+            return objective
+        except OSError or socket_error:
+            # this is not an valid IPv4 address
+            return get_domain(objective)
+
+    def _report(self, output):
+        """
+        Print the opening ports in output from small to large.
+
+        :param output: a dict that stores result in {port, status} style pairs.
+        """
+        lines = []
+        # after a deadline, output only holds the probed ports
+        for port in self.targets:
+            if output.get(port) == 'OPEN':
+                service = self.__port_map.get(port, None)
+                if service:
+                    port_proto = '{}/{}'.format(port, service.proto.upper())
+                else:
+                    port_proto = '{}/{}'.format(port, 'UNKNOWN')
+                lines.append('{:10}: {:>10}\n'.format(port_proto, output[port]))
+        if lines:
+            print('\n'.join(lines))
+
+    def scan_iter(self, objective, message='', deadline=None):
+        """
+        Scan an objective like scan(), but yield the result of every port as soon as its
+        probe finishes instead of waiting for the whole scan.
+
+        :param objective: the objective that is going to be scanned. Could be a host name or an IPv4 address.
+        :param message: the message that is going to be included in the scanning packets
+        in order to prevent ethical problem (default: '').
+        :param deadline: optional time budget of the scan in seconds, see scan().
+        :return: generator of (port, status, latency) tuples in completion order, latency being
+        the time in seconds the probe took. Nothing is yielded if the objective cannot be resolved.
+        """
+        deadline = self._deadline(deadline)
+        server_ip = self._resolve(objective)
+        if server_ip is None:
+            return
+
+        jobs = self._ranked_jobs([server_ip]) if deadline else self.__jobs(server_ip)
+        for _, port, status, latency in self.__probe(jobs, message, deadline):
+            yield port, status, latency
+
+    def scan_many(self, targets, message='', force_scan=False, deadline=None):
+        """
+        Scan several objectives at once. Every (host, port) pair is scheduled on the same
+        engine, so all hosts share a single budget of thread_limit probes in flight.
+        Unless force_scan is True, hosts that do not answer the host discovery are not swept.
+
+        :param targets: a target or an iterable of targets. A target can be a host name, an IPv4
+        address, a CIDR block such as '10.0.0.0/24' or a range such as '10.0.0.1-10.0.0.20' or '10.0.0.1-20'.
+        :param message: the message that is going to be included in the scanning packets
+        in order to prevent ethical problem (default: '').
+        :param force_scan: if True, sweep every host without running the host discovery.
+        :param deadline: optional time budget of the scan in seconds, see scan(). The ports of
+        all hosts are then probed by frequency rank.
+        :return: a dict of {host: ScanResult}. Hosts that cannot be resolved or seem down are mapped
+        to an empty ScanResult.
+        :rtype: dict
+        """
+        deadline = self._deadline(deadline)
+        output = dict()
+        # several host names may resolve to the same address, which is scanned only once
+        hosts_by_ip = dict()
+
+        def on_resolved(host, ip):
+            if ip is None:
+                output[host] = ScanResult()
+            elif ip in hosts_by_ip:
+                hosts_by_ip[ip].append(host)
+                output[host] = output[hosts_by_ip[ip][0]]
+                return False
+            else:
+                hosts_by_ip[ip] = [host]
+                output[host] = ScanResult()
+            return ip is not None
+
+        def on_alive(host, ip):
+            # with a deadline, ports are only reported once probed
+            if not deadline:
+                output[host].fill(self.targets)
+
+        jobs = self.__many_jobs(targets, on_resolved, on_alive, force_scan, deadline)
+        for ip, port, status, latency in self.__probe(jobs, message, deadline):
+            output[hosts_by_ip[ip][0]].set(port, status, latency)
+
+        if deadline:
+            for hosts in hosts_by_ip.values():
+                result = output[hosts[0]]
+                result.complete = len(result) == len(self.targets)
 
         if self.__verbose:
-            print('Target {} scanned in  {} seconds'.format(host_name, stop_time - start_time))
-            print('Scan completed!\n')
+            for host, result in output.items():
+                print('Target {}:'.format(host))
+                self._report(result)
 
         return output
 
-    def __scan_ports(self, ip, message):
+    def scan_many_iter(self, targets, message='', force_scan=False, deadline=None):
+        """
+        Generator version of scan_many().
+
+        :return: generator of (ip, port, status, latency) tuples in completion order.
+        Every address is scanned once, even if several targets resolve to it.
+        """
+        seen = set()
+
+        def on_resolved(host, ip):
+            if ip is None or ip in seen:
+                return False
+            seen.add(ip)
+            return True
+
+        deadline = self._deadline(deadline)
+        jobs = self.__many_jobs(targets, on_resolved, force_scan=force_scan, deadline=deadline)
+        return self.__probe(jobs, message, deadline)
+
+    def export(self, targets, message='', force_scan=False, deadline=None):
+        """
+        Scan several objectives like scan_many(), writing the results only to the sink so that
+        memory stays flat however many hosts are scanned. The sink is flushed, not closed.
+
+        :return: the number of results written.
+        :rtype: int
+        """
+        if self.__sink is None:
+            raise ValueError('export() requires a sink')
+        count = 0
+        for _ in self.scan_many_iter(targets, message, force_scan, deadline):
+            count += 1
+        return count
+
+    def probe_iter(self, jobs, message='', deadline=None):
+        """
+        Probe arbitrary (ip, port) pairs with the configured engine, bypassing name resolution,
+        host discovery and scheduling.
+
+        :param jobs: iterable of (ip, port) tuples, consumed lazily.
+        :param message: the message that is going to be included in the scanning packets
+        in order to prevent ethical problem (default: '').
+        :param deadline: optional time budget in seconds, see scan().
+        :return: generator of (ip, port, status, latency) tuples in completion order.
+        """
+        jobs = ((ip, int(port)) for ip, port in jobs)
+        return self.__probe(jobs, message, self._deadline(deadline))
+
+    def __jobs(self, ip):
+        """
+        Return the lazily generated (ip, port) probes of a single host.
+        """
+        if self.__scheduler:
+            return self.__scheduler.jobs([ip], self.__port_sequence())
+        return ((ip, port) for port in self.targets)
+
+    def _ranked_jobs(self, ips):
+        """
+        Return the (ip, port) probes of ips, ordered by the frequency rank of the ports, the most
+        used ones first. Ports missing from the ranking come last, in increasing order.
+        """
+        proto = getattr(self.targets, 'proto', None)
+
+        def key(port):
+            rank = self.__port_table.rank(port, proto)
+            return (rank is None, rank or 0, port)
+
+        ranked = sorted(self.targets, key=key)
+        return ((ip, port) for port in ranked for ip in ips)
+
+    @staticmethod
+    def _deadline(budget):
+        """
+        Return the time.monotonic() time at which a scan of the given budget in seconds ends, or None.
+        """
+        if budget is None:
+            return None
+        if budget <= 0:
+            raise ValueError('Invalid deadline {}. Deadline must be greater than 0'.format(budget))
+        return time.monotonic() + budget
+
+    def __port_sequence(self):
+        """
+        Return the target ports as a sequence supporting len() and indexing.
+        """
+        if hasattr(self.targets, '__getitem__'):
+            return self.targets
+        return sorted(self.targets)
+
+    def __many_jobs(self, targets, on_resolved, on_alive=None, force_scan=False, deadline=None):
+        """
+        Expand targets lazily and generate the (ip, port) probes of every resolved host that
+        answered the host discovery.
+
+        :param targets: a target or an iterable of targets, see scan_many().
+        :param on_resolved: callable(host, ip) called once per target, ip being None if the
+        target cannot be resolved. The ports of the target are probed only if it returns True.
+        :param on_alive: optional callable(host, ip) called before the ports of a target are probed.
+        :param force_scan: if True, do not run the host discovery.
+        :param deadline: if set, probe the ports of all hosts by frequency rank.
+        """
+        resolved = ((host, ip) for host, ip in self.resolve_many(targets) if on_resolved(host, ip))
+        if self.__discovery and not force_scan:
+            resolved = self.__discovery.filter(resolved, key=lambda item: item[1])
+        if self.__scheduler or deadline:
+            # the order spans every host, so the hosts are collected first
+            ips = []
+            for host, ip in resolved:
+                if on_alive:
+                    on_alive(host, ip)
+                ips.append(ip)
+            if deadline:
+                jobs = self._ranked_jobs(ips)
+            else:
+                jobs = self.__scheduler.jobs(ips, self.__port_sequence())
+            for job in jobs:
+                yield job
+            return
+
+        for host, ip in resolved:
+            if on_alive:
+                on_alive(host, ip)
+            for job in self.__jobs(ip):
+                yield job
+
+    def __scan_ports(self, ip, message, deadline=None):
         """
-        Controller of the __scan_ports_helper() function
+        Controller of the __probe() function
 
         :param ip: the ip address that is being scanned
         :type ip: str
-        :param delay: the time in seconds that a TCP socket waits until timeout
-        :type delay: int
         :param message: the message that is going to be included in the scanning packets,
         in order to prevent ethical problem, default to ''.
         :type message: str
-        :return: a dict that stores result in {port, status} style pairs.
-        status can be 'OPEN' or 'CLOSE'.
+        :param deadline: optional time.monotonic() time at which the scan stops, see scan().
+        :return: a ScanResult that stores result in {port, status} style pairs.
+        status can be 'OPEN', 'CLOSE' or 'FILTERED'.
         """
-        output = dict()
-        for port in self.targets:
-            output[port] = 'CLOSE'
-        
-        futures = deque()
-        with concurrent.futures.ThreadPoolExecutor(max_workers=self.__thread_limit) as executor:
-            for port in self.targets:
-                future = executor.submit(self.__TCP_connect, ip, port, message)
-                futures.append(future)
-                while len(futures) >= self.__thread_limit:
-                    self.__check_futures(output, futures)
-                    time.sleep(0.01)
-
-            # make sure all thread outputs are stored.
-            while futures:
-                self.__check_futures(output, futures)
-                time.sleep(0.01)
+        output = ScanResult()
+        if deadline:
+            jobs = self._ranked_jobs([ip])
+        else:
+            output.fill(self.targets)
+            jobs = self.__jobs(ip)
+
+        for _, port, status, latency in self.__probe(jobs, message, deadline):
+            output.set(port, status, latency)
+
+        if deadline:
+            output.complete = len(output) == len(self.targets)
 
         # Print opening ports from small to large
         if self.__verbose:
-            for port in self.targets:
-                if output[port] == 'OPEN':
-                    service = self.__port_map.get(port, None)
-                    if service:
-                        port_proto = '{}/{}'.format(port, service.proto.upper())
-                    else:
-                        port_proto = '{}/{}'.format(port, 'UNKNOWN')
-                    print('{:10}: {:>10}\n'.format(port_proto, output[port]))
+            self._report(output)
 
         return output
 
-    @classmethod
-    def __check_futures(cls, output, futures):
-        """
-        Check the executing status of Futures and retrieve the results from them.
-        :param output: dict for storing the results
-        :param futures: list of concurrent.futures.Future object
-        """
-        for _ in range(len(futures)):
-            future = futures.popleft()
-            if future.done():
-                try:
-                    port, status = future.result()
-                    output[port] = status
-                except socket_error:
-                    pass
-            else:
-                futures.append(future)
+    def __probe(self, jobs, message, deadline=None):
+        """
+        Probe (ip, port) jobs with the configured engine, re-probing the filtered ones as
+        configured by the retry policy.
+
+        :param deadline: optional time.monotonic() time at which the probes still pending are
+        cancelled and the generator stops.
+        :return: generator of (ip, port, status, latency) tuples in completion order.
+        """
+        if self.__checkpoint is not None:
+            results = self.__checkpointed(jobs, functools.partial(self.__probe_retried, message=message, deadline=deadline))
+        else:
+            results = self.__probe_retried(jobs, message, deadline)
+        if self.__sink is not None:
+            return self.__sunk(results)
+        return results
+
+    def __probe_retried(self, jobs, message, deadline=None):
+        """
+        Probe (ip, port) jobs, re-probing the filtered ones as configured by the retry policy.
+
+        :return: generator of (ip, port, status, latency) tuples in completion order.
+        """
+        if self.__retry:
+            probe = functools.partial(self.__probe_once, message=message, deadline=deadline)
+            return self.__retry.run(probe, jobs, deadline)
+        return self.__probe_once(jobs, message, deadline)
+
+    def __checkpointed(self, jobs, probe):
+        """
+        Probe the (ip, port) jobs not recorded in the checkpoint journal, recording their results.
+        The results of the recorded jobs are yielded from the journal, with a latency of None.
+
+        :param probe: callable(jobs) returning an iterable of (ip, port, status, latency) tuples.
+        :return: generator of (ip, port, status, latency) tuples.
+        """
+        checkpoint = self.__checkpoint
+        replayed = collections.deque()
+
+        def pending():
+            for ip, port in jobs:
+                status = checkpoint.status(ip, port)
+                if status is None:
+                    yield ip, port
+                else:
+                    replayed.append((ip, port, status, None))
+
+        try:
+            for result in probe(pending()):
+                while replayed:
+                    yield replayed.popleft()
+                checkpoint.record(*result[:3])
+                yield result
+            while replayed:
+                yield replayed.popleft()
+        finally:
+            checkpoint.flush()
+
+    def __sunk(self, results):
+        """
+        Write results to the sink as they are yielded, flushing it when the scan ends.
+
+        :return: generator of the same (ip, port, status, latency) tuples.
+        """
+        sink = self.__sink
+        try:
+            for result in results:
+                sink.write(*result)
+                yield result
+        finally:
+            sink.flush()
+
+    def __probe_once(self, jobs, message, deadline=None):
+        """
+        Probe (ip, port) jobs once with the configured engine, paced by the rate controller if any.
+
+        :return: generator of (ip, port, status, latency) tuples in completion order.
+        """
+        if self.__rate:
+            jobs = self.__rate.paced(jobs)
+        if self.__protocol == 'udp':
+            engine = UdpEngine(self.__thread_limit, self.__timeout, timing=self.__timing, window=self._window())
+            results = self.__probe_engine(engine, jobs, message, deadline)
+        elif self.__engine == 'selector':
+            engine = SelectorEngine(self.__thread_limit, self.__timeout, timing=self.__timing,
+                                    window=self._window())
+            results = self.__probe_engine(engine, jobs, message, deadline)
+        elif self.__engine == 'syn':
+            engine = SynEngine(self.__thread_limit, self.__timeout, timing=self.__timing, window=self._window())
+            results = self.__probe_engine(engine, jobs, message, deadline)
+        else:
+            results = self.__probe_threads(jobs, message, deadline)
+        if self.__rate:
+            results = self.__rate.recorded(results)
+        return results
+
+    @staticmethod
+    def __probe_engine(engine, jobs, message, deadline=None):
+        """
+        Probe (ip, port) jobs with a selector, SYN or UDP engine, sharing one ProbeContext.
+
+        :return: generator of (ip, port, status, latency) tuples in completion order.
+        """
+        with ProbeContext(message) as context:
+            for result in engine.run(jobs, context, deadline):
+                yield result
+
+    def _window(self):
+        """
+        Return a new ConcurrencyWindow bounding the probes in flight of a scan.
+        """
+        return ConcurrencyWindow(self.__thread_limit, adaptive=self.__auto_concurrency)
+
+    def __probe_threads(self, jobs, message, deadline=None):
+        """
+        Probe (ip, port) jobs in a thread pool, with at most thread_limit probes in flight.
+        Probes that fail for lack of sockets are sent again once the window backed off.
+        With a deadline, the timeouts of the probes are cut so that they end by the deadline,
+        and the results of the probes completed after it are dropped.
+
+        :return: generator of (ip, port, status, latency) tuples in completion order.
+        """
+        # Every probe holds a slot of the window until its completion callback has queued the
+        # result, so a new probe is submitted as soon as one finishes and no polling is needed.
+        window = self._window()
+        completed = queue.Queue()
+        context = ProbeContext(message)
+
+        def collect(ip, port, start_time, future):
+            latency = time.perf_counter() - start_time
+            status = error = None
+            try:
+                port, status = future.result()
+            except socket_error as e:
+                # None tells the submitter to send the probe again
+                status = None if e.errno in EXHAUSTED else 'CLOSE'
+            except Exception as e:
+                # an exception escaping a callback is only logged, the submitter raises it instead
+                error = e
+            finally:
+                completed.put(error or (ip, port, status, latency))
+                window.release(latency if status in ('OPEN', 'CLOSE') else None,
+                               exhausted=status is None and error is None)
+
+        jobs = iter(jobs)
+        deferred = collections.deque()
+        exhausted = False
+        submitted = 0
+        stalled = 0
+        with context, concurrent.futures.ThreadPoolExecutor(max_workers=self.__thread_limit) as executor:
+            while deadline is None or time.monotonic() < deadline:
+                if deferred:
+                    ip, port = deferred.popleft()
+                elif not exhausted:
+                    job = next(jobs, None)
+                    if job is None:
+                        exhausted = True
+                        continue
+                    ip, port = job
+                elif submitted:
+                    # every job has been submitted, wait for the remaining probes
+                    try:
+                        result = completed.get(timeout=deadline and max(0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    submitted -= 1
+                    if isinstance(result, Exception):
+                        raise result
+                    if result[2] is None:
+                        stalled = self.__defer(deferred, result, submitted, stalled)
+                    else:
+                        yield result
+                    continue
+                else:
+                    break
+
+                if not window.acquire(deadline and max(0, deadline - time.monotonic())):
+                    break
+                future = executor.submit(self.__TCP_connect, ip, port, context, deadline)
+                future.add_done_callback(functools.partial(collect, ip, port, time.perf_counter()))
+                submitted += 1
+                # hand over whatever finished meanwhile, without waiting
+                while not completed.empty():
+                    submitted -= 1
+                    result = completed.get()
+                    if isinstance(result, Exception):
+                        raise result
+                    if result[2] is None:
+                        stalled = self.__defer(deferred, result, submitted, stalled)
+                    else:
+                        yield result
 
-    def __TCP_connect(self, ip, port_number, message):
+    @staticmethod
+    def __defer(deferred, result, submitted, stalled):
+        """
+        Queue the job of a probe that failed for lack of sockets to be sent again.
+
+        :param submitted: the number of probes still in flight.
+        :param stalled: the number of probes deferred in a row while none was in flight.
+        :return: the updated number of probes deferred in a row while none was in flight.
+        """
+        if submitted:
+            stalled = 0
+        else:
+            stalled += 1
+            if stalled > _MAX_STALLED:
+                raise OSError(errno.EMFILE, 'Out of sockets with no probe in flight')
+            # no probe in flight will release a socket, give the rest of the system some time
+            time.sleep(_STALL_DELAY * stalled)
+        deferred.append(result[:2])
+        return stalled
+
+    def __TCP_connect(self, ip, port_number, context, deadline=None):
         """
         Perform status checking for a given port on a given ip address using TCP handshake
 
@@ -245,45 +878,44 @@ class PortScanner:
         :type ip: str
         :param port_number: the port that is going to be checked
         :type port_number: int
-        :param message: the message that is going to be included in the scanning packets,
-        in order to prevent ethical problem, default to ''.
-        :type message: str
+        :param context: the ProbeContext of the scan, holding the socket option of the platform,
+        the encoded message and the UDP socket sending it.
+        :type context: ProbeContext
+        :param deadline: optional time.monotonic() time by which the probe has to end.
+        :return: a tuple of (port_number, status), status being None if the probe failed for lack
+        of sockets, buffers or local ports and has to be sent again.
         """
-        # Initialize the TCP socket object based on different operating systems.
-        # All systems except for 'Windows' will be treated equally.
-        curr_os = platform.system()
-        if curr_os == 'Windows':
-            TCP_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            TCP_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            TCP_sock.settimeout(self.__timeout)
-        else:
-            TCP_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            TCP_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
-            TCP_sock.settimeout(self.__timeout)
+        timeout = self.__timing.timeout_for(ip) if self.__timing else self.__timeout
+        if deadline:
+            timeout = max(_MIN_TIMEOUT, min(timeout, deadline - time.monotonic()))
 
-        b_message = message.encode('utf-8', errors='replace')
+        TCP_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        TCP_sock.setsockopt(socket.SOL_SOCKET, context.reuse_option, 1)
+        TCP_sock.settimeout(timeout)
+        address = (ip, int(port_number))
 
-        # Initialize a UDP socket to send scanning alert message if there exists an non-empty message
-        UDP_sock = None
         try:
-            if message:
-                UDP_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-                UDP_sock.sendto(b_message, (ip, int(port_number)))
-
-            result = TCP_sock.connect_ex((ip, int(port_number)))
-            if message and result == 0:
-                TCP_sock.sendall(b_message)
-
-            # If the TCP handshake is successful, the port is OPEN. Otherwise it is CLOSE
-            if result == 0:
-                return port_number, 'OPEN'
-            else:
-                return port_number, 'CLOSE'
+            # send the scanning alert message, if any, through the shared UDP socket
+            context.notify(address)
+
+            start_time = time.perf_counter()
+            result = TCP_sock.connect_ex(address)
+            if result in EXHAUSTED:
+                # out of buffers or local ports, not a closed port
+                return port_number, None
+            if self.__timing and result not in NO_REPLY:
+                self.__timing.observe(ip, time.perf_counter() - start_time)
+            if context.payload and result == 0:
+                TCP_sock.sendall(context.payload)
+
+            # If the TCP handshake is successful, the port is OPEN. If it got no reply in time,
+            # the port is FILTERED. Otherwise it is CLOSE
+            return port_number, connect_status(result)
 
         except socket_error as e:
+            if e.errno in EXHAUSTED:
+                return port_number, None
             # Failed to perform a TCP handshake means the port is probably close.
             return port_number, 'CLOSE'
         finally:
-            if UDP_sock:
-                UDP_sock.close()
             TCP_sock.close()
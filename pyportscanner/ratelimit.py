@@ -0,0 +1,236 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+class TokenBucket(object):
+    """
+    Token bucket emitting rate tokens per second, with at most burst tokens saved up.
+
+    Tokens are reserved rather than taken: reserve() always succeeds and returns how long the
+    caller has to wait before its token is actually available, so that threads can sleep and
+    coroutines can await the same bucket.
+    """
+    def __init__(self, rate, burst=None):
+        """
+        :param rate: number of tokens per second.
+        :param burst: maximum number of tokens saved up while the bucket is not used, default to rate / 10.
+        """
+        if rate <= 0:
+            raise ValueError('Invalid rate {}. Rate must be greater than 0'.format(rate))
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate / 10)
+        self.__tokens = self.burst
+        self.__updated = time.monotonic()
+        self.__lock = threading.Lock()
+
+    def __getstate__(self):
+        # locks cannot be copied to another process, e.g. a worker of a ShardedScanner
+        state = self.__dict__.copy()
+        del state['_TokenBucket__lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__lock = threading.Lock()
+
+    def reserve(self, tokens=1):
+        """
+        Reserve tokens.
+
+        :return: the time in seconds to wait before the tokens are available.
+        """
+        with self.__lock:
+            now = time.monotonic()
+            self.__tokens = min(self.burst, self.__tokens + (now - self.__updated) * self.rate)
+            self.__updated = now
+            self.__tokens -= tokens
+            return -self.__tokens / self.rate if self.__tokens < 0 else 0.0
+
+    def acquire(self, tokens=1):
+        """
+        Block until tokens are available.
+        """
+        wait = self.reserve(tokens)
+        if wait:
+            time.sleep(wait)
+
+
+class _Flow(object):
+    """
+    Bucket and AIMD state of the probes of a rate controller, or of a single host.
+    """
+    def __init__(self, rate):
+        self.bucket = TokenBucket(rate)
+        self.probes = 0
+        self.timeouts = 0
+
+
+class RateController(object):
+    """
+    Congestion aware probe rate control.
+
+    Probes are paced by a global token bucket and, if per_host_rate is set, by a token bucket
+    per host. Both rates follow an additive increase / multiplicative decrease (AIMD) scheme:
+    every window probes, if more than drop_ratio of them timed out (as opposed to being
+    answered, even by a refusal), the rate is multiplied by decrease, otherwise it grows by
+    increase probes per second. The rate therefore settles near what the network path and
+    the target can answer, instead of losing probes to drops that look like filtered ports.
+    """
+    # maximum number of jobs paced() sets aside while their host is out of tokens
+    max_deferred = 4096
+
+    def __init__(self, rate=1000, per_host_rate=None, min_rate=10, max_rate=None, window=100,
+                 drop_ratio=0.05, increase=None, decrease=0.5):
+        """
+        :param rate: initial global rate in probes per second.
+        :param per_host_rate: initial rate of each host in probes per second, default to no per host limit.
+        :param min_rate: lower bound of the rates.
+        :param max_rate: upper bound of the rates, default to no bound.
+        :param window: number of probes between two rate adjustments.
+        :param drop_ratio: ratio of timed out probes above which a window is considered congested.
+        :param increase: probes per second added after a window without congestion, default to min_rate.
+        :param decrease: factor applied to the rate after a congested window.
+        """
+        if not 0 < decrease < 1:
+            raise ValueError('Invalid decrease {}. Decrease must be within 0 and 1'.format(decrease))
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.window = window
+        self.drop_ratio = drop_ratio
+        self.increase = increase if increase is not None else min_rate
+        self.decrease = decrease
+        self.per_host_rate = per_host_rate
+        self.__global = _Flow(rate)
+        self.__hosts = dict()
+        self.__lock = threading.Lock()
+
+    def __getstate__(self):
+        # locks cannot be copied to another process, e.g. a worker of a ShardedScanner
+        state = self.__dict__.copy()
+        del state['_RateController__lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__lock = threading.Lock()
+
+    @property
+    def rate(self):
+        """
+        The current global rate in probes per second.
+        """
+        return self.__global.bucket.rate
+
+    def host_rate(self, ip):
+        """
+        Return the current rate of ip in probes per second, or None without per host limit.
+        """
+        flow = self.__hosts.get(ip)
+        if flow is not None:
+            return flow.bucket.rate
+        return self.per_host_rate
+
+    def reserve(self, ip):
+        """
+        Reserve the emission of a probe to ip.
+
+        :return: the time in seconds to wait before sending the probe.
+        """
+        wait = self.__global.bucket.reserve()
+        flow = self.__host_flow(ip)
+        if flow is not None:
+            wait = max(wait, flow.bucket.reserve())
+        return wait
+
+    def acquire(self, ip):
+        """
+        Block until a probe can be sent to ip.
+        """
+        wait = self.reserve(ip)
+        if wait:
+            time.sleep(wait)
+
+    def record(self, ip, status):
+        """
+        Record the outcome of a probe, adjusting the rates at the end of every window.
+
+        :param status: 'OPEN', 'CLOSE' or 'FILTERED', the latter meaning the probe timed out.
+        """
+        timed_out = status == 'FILTERED'
+        with self.__lock:
+            self.__update(self.__global, timed_out)
+            flow = self.__hosts.get(ip)
+            if flow is not None:
+                self.__update(flow, timed_out)
+
+    def paced(self, jobs):
+        """
+        Generate (ip, port) jobs no faster than the rates allow.
+
+        A job whose host is out of tokens is set aside until its token is available, so that the
+        jobs of the other hosts are not held behind it. At most max_deferred jobs are set aside.
+        """
+        if self.per_host_rate is None:
+            for job in jobs:
+                self.acquire(job[0])
+                yield job
+            return
+
+        # heap of (time the token of the job is available, sequence number, job)
+        deferred = []
+        sequence = itertools.count()
+        jobs = iter(jobs)
+        exhausted = False
+        while True:
+            now = time.monotonic()
+            if deferred and (deferred[0][0] <= now or exhausted or len(deferred) >= self.max_deferred):
+                ready_time, _, job = heapq.heappop(deferred)
+                if ready_time > now:
+                    time.sleep(ready_time - now)
+            else:
+                job = next(jobs, None)
+                if job is None:
+                    if not deferred:
+                        return
+                    exhausted = True
+                    continue
+                wait = self.__host_flow(job[0]).bucket.reserve()
+                if wait:
+                    heapq.heappush(deferred, (now + wait, next(sequence), job))
+                    continue
+            self.__global.bucket.acquire()
+            yield job
+
+    def recorded(self, results):
+        """
+        Record the (ip, port, status, latency) results of an engine while passing them through.
+        """
+        for result in results:
+            self.record(result[0], result[2])
+            yield result
+
+    def __host_flow(self, ip):
+        if self.per_host_rate is None:
+            return None
+        flow = self.__hosts.get(ip)
+        if flow is None:
+            with self.__lock:
+                flow = self.__hosts.setdefault(ip, _Flow(self.per_host_rate))
+        return flow
+
+    def __update(self, flow, timed_out):
+        flow.probes += 1
+        flow.timeouts += timed_out
+        if flow.probes < self.window:
+            return
+        if flow.timeouts > self.drop_ratio * flow.probes:
+            rate = flow.bucket.rate * self.decrease
+        else:
+            rate = flow.bucket.rate + self.increase
+        if self.max_rate is not None:
+            rate = min(rate, self.max_rate)
+        flow.bucket.rate = max(rate, self.min_rate)
+        flow.probes = 0
+        flow.timeouts = 0
@@ -0,0 +1,128 @@
+import concurrent.futures
+import socket
+import threading
+import time
+from collections import OrderedDict, deque
+from socket import error as socket_error
+
+
+class Resolver(object):
+    """
+    Caching host name resolver.
+
+    Successful lookups are cached for ttl seconds and failed lookups for negative_ttl seconds,
+    so unknown targets fail fast when they are scanned again. The system resolver does not
+    expose the TTL of DNS records, hence the fixed expiry times. At most max_size names are
+    cached, the least recently used ones being evicted first.
+    """
+    def __init__(self, ttl=300, negative_ttl=30, max_size=4096, max_workers=32, lookup=None):
+        """
+        :param ttl: time in seconds a resolved address is cached.
+        :param negative_ttl: time in seconds a failed resolution is cached.
+        :param max_size: maximum number of cached host names.
+        :param max_workers: maximum number of concurrent lookups of resolve_many().
+        :param lookup: callable(host_name) returning an IPv4 address or raising an error,
+        default to socket.gethostbyname.
+        """
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self.max_workers = max_workers
+        self.__lookup = lookup or socket.gethostbyname
+        # {host name: (ip or None, expiry time)}, in least recently used order
+        self.__cache = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def resolve(self, host_name):
+        """
+        Resolve a host name to an IPv4 address.
+
+        :return: the IPv4 address, or None if the host name cannot be resolved.
+        :rtype: str
+        """
+        hit, ip = self.__get(host_name)
+        if hit:
+            return ip
+
+        try:
+            ip = self.__lookup(host_name)
+        except (socket_error, UnicodeError, TypeError, ValueError):
+            ip = None
+        self.__put(host_name, ip)
+        return ip
+
+    def resolve_many(self, items, key=None):
+        """
+        Resolve many host names concurrently, with at most max_workers lookups at the same time.
+        Items are consumed lazily, a few lookups ahead of the consumer.
+
+        :param items: iterable of host names, or of items key maps to a host name.
+        :param key: optional callable(item) returning the host name of an item.
+        :return: generator of (item, ip) tuples in the order of items, ip being None if the
+        host name cannot be resolved.
+        """
+        pending = deque()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for item in items:
+                host_name = key(item) if key else item
+                hit, ip = self.__get(host_name)
+                pending.append((item, ip if hit else executor.submit(self.resolve, host_name)))
+                while len(pending) > self.max_workers * 2 or (pending and not self.__waiting(pending[0][1])):
+                    yield self.__result(pending.popleft())
+
+            while pending:
+                yield self.__result(pending.popleft())
+
+    def clear(self):
+        """
+        Drop every cached resolution.
+        """
+        with self.__lock:
+            self.__cache.clear()
+
+    def __len__(self):
+        return len(self.__cache)
+
+    def __get(self, host_name):
+        """
+        :return: a tuple of (hit, ip), hit being False if host_name has no valid cached resolution.
+        """
+        if self.__is_ip(host_name):
+            return True, host_name
+        with self.__lock:
+            entry = self.__cache.get(host_name)
+            if entry is None:
+                return False, None
+            ip, expiry = entry
+            if expiry <= time.monotonic():
+                del self.__cache[host_name]
+                return False, None
+            self.__cache.move_to_end(host_name)
+            return True, ip
+
+    def __put(self, host_name, ip):
+        ttl = self.ttl if ip is not None else self.negative_ttl
+        with self.__lock:
+            self.__cache[host_name] = (ip, time.monotonic() + ttl)
+            self.__cache.move_to_end(host_name)
+            while len(self.__cache) > self.max_size:
+                self.__cache.popitem(last=False)
+
+    @staticmethod
+    def __is_ip(host_name):
+        try:
+            socket.inet_aton(host_name)
+        except (OSError, TypeError):
+            return False
+        return host_name.count('.') == 3
+
+    @staticmethod
+    def __waiting(ip):
+        return isinstance(ip, concurrent.futures.Future) and not ip.done()
+
+    @staticmethod
+    def __result(entry):
+        item, ip = entry
+        if isinstance(ip, concurrent.futures.Future):
+            ip = ip.result()
+        return item, ip
@@ -0,0 +1,196 @@
+import errno
+import struct
+import zlib
+from array import array
+from collections.abc import MutableMapping
+
+
+STATUSES = ('OPEN', 'CLOSE', 'FILTERED')
+
+# connect results of a handshake that got no reply within the timeout. On Windows, connect_ex()
+# reports a timeout as WSAEWOULDBLOCK
+NO_REPLY = {errno.EAGAIN, errno.EWOULDBLOCK, errno.ETIMEDOUT}
+if hasattr(errno, 'WSAETIMEDOUT'):
+    NO_REPLY.add(errno.WSAETIMEDOUT)
+if hasattr(errno, 'WSAEWOULDBLOCK'):
+    NO_REPLY.add(errno.WSAEWOULDBLOCK)
+
+# status codes stored in the status vector, 0 meaning the port was not scanned
+_codes = {status: code for code, status in enumerate(STATUSES, 1)}
+_OPEN = _codes['OPEN']
+_FILTERED = _codes['FILTERED']
+
+# magic, version, vector size, compressed vector size, number of open ports with a latency
+_header = struct.Struct('<4sHIII')
+_MAGIC = b'PPSR'
+_VERSION = 1
+
+
+def connect_status(result):
+    """
+    Translate the errno of a TCP handshake to a port status.
+
+    :param result: the errno of the handshake, 0 on success.
+    :return: 'OPEN' if the handshake succeeded, 'FILTERED' if it got no reply, 'CLOSE' otherwise.
+    """
+    if result == 0:
+        return 'OPEN'
+    return 'FILTERED' if result in NO_REPLY else 'CLOSE'
+
+
+class ScanResult(MutableMapping):
+    """
+    Compact {port: status} result of the scan of a single host.
+
+    The status of every scanned port is a single byte of a status vector indexed by port, and
+    only open ports get an entry in a sparse map holding their metadata (the latency of their
+    probe). It behaves like the dict returned by previous versions: result[port] is 'OPEN',
+    'CLOSE' or 'FILTERED', and iteration goes over the scanned ports in increasing order.
+    Ports may be given as strings of digits, as in previous versions, and are stored as ints.
+    It is not a dict though, use to_dict() to get one, e.g. for json.dumps().
+    """
+    def __init__(self, items=None):
+        """
+        :param items: optional {port: status} mapping or iterable of (port, status) pairs.
+        """
+        self.__vector = bytearray()
+        self.__len = 0
+        # False if the scan stopped before every target port was probed, e.g. at its deadline
+        self.complete = True
+        # {open port: latency in seconds}
+        self.latencies = dict()
+        if items:
+            self.update(items)
+
+    def fill(self, ports, status='CLOSE'):
+        """
+        Set the status of every port of an iterable of ports.
+        """
+        for port in ports:
+            self[port] = status
+
+    def set(self, port, status, latency=None):
+        """
+        Set the status of a port, recording the latency of its probe if it is open.
+        """
+        self[port] = status
+        if latency is not None and status == 'OPEN':
+            self.latencies[port] = latency
+
+    def open_ports(self):
+        """
+        Return the open ports in increasing order.
+
+        :rtype: list
+        """
+        return [port for port in self if self.__vector[port] == _OPEN]
+
+    def filtered_ports(self):
+        """
+        Return the ports whose probes got no reply, in increasing order.
+
+        :rtype: list
+        """
+        return [port for port in self if self.__vector[port] == _FILTERED]
+
+    def to_dict(self):
+        """
+        Return the result as a {port: status} dict.
+
+        :rtype: dict
+        """
+        return dict(self.items())
+
+    def __getitem__(self, port):
+        index = self.__index(port)
+        code = self.__vector[index] if index is not None else 0
+        if not code:
+            raise KeyError(port)
+        return STATUSES[code - 1]
+
+    def __setitem__(self, port, status):
+        try:
+            code = _codes[status]
+        except KeyError:
+            raise ValueError('Invalid status {}. Status must be one of {}'.format(status, ', '.join(STATUSES)))
+        try:
+            port = int(port)
+        except (TypeError, ValueError):
+            raise ValueError('Invalid port {}. Port must be within 0 to 65535'.format(port))
+        if not 0 <= port <= 65535:
+            raise ValueError('Invalid port {}. Port must be within 0 to 65535'.format(port))
+        if port >= len(self.__vector):
+            self.__vector.extend(bytes(port + 1 - len(self.__vector)))
+        if not self.__vector[port]:
+            self.__len += 1
+        self.__vector[port] = code
+        if code != _OPEN:
+            self.latencies.pop(port, None)
+
+    def __delitem__(self, port):
+        self[port]
+        port = int(port)
+        self.__vector[port] = 0
+        self.__len -= 1
+        self.latencies.pop(port, None)
+
+    def __contains__(self, port):
+        index = self.__index(port)
+        return index is not None and self.__vector[index] != 0
+
+    def __index(self, port):
+        """
+        Return the index of port in the status vector, or None if it is out of the vector.
+        """
+        try:
+            port = int(port)
+        except (TypeError, ValueError):
+            return None
+        return port if 0 <= port < len(self.__vector) else None
+
+    def __iter__(self):
+        for port, code in enumerate(self.__vector):
+            if code:
+                yield port
+
+    def __len__(self):
+        return self.__len
+
+    def __repr__(self):
+        return 'ScanResult({} ports, open: {})'.format(self.__len, self.open_ports())
+
+    def to_bytes(self):
+        """
+        Serialize the result, see from_bytes().
+
+        :rtype: bytes
+        """
+        vector = zlib.compress(bytes(self.__vector))
+        ports = array('H', self.latencies)
+        latencies = array('f', (self.latencies[port] for port in ports))
+        header = _header.pack(_MAGIC, _VERSION, len(self.__vector), len(vector), len(ports))
+        return header + vector + ports.tobytes() + latencies.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Build back a result serialized by to_bytes().
+        """
+        magic, version, size, vector_size, open_count = _header.unpack_from(data)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError('Invalid serialized ScanResult')
+        result = cls()
+        offset = _header.size
+        vector = bytearray(zlib.decompress(data[offset:offset + vector_size]))
+        if len(vector) != size:
+            raise ValueError('Invalid serialized ScanResult')
+        result.__vector = vector
+        result.__len = size - vector.count(0)
+        offset += vector_size
+        ports = array('H')
+        ports.frombytes(data[offset:offset + open_count * ports.itemsize])
+        offset += open_count * ports.itemsize
+        latencies = array('f')
+        latencies.frombytes(data[offset:offset + open_count * latencies.itemsize])
+        result.latencies = dict(zip(ports, latencies))
+        return result
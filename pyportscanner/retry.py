@@ -0,0 +1,60 @@
+import time
+
+
+class RetryPolicy(object):
+    """
+    Retransmission policy of the probes that got no reply.
+
+    A port whose probe timed out is reported 'FILTERED' rather than 'CLOSE', since the probe
+    or its reply may just have been dropped. Once a round of probes is over, only the filtered
+    ports are probed again, after a backoff delay growing by multiplier at every round, until
+    they answer or retries rounds are done. Refused ports are never probed again.
+    """
+    def __init__(self, retries=2, backoff=0.5, multiplier=2.0):
+        """
+        :param retries: maximum number of times a filtered port is probed again.
+        :type retries: int
+        :param backoff: delay in seconds before the first retransmission round.
+        :param multiplier: factor applied to the delay at every following round.
+        """
+        if retries < 0 or backoff < 0 or multiplier < 1:
+            raise ValueError(
+                'Invalid retry policy. Retries and backoff must not be negative and multiplier must be at least 1'
+            )
+        self.retries = retries
+        self.backoff = backoff
+        self.multiplier = multiplier
+
+    def delay(self, attempt):
+        """
+        Return the delay in seconds before the retransmission round number attempt, starting at 1.
+        """
+        return self.backoff * self.multiplier ** (attempt - 1)
+
+    def run(self, probe, jobs, deadline=None):
+        """
+        Probe jobs, then probe the filtered ones again round after round.
+
+        :param probe: callable(jobs) returning an iterable of (ip, port, status, latency) tuples.
+        :param jobs: iterable of (ip, port) tuples, consumed lazily by the first round.
+        :param deadline: optional time.monotonic() time after which no round is started.
+        :return: generator of (ip, port, status, latency) tuples, yielded once per job with its final status.
+        """
+        results = probe(jobs)
+        for attempt in range(1, self.retries + 1):
+            filtered = []
+            for result in results:
+                if result[2] == 'FILTERED':
+                    filtered.append(result)
+                else:
+                    yield result
+            if not filtered:
+                return
+            if deadline is not None and time.monotonic() + self.delay(attempt) >= deadline:
+                results = filtered
+                break
+            time.sleep(self.delay(attempt))
+            results = probe([result[:2] for result in filtered])
+
+        for result in results:
+            yield result
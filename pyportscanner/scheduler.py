@@ -0,0 +1,120 @@
+import random
+
+
+def _is_prime(n):
+    """
+    Deterministic Miller-Rabin primality test, exact for n < 3.3e24.
+    """
+    if n < 2:
+        return False
+    bases = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37)
+    for p in bases:
+        if n % p == 0:
+            return n == p
+    d, s = n - 1, 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    for a in bases:
+        x = pow(a, d, n)
+        if x in (1, n - 1):
+            continue
+        for _ in range(s - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+
+def _prime_factors(n):
+    factors = set()
+    d = 2
+    while d * d <= n:
+        while n % d == 0:
+            factors.add(d)
+            n //= d
+        d += 1 if d == 2 else 2
+    if n > 1:
+        factors.add(n)
+    return factors
+
+
+class CyclicPermutation(object):
+    """
+    Pseudo random permutation of range(n), generated lazily in constant memory.
+
+    The multiplicative group of integers modulo a prime p > n is cyclic: starting from any
+    element and repeatedly multiplying by a generator g visits each of 1..p-1 exactly once.
+    Shifting these values to 0..p-2 and skipping the ones not lower than n gives a permutation
+    of range(n). The generator and the starting point are drawn from the seed.
+    """
+    def __init__(self, n, seed=None):
+        """
+        :param n: the size of the permuted range.
+        :param seed: the seed of the permutation, the same seed always giving the same order.
+        """
+        self.n = n
+        rng = random.Random(seed)
+        self.prime = n + 1
+        while not _is_prime(self.prime):
+            self.prime += 1
+        self.generator = self.__generator(self.prime, rng)
+        self.start = rng.randrange(1, self.prime) if self.prime > 2 else 1
+
+    def __len__(self):
+        return self.n
+
+    def __iter__(self):
+        prime, generator, n = self.prime, self.generator, self.n
+        x = self.start
+        for _ in range(prime - 1):
+            if x <= n:
+                yield x - 1
+            x = x * generator % prime
+
+    @staticmethod
+    def __generator(prime, rng):
+        """
+        Draw a primitive root modulo prime.
+        """
+        if prime == 2:
+            return 1
+        factors = _prime_factors(prime - 1)
+        while True:
+            g = rng.randrange(2, prime)
+            if all(pow(g, (prime - 1) // q, prime) != 1 for q in factors):
+                return g
+
+
+class InterleavedScheduler(object):
+    """
+    Order the (ip, port) probes of a scan as a seeded pseudo random permutation of the
+    (host, port) space, instead of sweeping the ports of each host in increasing order.
+
+    Consecutive probes hit different hosts and unrelated ports, so every target sees a rate
+    of probes divided by the number of hosts, and no sequential sweep that trips IDS or SYN
+    flood protections, while the total throughput is unchanged. The permutation is walked
+    lazily, see CyclicPermutation, so the (host, port) pairs are never materialized.
+    """
+    def __init__(self, seed=None):
+        """
+        :param seed: the seed of the permutations, default to a random seed drawn once, so that
+        every scan of the same scheduler probes in the same order.
+        """
+        self.seed = seed if seed is not None else random.getrandbits(64)
+
+    def jobs(self, ips, ports):
+        """
+        Generate the (ip, port) probes of every ip and every port.
+
+        :param ips: sequence of IPv4 addresses.
+        :param ports: sequence of ports, which only needs to support len() and indexing,
+        e.g. a list or a PortSpec.
+        :return: generator of (ip, port) tuples.
+        """
+        hosts = len(ips)
+        for index in CyclicPermutation(hosts * len(ports), self.seed):
+            port_index, host_index = divmod(index, hosts)
+            yield ips[host_index], ports[port_index]
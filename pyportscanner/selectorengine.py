@@ -0,0 +1,184 @@
+import errno
+import heapq
+import itertools
+import os
+import selectors
+import socket
+import time
+from socket import error as socket_error
+
+from pyportscanner.concurrency import EXHAUSTED, ConcurrencyWindow
+from pyportscanner.result import NO_REPLY, connect_status
+
+
+# connect_ex() results meaning that a non-blocking handshake has been started
+_IN_PROGRESS = {errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY}
+if hasattr(errno, 'WSAEWOULDBLOCK'):
+    _IN_PROGRESS.add(errno.WSAEWOULDBLOCK)
+
+
+class SelectorEngine(object):
+    """
+    Single threaded scan engine built on the selectors module (epoll/kqueue/select).
+
+    Non-blocking sockets are opened in batches and connect_ex() is issued on each of them.
+    Handshakes that are still in progress are registered for writability, and the outcome
+    is read from SO_ERROR once the socket becomes writable. No thread or future is created
+    per port, so the number of probes in flight is only bounded by max_in_flight.
+    """
+    def __init__(self, max_in_flight, timeout, batch_size=256, timing=None, window=None, classify=connect_status):
+        """
+        :param max_in_flight: maximum number of handshakes pending at the same time.
+        :type max_in_flight: int
+        :param timeout: the time in seconds a handshake is given before the port is considered filtered.
+        :type timeout: int
+        :param batch_size: number of sockets opened between two polls of the selector.
+        :type batch_size: int
+        :param timing: optional AdaptiveTiming giving the timeout of each probe instead of timeout.
+        :type timing: AdaptiveTiming
+        :param window: optional ConcurrencyWindow adjusting the handshakes pending at the same
+        time, within max_in_flight.
+        :type window: ConcurrencyWindow
+        :param classify: callable(errno) translating the result of a handshake to a port status,
+        default to connect_status().
+        """
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.timing = timing
+        self.window = window
+        self.classify = classify
+
+    def run(self, jobs, context=None, deadline=None):
+        """
+        Probe (ip, port) jobs and yield the results as they complete.
+
+        :param jobs: iterable of (ip, port) tuples to be checked, consumed lazily.
+        :param context: optional ProbeContext sending the scanning alert message before each
+        probe and over open connections.
+        :type context: ProbeContext
+        :param deadline: optional time.monotonic() time at which the probes still pending are
+        cancelled and the generator stops.
+        :return: generator of (ip, port, status, latency) tuples, status can be 'OPEN', 'CLOSE'
+        or 'FILTERED' if the handshake got no reply, and latency is the time in seconds the probe took.
+        """
+        window = self.window or ConcurrencyWindow(self.max_in_flight)
+        selector = selectors.DefaultSelector()
+        # sock -> (address, start time) of every handshake still pending
+        pending = dict()
+        # heap of (deadline, sequence number, sock), timeouts may differ from a probe to another
+        deadlines = []
+        sequence = itertools.count()
+        jobs = iter(jobs)
+        exhausted = False
+        deferred = None
+
+        try:
+            while deadline is None or time.monotonic() < deadline:
+                opened = 0
+                while not exhausted and window.available() and opened < self.batch_size:
+                    if deferred is not None:
+                        address, deferred = deferred, None
+                    else:
+                        job = next(jobs, None)
+                        if job is None:
+                            exhausted = True
+                            break
+                        address = (job[0], int(job[1]))
+                    window.acquire()
+                    try:
+                        TCP_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                    except socket_error as e:
+                        # Out of file descriptors. Back off and wait for pending probes to
+                        # release some before trying this address again.
+                        window.release(exhausted=True)
+                        if not pending or e.errno not in EXHAUSTED:
+                            raise
+                        deferred = address
+                        break
+                    opened += 1
+                    TCP_sock.setblocking(False)
+                    if context is not None:
+                        context.notify(address)
+                    timeout = self.timing.timeout_for(address[0]) if self.timing else self.timeout
+                    start_time = time.monotonic()
+                    result = TCP_sock.connect_ex(address)
+                    if result in EXHAUSTED:
+                        # out of buffers or local ports, not a closed port
+                        TCP_sock.close()
+                        window.release(exhausted=True)
+                        if not pending:
+                            raise OSError(result, os.strerror(result))
+                        deferred = address
+                        break
+                    if result in _IN_PROGRESS:
+                        pending[TCP_sock] = (address, start_time)
+                        heapq.heappush(deadlines, (start_time + timeout, next(sequence), TCP_sock))
+                        selector.register(TCP_sock, selectors.EVENT_WRITE)
+                    else:
+                        status = self.__finish(TCP_sock, result, context)
+                        latency = time.monotonic() - start_time
+                        window.release(latency)
+                        yield address[0], address[1], status, latency
+
+                if not pending:
+                    if exhausted:
+                        break
+                    continue
+
+                if exhausted or deferred is not None or not window.available():
+                    wait = max(0, deadlines[0][0] - time.monotonic())
+                else:
+                    # more ports are waiting to be opened, only collect what is ready
+                    wait = 0
+                if deadline is not None:
+                    wait = max(0, min(wait, deadline - time.monotonic()))
+
+                for key, _ in selector.select(wait):
+                    TCP_sock = key.fileobj
+                    selector.unregister(TCP_sock)
+                    address, start_time = pending.pop(TCP_sock)
+                    result = TCP_sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                    latency = time.monotonic() - start_time
+                    if result not in NO_REPLY:
+                        if self.timing:
+                            self.timing.observe(address[0], latency)
+                        window.release(latency)
+                    else:
+                        window.release()
+                    status = self.__finish(TCP_sock, result, context)
+                    yield address[0], address[1], status, latency
+
+                now = time.monotonic()
+                while deadlines and (deadlines[0][0] <= now or deadlines[0][2] not in pending):
+                    _, _, TCP_sock = heapq.heappop(deadlines)
+                    if TCP_sock in pending:
+                        selector.unregister(TCP_sock)
+                        address, start_time = pending.pop(TCP_sock)
+                        TCP_sock.close()
+                        window.release()
+                        yield address[0], address[1], 'FILTERED', now - start_time
+        finally:
+            for TCP_sock in pending:
+                selector.unregister(TCP_sock)
+                TCP_sock.close()
+            selector.close()
+
+    def __finish(self, TCP_sock, result, context):
+        """
+        Close a probed socket and translate its connect result to a port status.
+
+        :param TCP_sock: the socket used for the probe.
+        :param result: the errno of the handshake, 0 on success.
+        :param context: optional ProbeContext holding the encoded message to be sent over open connections.
+        :return: 'OPEN', 'CLOSE' or 'FILTERED'
+        """
+        try:
+            if result == 0 and context is not None and context.payload:
+                try:
+                    TCP_sock.send(context.payload)
+                except socket_error:
+                    pass
+        finally:
+            TCP_sock.close()
+        return self.classify(result)
@@ -0,0 +1,217 @@
+import itertools
+import multiprocessing
+import os
+import queue
+import time
+
+from pyportscanner.pyscanner import PortScanner
+from pyportscanner.result import ScanResult
+
+
+# number of results a worker process sends to the parent process at once
+_BATCH_SIZE = 256
+# time in seconds the parent process waits for results before handing out more units
+_POLL_INTERVAL = 0.05
+# marks the end of the units of work handed out to the workers
+_DONE = object()
+
+
+def _worker(config, message, units, results):
+    """
+    Probe the units of work of the units queue with a single streaming PortScanner, until it
+    gets None, and put the results on the results queue in batches, followed by None.
+    Results are sent before waiting for more work, so that none is held back by an idle worker.
+    """
+    batch = []
+
+    def send():
+        if batch:
+            # the queue pickles the batch later, in its feeder thread
+            results.put(list(batch))
+            del batch[:]
+
+    def jobs():
+        while True:
+            try:
+                unit = units.get_nowait()
+            except queue.Empty:
+                send()
+                unit = units.get()
+            if unit is None:
+                return
+            ip, ports = unit
+            for port in ports:
+                yield ip, port
+
+    try:
+        # the hosts are filtered by the host discovery of the parent process
+        scanner = PortScanner([], discovery=False, **config)
+        for result in scanner.probe_iter(jobs(), message):
+            batch.append(result)
+            if len(batch) >= _BATCH_SIZE:
+                send()
+        send()
+    except Exception as e:
+        results.put(e)
+    results.put(None)
+
+
+class ShardedScanner(object):
+    """
+    Spread the (host, port) space of a scan over several processes, each one running its own
+    PortScanner engine, to use more than one core.
+
+    Every worker process keeps a single streaming scan running for the whole scan, fed with
+    units of at most chunk_size ports of a single host from a shared queue: a worker pulls the
+    next unit as soon as its engine has room for more probes, without waiting for the probes
+    of the previous unit to finish. A slow host therefore only holds the probes sent to it,
+    instead of stalling a statically assigned shard.
+    """
+    def __init__(self, target_ports=None, thread_limit=100, timeout=10, engine='thread', workers=None,
+                 chunk_size=None, timing=None, retry=None, rate=None, discovery=True, protocol=None):
+        """
+        :param target_ports: the ports to be scanned, see PortScanner.
+        :param thread_limit: the number of probes in flight in each worker process.
+        :param timeout: the connection timeout in seconds.
+        :param engine: the engine of the worker scanners, see PortScanner.
+        :param workers: the number of worker processes, default to the number of cores.
+        :type workers: int
+        :param chunk_size: the maximum number of ports in a unit of work, default to thread_limit.
+        :type chunk_size: int
+        :param timing: the timing of the worker scanners, see PortScanner. An AdaptiveTiming is
+        copied into every worker, which adapts its own copy.
+        :param retry: the retry policy of the worker scanners, see PortScanner.
+        :param rate: the rate of the worker scanners, see PortScanner. A number of probes per
+        second is the rate of the whole scan, shared evenly by the workers, while a RateController
+        is copied into every worker.
+        :param discovery: the host discovery run by the parent process, see PortScanner.
+        :param protocol: the protocol of the probes, see PortScanner.
+        """
+        self.__scanner = PortScanner(target_ports, thread_limit, timeout, engine=engine, timing=timing, retry=retry,
+                                     rate=rate, discovery=discovery, protocol=protocol)
+        self.workers = workers or os.cpu_count() or 1
+        if isinstance(rate, (int, float)) and not isinstance(rate, bool):
+            rate = rate / self.workers
+        self.__config = dict(thread_limit=thread_limit, timeout=timeout, engine=engine, timing=timing, retry=retry,
+                             rate=rate, protocol=self.__scanner.protocol)
+        self.chunk_size = chunk_size or self.__scanner.thread_limit
+        self.stats = None
+
+    def get_target_ports(self):
+        return self.__scanner.get_target_ports()
+
+    def scan_many(self, targets, message='', force_scan=False):
+        """
+        Same as PortScanner.scan_many(), with the probes spread over the worker processes.
+        The host discovery runs in the parent process.
+
+        :return: a dict of {host: ScanResult}. Hosts that cannot be resolved or seem down are mapped
+        to an empty ScanResult.
+        :rtype: dict
+        """
+        output = dict()
+        hosts_by_ip = dict()
+        resolved = list()
+        for host, ip in self.__scanner.resolve_many(targets):
+            if ip is None:
+                output[host] = ScanResult()
+            elif ip in hosts_by_ip:
+                output[host] = output[hosts_by_ip[ip]]
+            else:
+                hosts_by_ip[ip] = host
+                output[host] = ScanResult()
+                resolved.append(ip)
+
+        discovery = self.__scanner.discovery
+        if discovery and not force_scan:
+            resolved = list(discovery.filter(resolved))
+        for ip in resolved:
+            output[hosts_by_ip[ip]].fill(self.get_target_ports())
+
+        for ip, port, status, latency in self.scan_many_iter(resolved, message, force_scan=True):
+            output[hosts_by_ip[ip]].set(port, status, latency)
+
+        return output
+
+    def scan_many_iter(self, targets, message='', force_scan=False):
+        """
+        Same as PortScanner.scan_many_iter(), with the probes spread over the worker processes.
+        Results are merged in the parent process as the workers finish their units.
+
+        After the generator is exhausted, stats holds a dict with the number of workers, probes,
+        seconds and probes per second of the scan.
+
+        :return: generator of (ip, port, status, latency) tuples in completion order.
+        """
+        # the units of work, followed by the None telling each worker to stop
+        units = itertools.chain(self.__units(targets, force_scan), itertools.repeat(None, self.workers))
+        probes = 0
+        start_time = time.perf_counter()
+        # keep a couple of units queued per worker, so that none of them waits for work
+        # while units are still pulled lazily from the targets
+        unit_queue = multiprocessing.Queue(self.workers * 2)
+        result_queue = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=_worker, args=(self.__config, message, unit_queue, result_queue),
+                                             daemon=True)
+                     for _ in range(self.workers)]
+        for process in processes:
+            process.start()
+        try:
+            running = self.workers
+            unit = next(units, _DONE)
+            while running:
+                while unit is not _DONE:
+                    try:
+                        unit_queue.put_nowait(unit)
+                    except queue.Full:
+                        break
+                    unit = next(units, _DONE)
+                try:
+                    results = result_queue.get(timeout=_POLL_INTERVAL)
+                except queue.Empty:
+                    if not any(process.is_alive() for process in processes):
+                        raise RuntimeError('Worker processes exited unexpectedly')
+                    continue
+                if results is None:
+                    running -= 1
+                    continue
+                if isinstance(results, Exception):
+                    raise results
+                probes += len(results)
+                for result in results:
+                    yield result
+        finally:
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+                process.join()
+            unit_queue.close()
+            result_queue.close()
+
+        elapsed = time.perf_counter() - start_time
+        self.stats = {
+            'workers': self.workers,
+            'probes': probes,
+            'seconds': elapsed,
+            'probes_per_second': probes / elapsed if elapsed else 0.0,
+        }
+
+    def __units(self, targets, force_scan=False):
+        """
+        Generate the (ip, ports) units of work of every resolved target that answered the host discovery.
+        """
+        seen = set()
+        ips = (ip for host, ip in self.__scanner.resolve_many(targets) if ip is not None)
+        discovery = self.__scanner.discovery
+        if discovery and not force_scan:
+            ips = discovery.filter(ips)
+        for ip in ips:
+            if ip in seen:
+                continue
+            seen.add(ip)
+            ports = iter(self.get_target_ports())
+            while True:
+                chunk = list(itertools.islice(ports, self.chunk_size))
+                if not chunk:
+                    break
+                yield ip, chunk
@@ -0,0 +1,199 @@
+import csv
+import json
+from abc import ABC, abstractmethod
+import math
+import socket
+import struct
+
+from pyportscanner.result import STATUSES
+
+# magic, version
+_header = struct.Struct('<4sH')
+_MAGIC = b'PPSO'
+_VERSION = 1
+# address, port, status code, latency in seconds (NaN if unknown)
+_record = struct.Struct('<IHBf')
+_codes = {status: code for code, status in enumerate(STATUSES, 1)}
+
+CSV_FIELDS = ('ip', 'port', 'status', 'latency')
+
+
+class ResultSink(ABC):
+    """
+    Output written incrementally as probes finish.
+
+    Results are buffered and written in bulk every buffer_size results, so that a scan of any
+    number of hosts holds at most buffer_size results in memory. Subclasses implement
+    _write_records() to write a list of records, (ip, port, status, latency) tuples unless
+    they override _record().
+    """
+    def __init__(self, buffer_size=4096):
+        """
+        :param buffer_size: the number of results buffered between two writes.
+        """
+        self.buffer_size = buffer_size
+        self.count = 0
+        self.__buffer = []
+
+    def write(self, ip, port, status, latency=None):
+        """
+        Buffer the result of a probe, writing the buffer once it is full.
+        """
+        self.__buffer.append(self._record(ip, port, status, latency))
+        self.count += 1
+        if len(self.__buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered results.
+        """
+        if self.__buffer:
+            self._write_records(self.__buffer)
+            self.__buffer = []
+
+    def close(self):
+        """
+        Write the buffered results and release the output.
+        """
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _record(self, ip, port, status, latency):
+        """
+        Return the record of a result, buffered until the next write.
+        """
+        return ip, port, status, latency
+
+    @abstractmethod
+    def _write_records(self, records):
+        """
+        Write a list of records.
+        """
+
+
+class FileSink(ResultSink):
+    """
+    Sink writing to a file. Subclasses implement _start() to write a header and
+    _write_records() to serialize the results.
+    """
+    mode = 'w'
+
+    def __init__(self, output, buffer_size=4096):
+        """
+        :param output: the path of the output file, created or truncated, or an open file object.
+        The sink closes the file only if it opened it.
+        :param buffer_size: the number of results buffered between two writes.
+        """
+        super().__init__(buffer_size)
+        if isinstance(output, str):
+            newline = '' if 'b' not in self.mode else None
+            self.file = open(output, self.mode, newline=newline)
+            self.__owned = True
+        else:
+            self.file = output
+            self.__owned = False
+        self._start()
+
+    def flush(self):
+        super().flush()
+        self.file.flush()
+
+    def close(self):
+        """
+        Write the buffered results and close the output if the sink opened it.
+        """
+        self.flush()
+        if self.__owned:
+            self.file.close()
+
+    def _start(self):
+        """
+        Write the header of the output, if any.
+        """
+
+
+class JsonLinesSink(FileSink):
+    """
+    One JSON object per line: {"ip": ..., "port": ..., "status": ..., "latency": ...}.
+    """
+    def _write_records(self, records):
+        self.file.write(''.join(
+            json.dumps(dict(zip(CSV_FIELDS, record))) + '\n' for record in records
+        ))
+
+
+class CsvSink(FileSink):
+    """
+    CSV rows of ip, port, status and latency, after a header row. Unknown latencies are empty.
+    """
+    def _start(self):
+        self.__writer = csv.writer(self.file)
+        self.__writer.writerow(CSV_FIELDS)
+
+    def _write_records(self, records):
+        self.__writer.writerows(records)
+
+
+class BinarySink(FileSink):
+    """
+    Fixed size records of 11 bytes: IPv4 address, port, status code and latency as a float,
+    after a 6 bytes header. See read_binary().
+    """
+    mode = 'wb'
+
+    def _start(self):
+        self.file.write(_header.pack(_MAGIC, _VERSION))
+
+    def _write_records(self, records):
+        self.file.write(b''.join(
+            _record.pack(struct.unpack('!I', socket.inet_aton(ip))[0], port, _codes[status],
+                         math.nan if latency is None else latency)
+            for ip, port, status, latency in records
+        ))
+
+
+def read_binary(source, chunk_size=4096):
+    """
+    Read back the results written by a BinarySink, chunk_size records at a time.
+
+    :param source: the path of the file, or a binary file object.
+    :return: generator of (ip, port, status, latency) tuples, latency being None if unknown.
+    """
+    if isinstance(source, str):
+        with open(source, 'rb') as binary_file:
+            for result in read_binary(binary_file, chunk_size):
+                yield result
+        return
+
+    if source.read(_header.size) != _header.pack(_MAGIC, _VERSION):
+        raise ValueError('Invalid binary results')
+    while True:
+        data = source.read(_record.size * chunk_size)
+        if not data:
+            return
+        for address, port, code, latency in _record.iter_unpack(data[:len(data) - len(data) % _record.size]):
+            yield (socket.inet_ntoa(struct.pack('!I', address)), port, STATUSES[code - 1],
+                   None if math.isnan(latency) else latency)
+
+
+def open_sink(path, buffer_size=4096):
+    """
+    Return the sink matching the extension of path: .jsonl or .json for JSON Lines, .csv for
+    CSV, .db or .sqlite for a ResultStore, anything else for binary records.
+    """
+    extension = path.rsplit('.', 1)[-1].lower() if '.' in path else ''
+    if extension in ('db', 'sqlite', 'sqlite3'):
+        # the store module depends on this one
+        from pyportscanner.store import ResultStore
+        return ResultStore(path, buffer_size)
+    if extension in ('jsonl', 'json'):
+        return JsonLinesSink(path, buffer_size)
+    if extension == 'csv':
+        return CsvSink(path, buffer_size)
+    return BinarySink(path, buffer_size)
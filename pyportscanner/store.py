@@ -0,0 +1,129 @@
+import ipaddress
+import sqlite3
+import time
+from collections import namedtuple
+
+from pyportscanner.result import STATUSES
+from pyportscanner.sinks import ResultSink
+
+# a stored probe result, time being the epoch time in seconds it was given to the store
+Record = namedtuple('Record', ['time', 'ip', 'port', 'status', 'latency'])
+
+_codes = {status: code for code, status in enumerate(STATUSES, 1)}
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS results (
+    time REAL NOT NULL,
+    ip INTEGER NOT NULL,
+    port INTEGER NOT NULL,
+    status INTEGER NOT NULL,
+    latency REAL
+);
+CREATE INDEX IF NOT EXISTS results_port ON results (port, status, time);
+CREATE INDEX IF NOT EXISTS results_ip ON results (ip, time);
+CREATE INDEX IF NOT EXISTS results_time ON results (time);
+'''
+
+
+class ResultStore(ResultSink):
+    """
+    Indexed SQLite history of scan results, usable as the sink of a PortScanner.
+
+    Every result is stored with the time it was given to the store, addresses being stored as
+    integers.
+    Buffered results are inserted in a single transaction every buffer_size results, and the
+    indexes on (port, status, time), (ip, time) and time keep queries across millions of
+    records to an index range scan.
+    """
+    def __init__(self, path, buffer_size=4096):
+        """
+        :param path: the path of the database file, created if it does not exist, or ':memory:'.
+        :param buffer_size: the number of results buffered between two transactions.
+        """
+        super().__init__(buffer_size)
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        """
+        Write the buffered results and close the database.
+        """
+        self.flush()
+        self.connection.close()
+
+    def _record(self, ip, port, status, latency):
+        # the time the result arrived rather than the time its buffer is written
+        return time.time(), ip, port, status, latency
+
+    def _write_records(self, records):
+        with self.connection:
+            self.connection.executemany(
+                'INSERT INTO results (time, ip, port, status, latency) VALUES (?, ?, ?, ?, ?)',
+                ((when, int(ipaddress.IPv4Address(ip)), port, _codes[status], latency)
+                 for when, ip, port, status, latency in records)
+            )
+
+    def query(self, ip=None, port=None, status=None, since=None, until=None):
+        """
+        Return the stored results matching every given criterion, in time order.
+        Buffered results are written first.
+
+        :param ip: an IPv4 address or a network such as '10.0.0.0/24'.
+        :param port: a port number.
+        :param status: 'OPEN', 'CLOSE' or 'FILTERED'.
+        :param since: the epoch time in seconds of the oldest results.
+        :param until: the epoch time in seconds after which results are excluded.
+        :return: generator of Records.
+        """
+        where, parameters = self.__where(ip, port, status, since, until)
+        cursor = self.connection.execute(
+            'SELECT time, ip, port, status, latency FROM results{} ORDER BY time'.format(where), parameters
+        )
+        for when, address, port_number, code, latency in cursor:
+            yield Record(when, str(ipaddress.IPv4Address(address)), port_number, STATUSES[code - 1], latency)
+
+    def hosts(self, port, status='OPEN', since=None, until=None):
+        """
+        Return the hosts that had port in the given status at any point of the time range, e.g.
+        the hosts with 3389 open this week with hosts(3389, since=time.time() - 7 * 86400).
+
+        :return: a list of IPv4 addresses in increasing order.
+        :rtype: list
+        """
+        where, parameters = self.__where(None, port, status, since, until)
+        cursor = self.connection.execute('SELECT DISTINCT ip FROM results{} ORDER BY ip'.format(where), parameters)
+        return [str(ipaddress.IPv4Address(address)) for address, in cursor]
+
+    def __len__(self):
+        self.flush()
+        return self.connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def __where(self, ip, port, status, since, until):
+        """
+        Return the WHERE clause and the parameters of a query.
+        """
+        self.flush()
+        clauses = []
+        parameters = []
+        if ip is not None:
+            network = ipaddress.IPv4Network(ip, strict=False)
+            clauses.append('ip BETWEEN ? AND ?')
+            parameters += [int(network.network_address), int(network.broadcast_address)]
+        if port is not None:
+            clauses.append('port = ?')
+            parameters.append(port)
+        if status is not None:
+            if status not in _codes:
+                raise ValueError('Invalid status {}. Status must be one of {}'.format(status, ', '.join(STATUSES)))
+            clauses.append('status = ?')
+            parameters.append(_codes[status])
+        if since is not None:
+            clauses.append('time >= ?')
+            parameters.append(since)
+        if until is not None:
+            clauses.append('time <= ?')
+            parameters.append(until)
+        return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), parameters
@@ -0,0 +1,282 @@
+import errno
+import heapq
+import itertools
+import os
+import random
+import select
+import socket
+import struct
+import time
+import zlib
+from socket import error as socket_error
+
+from pyportscanner.concurrency import ConcurrencyWindow
+from pyportscanner.result import connect_status
+
+
+# TCP flags
+FIN = 0x01
+SYN = 0x02
+RST = 0x04
+ACK = 0x10
+
+# source port, destination port, sequence number, acknowledgment number, data offset,
+# flags, window, checksum, urgent pointer
+_tcp_header = struct.Struct('!HHIIBBHHH')
+# source address, destination address, zero, protocol, TCP length
+_pseudo_header = struct.Struct('!4s4sBBH')
+# first bytes of an IPv4 header: version and header length, protocol and addresses are read from it
+_IP_MIN_SIZE = 20
+# receive buffer in bytes of the raw socket, which also gets a copy of every TCP segment of the
+# host: with the default one, replies are dropped during bursts and reported as filtered
+RECEIVE_BUFFER = 4 << 20
+
+
+def syn_available():
+    """
+    Return True if the process is allowed to open raw sockets (root or CAP_NET_RAW).
+    """
+    try:
+        raw_sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_TCP)
+    except (PermissionError, OSError, AttributeError):
+        return False
+    raw_sock.close()
+    return True
+
+
+def checksum(data):
+    """
+    Return the 16 bits one's complement checksum of data, as used by IP and TCP headers.
+    """
+    if len(data) % 2:
+        data += b'\0'
+    total = sum(struct.unpack('!{}H'.format(len(data) // 2), data))
+    while total >> 16:
+        total = (total & 0xffff) + (total >> 16)
+    return ~total & 0xffff
+
+
+def syn_packet(source, destination, source_port, destination_port, sequence):
+    """
+    Build the TCP header of a SYN segment. The IP header is added by the kernel.
+
+    :param source: the IPv4 address the segment is sent from.
+    :param destination: the IPv4 address the segment is sent to.
+    :rtype: bytes
+    """
+    header = _tcp_header.pack(source_port, destination_port, sequence, 0, 5 << 4, SYN, 1024, 0, 0)
+    pseudo = _pseudo_header.pack(socket.inet_aton(source), socket.inet_aton(destination), 0,
+                                 socket.IPPROTO_TCP, len(header))
+    return header[:16] + struct.pack('!H', checksum(pseudo + header)) + header[18:]
+
+
+def parse_reply(packet):
+    """
+    Parse an IPv4 packet received on a raw TCP socket.
+
+    :return: a tuple of (source address, source port, destination port, acknowledgment number,
+    flags), or None if the packet is not a TCP segment.
+    """
+    if len(packet) < _IP_MIN_SIZE or packet[0] >> 4 != 4 or packet[9] != socket.IPPROTO_TCP:
+        return None
+    offset = (packet[0] & 0x0f) * 4
+    if len(packet) < offset + _tcp_header.size:
+        return None
+    source_port, destination_port, _, ack, _, flags, _, _, _ = _tcp_header.unpack_from(packet, offset)
+    return socket.inet_ntoa(packet[12:16]), source_port, destination_port, ack, flags
+
+
+class SynEngine(object):
+    """
+    Half-open (SYN) scan engine built on raw sockets, requiring root or CAP_NET_RAW.
+
+    SYN segments are built in user space and sent through a single raw socket, and one receiver
+    loop reads the replies from the same socket: a SYN-ACK means the port is open, a RST that
+    it is closed, and no reply before the timeout that it is filtered. No connection is ever
+    established, the kernel resetting the half-open ones since no socket owns them, so a probe
+    costs neither a file descriptor nor a full handshake and teardown.
+
+    The sequence number of every probe is a keyed hash of its address, so replies are matched
+    to probes by their acknowledgment number and stray segments are ignored.
+    """
+    def __init__(self, max_in_flight, timeout, batch_size=256, timing=None, window=None):
+        """
+        :param max_in_flight: maximum number of probes waiting for a reply at the same time.
+        :param timeout: the time in seconds a probe is given before the port is considered filtered.
+        :param batch_size: number of segments sent between two reads of the replies.
+        :param timing: optional AdaptiveTiming giving the timeout of each probe instead of timeout.
+        :param window: optional ConcurrencyWindow adjusting the probes in flight, within max_in_flight.
+        """
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self.timing = timing
+        self.window = window
+        self.source_port = random.randint(32768, 60999)
+        self.__secret = os.urandom(8)
+        # {destination address: source address}
+        self.__sources = dict()
+
+    def run(self, jobs, context=None, deadline=None):
+        """
+        Probe (ip, port) jobs.
+
+        :param jobs: iterable of (ip, port) tuples, consumed lazily.
+        :param context: optional ProbeContext sending the scanning alert message before each probe.
+        SYN segments carry no payload.
+        :param deadline: optional time.monotonic() time at which the generator stops.
+        :return: generator of (ip, port, status, latency) tuples in completion order.
+        """
+        window = self.window or ConcurrencyWindow(self.max_in_flight)
+        raw_sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_TCP)
+        raw_sock.setblocking(False)
+        try:
+            raw_sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RECEIVE_BUFFER)
+        except socket_error:
+            pass
+        # (ip, port) -> start time of every probe waiting for a reply
+        pending = dict()
+        # heap of (deadline, sequence number, (ip, port)), timeouts may differ from a probe to another
+        deadlines = []
+        counter = itertools.count()
+        # {(ip, port): number of duplicate jobs} of probes in flight, given the result of the first one
+        duplicates = dict()
+        jobs = iter(jobs)
+        exhausted = False
+
+        def with_duplicates(result):
+            return [result] * (1 + duplicates.pop(result[:2], 0))
+
+        try:
+            while deadline is None or time.monotonic() < deadline:
+                sent = 0
+                while not exhausted and window.available() and sent < self.batch_size:
+                    job = next(jobs, None)
+                    if job is None:
+                        exhausted = True
+                        break
+                    address = (job[0], int(job[1]))
+                    if address in pending:
+                        duplicates[address] = duplicates.get(address, 0) + 1
+                        continue
+                    window.acquire()
+                    if context is not None:
+                        context.notify(address)
+                    start_time = time.monotonic()
+                    status = self.__send(raw_sock, address)
+                    if status is not None:
+                        # the segment cannot be sent, e.g. to a broadcast address
+                        window.release()
+                        yield address[0], address[1], status, time.monotonic() - start_time
+                        continue
+                    sent += 1
+                    timeout = self.timing.timeout_for(address[0]) if self.timing else self.timeout
+                    pending[address] = start_time
+                    heapq.heappush(deadlines, (start_time + timeout, next(counter), address))
+
+                if not pending:
+                    if exhausted:
+                        break
+                    continue
+
+                if exhausted or not window.available():
+                    wait = max(0, deadlines[0][0] - time.monotonic())
+                else:
+                    wait = 0
+                if deadline is not None:
+                    wait = max(0, min(wait, deadline - time.monotonic()))
+
+                readable, _, _ = select.select([raw_sock], [], [], wait)
+                if readable:
+                    for result in self.__receive(raw_sock, pending, window):
+                        for duplicate in with_duplicates(result):
+                            yield duplicate
+
+                now = time.monotonic()
+                while deadlines and (deadlines[0][0] <= now or deadlines[0][2] not in pending):
+                    _, _, address = heapq.heappop(deadlines)
+                    start_time = pending.pop(address, None)
+                    if start_time is not None:
+                        window.release()
+                        for result in with_duplicates((address[0], address[1], 'FILTERED', now - start_time)):
+                            yield result
+        finally:
+            raw_sock.close()
+
+    def __send(self, raw_sock, address):
+        """
+        Send the SYN segment of the probe of address, waiting for room in the send buffer if needed.
+
+        :return: None if the segment was sent, otherwise the status of the port, as the connect
+        engines would report it.
+        """
+        packet = self.__packet(address)
+        while True:
+            try:
+                raw_sock.sendto(packet, (address[0], 0))
+                return None
+            except (BlockingIOError, InterruptedError):
+                pass
+            except socket_error as e:
+                if e.errno != errno.ENOBUFS:
+                    return connect_status(e.errno)
+            # the send buffer is full, wait for it to drain and try again
+            select.select([], [raw_sock], [], 0.01)
+
+    def __receive(self, raw_sock, pending, window):
+        """
+        Read every reply available on the raw socket and yield the results of the matched probes.
+        """
+        while True:
+            try:
+                packet = raw_sock.recv(65535)
+            except (BlockingIOError, InterruptedError):
+                return
+            reply = parse_reply(packet)
+            if reply is None:
+                continue
+            ip, port, destination_port, ack, flags = reply
+            address = (ip, port)
+            if destination_port != self.source_port or address not in pending:
+                continue
+            if ack != (self.__sequence(address) + 1) & 0xffffffff:
+                continue
+            if flags & (SYN | ACK) == SYN | ACK:
+                status = 'OPEN'
+            elif flags & RST:
+                status = 'CLOSE'
+            else:
+                continue
+            latency = time.monotonic() - pending.pop(address)
+            if self.timing:
+                self.timing.observe(ip, latency)
+            window.release(latency)
+            yield ip, port, status, latency
+
+    def __packet(self, address):
+        return syn_packet(self.__source(address[0]), address[0], self.source_port, address[1],
+                          self.__sequence(address))
+
+    def __sequence(self, address):
+        """
+        Return the sequence number of the probe of address, a keyed hash of the address.
+        """
+        return zlib.crc32(self.__secret + socket.inet_aton(address[0]) + struct.pack('!H', address[1]))
+
+    def __source(self, ip):
+        """
+        Return the local address the kernel routes packets to ip from.
+        """
+        source = self.__sources.get(ip)
+        if source is None:
+            UDP_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            try:
+                # connecting a UDP socket sends nothing, it only selects the route
+                UDP_sock.connect((ip, 9))
+                source = UDP_sock.getsockname()[0]
+            except socket_error:
+                source = '0.0.0.0'
+            finally:
+                UDP_sock.close()
+            self.__sources[ip] = source
+        return source
@@ -0,0 +1,106 @@
+import threading
+
+
+class RttEstimator(object):
+    """
+    Smoothed round trip time estimator of a single host, following RFC 6298.
+
+    Every sample updates the smoothed RTT (SRTT) and the RTT variation (RTTVAR), and the
+    timeout is SRTT + 4 * RTTVAR, kept within [min_timeout, max_timeout].
+    """
+    ALPHA = 1 / 8
+    BETA = 1 / 4
+    K = 4
+
+    def __init__(self, initial_timeout, min_timeout, max_timeout):
+        self.initial_timeout = initial_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.srtt = None
+        self.rttvar = None
+
+    def observe(self, rtt):
+        """
+        Update the estimation with the round trip time of a probe that got a reply.
+
+        :param rtt: round trip time in seconds.
+        """
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = (1 - self.BETA) * self.rttvar + self.BETA * abs(self.srtt - rtt)
+            self.srtt = (1 - self.ALPHA) * self.srtt + self.ALPHA * rtt
+
+    def timeout(self):
+        """
+        Return the time in seconds a probe should wait for a reply.
+        """
+        if self.srtt is None:
+            timeout = self.initial_timeout
+        else:
+            timeout = self.srtt + self.K * self.rttvar
+        return min(max(timeout, self.min_timeout), self.max_timeout)
+
+
+class AdaptiveTiming(object):
+    """
+    Adaptive probe timeouts, derived from the round trip times measured for each host.
+
+    Until a host answered a probe, its probes wait initial_timeout seconds. Then the timeout
+    follows the smoothed RTT and RTT variation of the host, see RttEstimator. Probes that time
+    out are not sampled, as their RTT is unknown.
+    """
+    def __init__(self, initial_timeout=1.0, min_timeout=0.1, max_timeout=10.0):
+        """
+        :param initial_timeout: timeout in seconds of the probes sent to a host before it answered one.
+        :param min_timeout: lower bound of the timeouts in seconds.
+        :param max_timeout: upper bound of the timeouts in seconds.
+        """
+        if not 0 < min_timeout <= max_timeout:
+            raise ValueError(
+                'Invalid timeout bounds {} and {}. '
+                'Bounds must be greater than 0 and min_timeout must not exceed max_timeout'.format(min_timeout, max_timeout)
+            )
+        self.initial_timeout = initial_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.__estimators = dict()
+        self.__lock = threading.Lock()
+
+    def __getstate__(self):
+        # locks cannot be copied to another process, e.g. a worker of a ShardedScanner
+        state = self.__dict__.copy()
+        del state['_AdaptiveTiming__lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.__lock = threading.Lock()
+
+    def timeout_for(self, ip):
+        """
+        Return the timeout in seconds of the next probe sent to ip.
+        """
+        estimator = self.__estimators.get(ip)
+        if estimator is None:
+            return min(max(self.initial_timeout, self.min_timeout), self.max_timeout)
+        with self.__lock:
+            return estimator.timeout()
+
+    def observe(self, ip, rtt):
+        """
+        Record the round trip time in seconds of a probe of ip that got a reply.
+        """
+        with self.__lock:
+            estimator = self.__estimators.get(ip)
+            if estimator is None:
+                estimator = RttEstimator(self.initial_timeout, self.min_timeout, self.max_timeout)
+                self.__estimators[ip] = estimator
+            estimator.observe(rtt)
+
+    def estimator(self, ip):
+        """
+        Return the RttEstimator of ip, or None if ip never answered.
+        """
+        return self.__estimators.get(ip)
@@ -0,0 +1,246 @@
+import errno
+import heapq
+import itertools
+import selectors
+import socket
+import struct
+import time
+from socket import error as socket_error
+
+from pyportscanner.concurrency import EXHAUSTED, ConcurrencyWindow
+
+
+def _dns_query():
+    # standard query of the A record of the root, recursion desired
+    return struct.pack('!HHHHHH', 0x5053, 0x0100, 1, 0, 0, 0) + b'\x00' + struct.pack('!HH', 1, 1)
+
+
+def _netbios_query():
+    # NBSTAT query of the wildcard name '*'
+    name = b'\x20' + b'CK' + b'A' * 30 + b'\x00'
+    return struct.pack('!HHHHHH', 0x5053, 0, 1, 0, 0, 0) + name + struct.pack('!HH', 0x21, 1)
+
+
+def _snmp_get():
+    # SNMPv1 get-request of sysDescr.0 with the 'public' community
+    oid = b'\x06\x08\x2b\x06\x01\x02\x01\x01\x01\x00'
+    varbind = b'\x30\x0c' + oid + b'\x05\x00'
+    pdu = b'\x02\x01\x01' + b'\x02\x01\x00' + b'\x02\x01\x00' + b'\x30\x0e' + varbind
+    message = b'\x02\x01\x00' + b'\x04\x06public' + b'\xa0' + bytes([len(pdu)]) + pdu
+    return b'\x30' + bytes([len(message)]) + message
+
+
+# payloads eliciting a reply from the services of common UDP ports, an open port running
+# another service usually drops a datagram it does not understand
+UDP_PAYLOADS = {
+    7: b'\r\n',
+    53: _dns_query(),
+    69: b'\x00\x01pyportscanner\x00octet\x00',
+    111: struct.pack('!IIIIII', 0x5053, 0, 2, 100000, 2, 0) + bytes(16),
+    123: b'\x1b' + bytes(47),
+    137: _netbios_query(),
+    161: _snmp_get(),
+    500: bytes(8) + bytes(8) + b'\x01\x10\x02\x00' + bytes(4) + struct.pack('!I', 28),
+    1900: b'M-SEARCH * HTTP/1.1\r\nHOST: 239.255.255.250:1900\r\nMAN: "ssdp:discover"\r\nMX: 1\r\nST: ssdp:all\r\n\r\n',
+    5353: _dns_query(),
+    11211: b'\x00\x01\x00\x00\x00\x01\x00\x00stats\r\n',
+}
+
+# error reported on a connected UDP socket for an ICMP port unreachable message, meaning that
+# the port is closed. Any other error, e.g. host unreachable, means that the probe was filtered
+_PORT_UNREACHABLE = {errno.ECONNREFUSED}
+if hasattr(errno, 'WSAECONNREFUSED'):
+    _PORT_UNREACHABLE.add(errno.WSAECONNREFUSED)
+
+
+def payload_for(port, default=b''):
+    """
+    Return the payload of the UDP probe of port: a request of the service usually running on
+    it, or default.
+    """
+    return UDP_PAYLOADS.get(port, default)
+
+
+class UdpEngine(object):
+    """
+    Single threaded UDP scan engine built on the selectors module.
+
+    Every probe is a datagram sent through its own connected, non-blocking UDP socket, so that
+    the kernel reports the ICMP port unreachable message of a closed port as ECONNREFUSED on
+    that socket. A reply means the port is open, a port unreachable that it is closed, and any
+    other unreachable message that the probe was filtered. Probes without an answer are sent
+    again up to retransmissions times, one timeout apart, to make up for lost datagrams and
+    rate limited ICMP messages, and are reported filtered once the last one times out.
+    Up to max_in_flight probes wait for an answer at the same time, so a sweep takes about
+    (retransmissions + 1) timeouts rather than one per port.
+    """
+    def __init__(self, max_in_flight, timeout, retransmissions=1, batch_size=256, timing=None, window=None):
+        """
+        :param max_in_flight: maximum number of probes waiting for an answer at the same time.
+        :param timeout: the time in seconds between two transmissions of a probe.
+        :param retransmissions: number of times a probe without an answer is sent again.
+        :param batch_size: number of probes sent between two polls of the selector.
+        :param timing: optional AdaptiveTiming giving the timeout of each probe instead of timeout.
+        :param window: optional ConcurrencyWindow adjusting the probes in flight, within max_in_flight.
+        """
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.retransmissions = retransmissions
+        self.batch_size = batch_size
+        self.timing = timing
+        self.window = window
+
+    def run(self, jobs, context=None, deadline=None):
+        """
+        Probe (ip, port) jobs.
+
+        :param jobs: iterable of (ip, port) tuples, consumed lazily.
+        :param context: optional ProbeContext whose encoded message is the payload of the ports
+        without a service specific one.
+        :param deadline: optional time.monotonic() time at which the generator stops.
+        :return: generator of (ip, port, status, latency) tuples in completion order.
+        """
+        window = self.window or ConcurrencyWindow(self.max_in_flight)
+        selector = selectors.DefaultSelector()
+        # sock -> [address, payload, start time, transmissions left] of every probe waiting for an answer
+        pending = dict()
+        # heap of (retransmission time, sequence number, sock)
+        deadlines = []
+        sequence = itertools.count()
+        jobs = iter(jobs)
+        exhausted = False
+        deferred = None
+        default_payload = context.payload if context is not None else b''
+
+        try:
+            while deadline is None or time.monotonic() < deadline:
+                opened = 0
+                while not exhausted and window.available() and opened < self.batch_size:
+                    if deferred is not None:
+                        address, deferred = deferred, None
+                    else:
+                        job = next(jobs, None)
+                        if job is None:
+                            exhausted = True
+                            break
+                        address = (job[0], int(job[1]))
+                    window.acquire()
+                    try:
+                        UDP_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                    except socket_error as e:
+                        # out of file descriptors, wait for pending probes to release some
+                        window.release(exhausted=True)
+                        if not pending or e.errno not in EXHAUSTED:
+                            raise
+                        deferred = address
+                        break
+                    opened += 1
+                    UDP_sock.setblocking(False)
+                    payload = payload_for(address[1], default_payload)
+                    start_time = time.monotonic()
+                    status = self.__send(UDP_sock, address, payload, connect=True)
+                    if status is not None:
+                        UDP_sock.close()
+                        window.release()
+                        yield address[0], address[1], status, time.monotonic() - start_time
+                        continue
+                    pending[UDP_sock] = [address, payload, start_time, self.retransmissions]
+                    heapq.heappush(deadlines, (start_time + self.__timeout(address[0]), next(sequence), UDP_sock))
+                    selector.register(UDP_sock, selectors.EVENT_READ)
+
+                if not pending:
+                    if exhausted:
+                        break
+                    continue
+
+                if exhausted or deferred is not None or not window.available():
+                    wait = max(0, deadlines[0][0] - time.monotonic())
+                else:
+                    wait = 0
+                if deadline is not None:
+                    wait = max(0, min(wait, deadline - time.monotonic()))
+
+                for key, _ in selector.select(wait):
+                    UDP_sock = key.fileobj
+                    address, _, start_time, _ = pending[UDP_sock]
+                    status = self.__receive(UDP_sock)
+                    if status is None:
+                        continue
+                    selector.unregister(UDP_sock)
+                    del pending[UDP_sock]
+                    UDP_sock.close()
+                    latency = time.monotonic() - start_time
+                    if status != 'FILTERED' and self.timing:
+                        self.timing.observe(address[0], latency)
+                    window.release(latency)
+                    yield address[0], address[1], status, latency
+
+                now = time.monotonic()
+                while deadlines and (deadlines[0][0] <= now or deadlines[0][2] not in pending):
+                    _, _, UDP_sock = heapq.heappop(deadlines)
+                    probe = pending.get(UDP_sock)
+                    if probe is None:
+                        continue
+                    address, payload, start_time, left = probe
+                    status = 'FILTERED'
+                    if left:
+                        probe[3] -= 1
+                        status = self.__send(UDP_sock, address, payload)
+                        if status is None:
+                            heapq.heappush(deadlines, (now + self.__timeout(address[0]), next(sequence), UDP_sock))
+                            continue
+                    selector.unregister(UDP_sock)
+                    del pending[UDP_sock]
+                    UDP_sock.close()
+                    window.release()
+                    yield address[0], address[1], status, now - start_time
+        finally:
+            for UDP_sock in pending:
+                selector.unregister(UDP_sock)
+                UDP_sock.close()
+            selector.close()
+
+    def __timeout(self, ip):
+        return self.timing.timeout_for(ip) if self.timing else self.timeout
+
+    @staticmethod
+    def __send(UDP_sock, address, payload, connect=False):
+        """
+        Send the payload of a probe, connecting its socket first if needed.
+
+        :return: the status of the port if the send already failed with an ICMP error, None otherwise.
+        """
+        try:
+            if connect:
+                UDP_sock.connect(address)
+            UDP_sock.send(payload)
+        except BlockingIOError:
+            # the datagram is dropped, the next transmission will replace it
+            pass
+        except socket_error as e:
+            if e.errno in EXHAUSTED:
+                return None
+            return UdpEngine.__status(e.errno)
+        return None
+
+    @staticmethod
+    def __receive(UDP_sock):
+        """
+        Read the answer of a probe.
+
+        :return: the status of the port, or None if there was nothing to read after all.
+        """
+        try:
+            UDP_sock.recv(65535)
+        except (BlockingIOError, InterruptedError):
+            return None
+        except socket_error as e:
+            return UdpEngine.__status(e.errno)
+        return 'OPEN'
+
+    @staticmethod
+    def __status(error):
+        """
+        Translate the error of a connected UDP socket to a port status.
+        """
+        return 'CLOSE' if error in _PORT_UNREACHABLE else 'FILTERED'
@@ -0,0 +1,27 @@
+import socket
+import unittest
+
+
+def closed_port():
+    """Return a loopback port number nobody is listening on."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+class ListenerTestCase(unittest.TestCase):
+    """
+    Test case listening on a loopback port, open_port, during each test. closed_port is a
+    loopback port nobody is listening on.
+    """
+    def setUp(self):
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.listen(16)
+        self.open_port = self.listener.getsockname()[1]
+        self.closed_port = closed_port()
+
+    def tearDown(self):
+        self.listener.close()
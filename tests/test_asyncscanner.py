@@ -0,0 +1,120 @@
+import asyncio
+import errno
+import time
+from unittest.mock import patch
+
+from os import sys, path
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+from pyportscanner import asyncscanner
+from pyportscanner.etc.service_port import ServicePort
+from tests import ListenerTestCase
+
+
+@patch('pyportscanner.pyscanner.read_input', autospec=True)
+class AsyncPortScannerTest(ListenerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.target_ports = [self.open_port, self.closed_port]
+        self.mock_port_list = {
+            self.open_port: ServicePort('test', self.open_port, 'tcp', 0.1),
+        }
+
+    def test_scan_loopback(self, mock_read_input):
+        mock_read_input.return_value = self.mock_port_list
+        scanner = asyncscanner.AsyncPortScanner(self.target_ports, timeout=2)
+        result = asyncio.run(scanner.scan('127.0.0.1'))
+        self.assertEqual(result, {self.open_port: 'OPEN', self.closed_port: 'CLOSE'})
+
+    def test_scan_more_ports_than_limit(self, mock_read_input):
+        mock_read_input.return_value = self.mock_port_list
+        scanner = asyncscanner.AsyncPortScanner(self.target_ports, thread_limit=1, timeout=2)
+        result = asyncio.run(scanner.scan('127.0.0.1', 'hello'))
+        self.assertEqual(result, {self.open_port: 'OPEN', self.closed_port: 'CLOSE'})
+
+    def test_scan_server_unknown(self, mock_read_input):
+        mock_read_input.return_value = self.mock_port_list
+        scanner = asyncscanner.AsyncPortScanner(self.target_ports, timeout=2)
+        with patch.object(scanner, '_resolve', return_value=None):
+            result = asyncio.run(scanner.scan('unknown.invalid'))
+        self.assertEqual(result, {})
+
+    def test_scan_iter(self, mock_read_input):
+        mock_read_input.return_value = self.mock_port_list
+        scanner = asyncscanner.AsyncPortScanner(self.target_ports, thread_limit=1, timeout=2)
+
+        async def collect():
+            return [result async for result in scanner.scan_iter('127.0.0.1')]
+
+        result = asyncio.run(collect())
+        self.assertEqual(len(result), 2)
+        self.assertEqual({port: status for port, status, _ in result}, {self.open_port: 'OPEN', self.closed_port: 'CLOSE'})
+
+    def test_scan_deadline(self, mock_read_input):
+        mock_read_input.return_value = self.mock_port_list
+        scanner = asyncscanner.AsyncPortScanner(self.target_ports, timeout=2)
+        result = asyncio.run(scanner.scan('127.0.0.1', deadline=5))
+        self.assertEqual(result, {self.open_port: 'OPEN', self.closed_port: 'CLOSE'})
+        self.assertTrue(result.complete)
+
+        async def hang(ip, port, context, deadline=None):
+            await asyncio.sleep(10)
+
+        start_time = time.monotonic()
+        with patch.object(scanner, '_TCP_connect', side_effect=hang):
+            result = asyncio.run(scanner.scan('127.0.0.1', deadline=0.1))
+        self.assertLess(time.monotonic() - start_time, 5)
+        self.assertEqual(result, {})
+        self.assertFalse(result.complete)
+        with self.assertRaises(ValueError):
+            asyncio.run(scanner.scan('127.0.0.1', deadline=0))
+
+    def test_scan_iter_deadline(self, mock_read_input):
+        mock_read_input.return_value = self.mock_port_list
+        scanner = asyncscanner.AsyncPortScanner(self.target_ports, timeout=2)
+
+        async def collect():
+            return [result async for result in scanner.scan_iter('127.0.0.1', deadline=5)]
+
+        result = asyncio.run(collect())
+        self.assertEqual({port: status for port, status, _ in result}, {self.open_port: 'OPEN', self.closed_port: 'CLOSE'})
+
+    def test_scanner_arguments(self, mock_read_input):
+        mock_read_input.return_value = self.mock_port_list
+        scanner = asyncscanner.AsyncPortScanner(self.target_ports, thread_limit='auto', discovery=False,
+                                                protocol='tcp')
+        self.assertGreater(scanner.thread_limit, 0)
+        # the coroutines would silently ignore these
+        for arguments in ({'engine': 'selector'}, {'protocol': 'udp'}, {'schedule': 'interleaved'},
+                          {'checkpoint': 'scan.journal'}, {'sink': 'results.csv'}):
+            with self.assertRaises(ValueError):
+                asyncscanner.AsyncPortScanner(self.target_ports, **arguments)
+
+    def test_TCP_connect_exhausted(self, mock_read_input):
+        mock_read_input.return_value = self.mock_port_list
+        scanner = asyncscanner.AsyncPortScanner(self.target_ports, timeout=2)
+
+        async def connect():
+            # patched once the event loop holds its own sockets
+            with patch('pyportscanner.asyncscanner.socket.socket', side_effect=OSError(errno.EMFILE, 'Too many open files')):
+                return await scanner._TCP_connect('127.0.0.1', self.open_port, None)
+
+        result = asyncio.run(connect())
+        self.assertEqual(result, (self.open_port, None))
+
+    def test_scan_exhausted(self, mock_read_input):
+        mock_read_input.return_value = self.mock_port_list
+        scanner = asyncscanner.AsyncPortScanner(self.target_ports, thread_limit=2, timeout=2)
+        TCP_connect = scanner._TCP_connect
+        calls = []
+
+        async def exhausted_once(ip, port, context, deadline=None):
+            calls.append(port)
+            if len(calls) == 1:
+                return port, None
+            return await TCP_connect(ip, port, context, deadline)
+
+        with patch.object(scanner, '_TCP_connect', side_effect=exhausted_once):
+            result = asyncio.run(scanner.scan('127.0.0.1'))
+        self.assertEqual(result, {self.open_port: 'OPEN', self.closed_port: 'CLOSE'})
+        self.assertEqual(len(calls), 3)
@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import Mock, patch
+
+from os import sys, path
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+from pyportscanner import pyscanner
+from pyportscanner.checkpoint import Checkpoint
+from tests import ListenerTestCase
+
+
+class CheckpointTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'scan.journal')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_journal(self):
+        checkpoint = Checkpoint(self.path, interval=60)
+        checkpoint.reset()
+        for port in range(1, 1001):
+            checkpoint.record('10.0.0.1', port, 'OPEN' if port == 80 else 'CLOSE')
+        checkpoint.record('10.0.0.2', 22, 'FILTERED')
+        # nothing is written before the interval elapsed
+        self.assertEqual(os.path.getsize(self.path), 6)
+        checkpoint.flush()
+        # three runs for the first host, one for the second
+        self.assertEqual(os.path.getsize(self.path), 6 + 4 * 9)
+
+        loaded = Checkpoint(self.path)
+        loaded.load()
+        self.assertEqual(len(loaded), 4)
+        self.assertEqual(loaded.status('10.0.0.1', 80), 'OPEN')
+        self.assertEqual(loaded.status('10.0.0.1', 1000), 'CLOSE')
+        self.assertIsNone(loaded.status('10.0.0.1', 1001))
+        self.assertEqual(loaded.status('10.0.0.2', 22), 'FILTERED')
+        self.assertIsNone(loaded.status('10.0.0.3', 22))
+
+    def test_truncated_record(self):
+        checkpoint = Checkpoint(self.path)
+        checkpoint.reset()
+        checkpoint.record('10.0.0.1', 80, 'OPEN')
+        checkpoint.flush()
+        with open(self.path, 'ab') as journal:
+            journal.write(b'\x01\x02\x03')
+        checkpoint.load()
+        self.assertEqual(len(checkpoint), 1)
+
+    def test_invalid_journal(self):
+        with open(self.path, 'wb') as journal:
+            journal.write(b'garbage')
+        with self.assertRaises(ValueError):
+            Checkpoint(self.path).load()
+
+    def test_load_missing(self):
+        checkpoint = Checkpoint(self.path)
+        checkpoint.load()
+        self.assertEqual(len(checkpoint), 0)
+        self.assertTrue(os.path.exists(self.path))
+
+
+@patch('pyportscanner.pyscanner.read_input', autospec=True)
+class ResumeTest(ListenerTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'scan.journal')
+        super().setUp()
+        self.ports = [self.open_port] + [port for port in range(1, 11)]
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.directory)
+
+    def test_resume_after_crash(self, mock_read_input):
+        mock_read_input.return_value = {}
+        scanner = pyscanner.PortScanner(self.ports, 1, 2, checkpoint=self.path)
+        results = scanner.scan_iter('127.0.0.1')
+        done = [next(results) for _ in range(4)]
+        # the process dies, the generator is never resumed
+        results.close()
+
+        scanner = pyscanner.PortScanner(self.ports, 1, 2, checkpoint=self.path, resume=True)
+        connect = scanner._PortScanner__TCP_connect
+        scanner._PortScanner__TCP_connect = Mock(side_effect=connect)
+        result = scanner.scan('127.0.0.1')
+        self.assertEqual(scanner._PortScanner__TCP_connect.call_count, len(self.ports) - len(done))
+        self.assertEqual(result, dict((port, 'OPEN' if port == self.open_port else 'CLOSE') for port in self.ports))
+
+        # everything is recorded now
+        scanner = pyscanner.PortScanner(self.ports, 1, 2, checkpoint=self.path, resume=True)
+        scanner._PortScanner__TCP_connect = Mock()
+        self.assertEqual(len(scanner.scan('127.0.0.1')), len(self.ports))
+        scanner._PortScanner__TCP_connect.assert_not_called()
+
+    def test_new_journal(self, mock_read_input):
+        mock_read_input.return_value = {}
+        pyscanner.PortScanner(self.ports, 1, 2, checkpoint=self.path).scan('127.0.0.1')
+        scanner = pyscanner.PortScanner(self.ports, 1, 2, checkpoint=self.path)
+        self.assertEqual(len(scanner.checkpoint), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
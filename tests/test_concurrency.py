@@ -0,0 +1,110 @@
+import errno
+import socket
+import unittest
+from unittest.mock import Mock, patch
+
+from os import sys, path
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+from pyportscanner import pyscanner
+from pyportscanner.concurrency import ConcurrencyWindow, fd_limit
+
+
+class FdLimitTest(unittest.TestCase):
+    @patch('pyportscanner.concurrency.resource')
+    def test_fd_limit(self, mock_resource):
+        mock_resource.getrlimit.return_value = (1024, 4096)
+        self.assertEqual(fd_limit(), 1024 - 64)
+        self.assertEqual(fd_limit(fds_per_probe=2), (1024 - 64) // 2)
+
+    @patch('pyportscanner.concurrency.resource', None)
+    def test_fd_limit_without_resource(self):
+        self.assertEqual(fd_limit(), 512 - 64)
+
+    @patch('pyportscanner.pyscanner.read_input', autospec=True)
+    def test_auto_thread_limit(self, mock_read_input):
+        mock_read_input.return_value = {}
+        scanner = pyscanner.PortScanner([80], 'auto')
+        self.assertTrue(scanner.auto_concurrency)
+        self.assertEqual(scanner.thread_limit, fd_limit())
+        scanner.thread_limit = 10
+        self.assertFalse(scanner.auto_concurrency)
+
+
+class ConcurrencyWindowTest(unittest.TestCase):
+    def test_fixed(self):
+        window = ConcurrencyWindow(2)
+        window.acquire()
+        window.acquire()
+        self.assertFalse(window.available())
+        window.release(0.01)
+        self.assertTrue(window.available())
+        self.assertEqual(window.limit, 2)
+
+    def test_exhausted_backs_off(self):
+        window = ConcurrencyWindow(100)
+        for _ in range(40):
+            window.acquire()
+        window.release(exhausted=True)
+        self.assertEqual(window.limit, 20)
+        self.assertEqual(window.in_flight, 39)
+        # the probes sent before the back off drain without growing the window
+        for _ in range(19):
+            window.release()
+        self.assertEqual(window.limit, 20)
+        # then every completion grows it back, up to max_limit
+        for _ in range(200):
+            window.release()
+            window.acquire()
+        self.assertEqual(window.limit, 100)
+
+    def test_slow_start(self):
+        window = ConcurrencyWindow(100, adaptive=True, initial=4)
+        for _ in range(10):
+            window.acquire()
+            window.release(0.01)
+        self.assertEqual(window.limit, 14)
+
+    def test_latency_backs_off(self):
+        window = ConcurrencyWindow(100, adaptive=True, initial=40)
+        window.acquire()
+        window.release(0.01)
+        for _ in range(40):
+            window.acquire()
+            window.release(1.0)
+        self.assertLess(window.limit, 41)
+        # no probe is ever given up, even at the minimum window
+        self.assertGreaterEqual(window.limit, 1)
+
+
+@patch('pyportscanner.pyscanner.read_input', autospec=True)
+class ExhaustedTest(unittest.TestCase):
+    def test_probe_sent_again(self, mock_read_input):
+        mock_read_input.return_value = {}
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(16)
+        port = listener.getsockname()[1]
+        try:
+            scanner = pyscanner.PortScanner([port, port + 1 if port < 65535 else port - 1], 4, 2)
+            connect = scanner._PortScanner__TCP_connect
+            # the first probe runs out of file descriptors, then the sockets are back
+            errors = [OSError(errno.EMFILE, 'Too many open files')]
+
+            def side_effect(*args):
+                if errors:
+                    raise errors.pop()
+                return connect(*args)
+
+            mock_connect = Mock(side_effect=side_effect)
+            scanner._PortScanner__TCP_connect = mock_connect
+            result = scanner.scan('127.0.0.1')
+        finally:
+            listener.close()
+        self.assertEqual(result[port], 'OPEN')
+        self.assertEqual(len(result), 2)
+        self.assertEqual(mock_connect.call_count, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
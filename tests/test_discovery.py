@@ -0,0 +1,86 @@
+import errno
+import unittest
+from unittest.mock import Mock, patch
+
+from os import sys, path
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+from pyportscanner import pyscanner
+from pyportscanner.discovery import HostDiscovery, discovery_status
+from pyportscanner.resolver import Resolver
+
+
+class HostDiscoveryTest(unittest.TestCase):
+    def test_default_ports(self):
+        discovery = HostDiscovery()
+        self.assertEqual(len(discovery.ports), 5)
+        self.assertIn(80, discovery.ports)
+
+    @patch('pyportscanner.discovery.SelectorEngine', autospec=True)
+    def test_alive(self, mock_engine):
+        probed = []
+
+        def run(jobs):
+            for ip, port in jobs:
+                probed.append((ip, port))
+                yield ip, port, 'CLOSE' if ip == '10.0.0.1' else 'FILTERED', 0.1
+
+        mock_engine.return_value.run.side_effect = run
+        discovery = HostDiscovery(ports=[80, 443], timeout=0.5)
+        self.assertEqual(discovery.alive(['10.0.0.1', '10.0.0.2']), {'10.0.0.1'})
+        # the probes left for a host are skipped once it answered
+        self.assertEqual(probed, [('10.0.0.1', 80), ('10.0.0.2', 80), ('10.0.0.2', 443)])
+        mock_engine.assert_called_once_with(1000, 0.5, classify=discovery_status)
+
+    def test_discovery_status(self):
+        self.assertEqual(discovery_status(0), 'OPEN')
+        self.assertEqual(discovery_status(errno.ECONNREFUSED), 'CLOSE')
+        # a router answering for a dead host does not make it alive
+        self.assertEqual(discovery_status(errno.EHOSTUNREACH), 'FILTERED')
+        self.assertEqual(discovery_status(errno.ENETUNREACH), 'FILTERED')
+        self.assertEqual(discovery_status(errno.ETIMEDOUT), 'FILTERED')
+
+    def test_filter(self):
+        discovery = HostDiscovery(ports=[80], batch_size=2)
+        discovery.alive = Mock(side_effect=[{'10.0.0.1'}, {'10.0.0.3'}])
+        items = [('a', '10.0.0.1'), ('b', '10.0.0.2'), ('c', '10.0.0.3')]
+        self.assertEqual(list(discovery.filter(items, key=lambda item: item[1])), [('a', '10.0.0.1'), ('c', '10.0.0.3')])
+        self.assertEqual(discovery.alive.call_count, 2)
+
+    def test_loopback_alive(self):
+        discovery = HostDiscovery(timeout=1)
+        self.assertEqual(discovery.alive(['127.0.0.1']), {'127.0.0.1'})
+
+
+@patch('pyportscanner.pyscanner.read_input', autospec=True)
+class ScanManyDiscoveryTest(unittest.TestCase):
+    def setUp(self):
+        self.discovery = HostDiscovery(ports=[80])
+        self.discovery.alive = Mock(return_value={'127.0.0.1'})
+        self.resolver = Resolver(lookup=Mock(return_value='127.0.0.2'))
+
+    def test_skip_down_hosts(self, mock_read_input):
+        mock_read_input.return_value = {}
+        scanner = pyscanner.PortScanner([1], 2, 1, resolver=self.resolver, discovery=self.discovery)
+        result = scanner.scan_many(['127.0.0.1', 'down.example'])
+        self.assertEqual(result, {'127.0.0.1': {1: 'CLOSE'}, 'down.example': {}})
+        self.assertEqual([job[:3] for job in scanner.scan_many_iter(['127.0.0.1', '127.0.0.2'])],
+                         [('127.0.0.1', 1, 'CLOSE')])
+
+    def test_force_scan(self, mock_read_input):
+        mock_read_input.return_value = {}
+        scanner = pyscanner.PortScanner([1], 2, 1, resolver=self.resolver, discovery=self.discovery)
+        result = scanner.scan_many(['127.0.0.1', 'down.example'], force_scan=True)
+        self.assertEqual(result, {'127.0.0.1': {1: 'CLOSE'}, 'down.example': {1: 'CLOSE'}})
+        self.discovery.alive.assert_not_called()
+
+    def test_no_discovery(self, mock_read_input):
+        mock_read_input.return_value = {}
+        scanner = pyscanner.PortScanner([1], 2, 1, discovery=False)
+        self.assertIsNone(scanner.discovery)
+        with self.assertRaises(ValueError):
+            pyscanner.PortScanner([1], 2, 1, discovery='fast')
+
+
+if __name__ == '__main__':
+    unittest.main()
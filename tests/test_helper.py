@@ -1,3 +1,5 @@
+import os
+import tempfile
 import unittest
 from unittest.mock import Mock, patch
 
@@ -12,3 +14,43 @@ class HelperTest(unittest.TestCase):
         result = helper.get_domain(test_url)
         self.assertEqual(result, 'docs.python.org')
 
+    def test_iter_targets_cidr(self):
+        result = list(helper.iter_targets('10.0.0.0/30'))
+        self.assertEqual(result, ['10.0.0.1', '10.0.0.2'])
+        result = list(helper.iter_targets('10.0.0.7/32'))
+        self.assertEqual(result, ['10.0.0.7'])
+
+    def test_iter_targets_range(self):
+        result = list(helper.iter_targets(['10.0.0.254-10.0.1.1', '10.0.2.1-2']))
+        self.assertEqual(result, ['10.0.0.254', '10.0.0.255', '10.0.1.0', '10.0.1.1', '10.0.2.1', '10.0.2.2'])
+        self.assertRaises(ValueError, list, helper.iter_targets('10.0.0.5-1'))
+
+    def test_iter_targets_hosts(self):
+        hosts = (host for host in ['google.com', 'http://foo.com/path', '10.0.0.1'])
+        result = list(helper.iter_targets(hosts))
+        self.assertEqual(result, ['google.com', 'http://foo.com/path', '10.0.0.1'])
+
+    def test_iter_targets_lazy(self):
+        result = helper.iter_targets('10.0.0.0/8')
+        self.assertEqual(next(result), '10.0.0.1')
+
+    def test_read_input(self):
+        port_map = helper.read_input()
+        self.assertIs(port_map, helper.read_input())
+        self.assertEqual(port_map[80].service_name, 'http')
+        self.assertEqual(port_map[80].proto, 'tcp')
+
+    def test_services_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            with patch.dict(os.environ, {'PYPORTSCANNER_CACHE_DIR': cache_dir}), \
+                    patch.object(helper, '_services', None):
+                parsed = helper.load_services()
+                self.assertEqual(len(os.listdir(cache_dir)), 1)
+                cache_path = os.path.join(cache_dir, os.listdir(cache_dir)[0])
+                dat_path = helper.pkg_resources.resource_filename(helper.__name__, 'nmap-services.dat')
+                stat = os.stat(dat_path)
+                cached = helper._read_cache(cache_path, stat)
+                self.assertEqual(cached, parsed)
+                # the cache is dropped once the .dat file changes
+                changed_stat = Mock(st_size=stat.st_size, st_mtime_ns=stat.st_mtime_ns + 1)
+                self.assertIsNone(helper._read_cache(cache_path, changed_stat))
@@ -0,0 +1,110 @@
+import os
+import shutil
+import struct
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from os import sys, path
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+from pyportscanner import pyscanner
+from pyportscanner.incremental import Change, IncrementalScanner, ScanState
+from tests import ListenerTestCase
+
+
+class ScanStateTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'scan.state')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_save_load(self):
+        state = ScanState(self.path)
+        self.assertEqual(state.run, 0)
+        state.run = 3
+        state.update('10.0.0.1', 80, 'OPEN', 1000, 0.25)
+        state.update('10.0.0.1', 443, 'CLOSE', 2000)
+        state.update('10.0.0.2', 22, 'FILTERED', 3000)
+        state.save()
+
+        loaded = ScanState(self.path)
+        self.assertEqual(loaded.run, 3)
+        self.assertEqual(loaded.status('10.0.0.1', 80), 'OPEN')
+        self.assertEqual(loaded.status('10.0.0.1', 443), 'CLOSE')
+        self.assertEqual(loaded.status('10.0.0.2', 22), 'FILTERED')
+        self.assertIsNone(loaded.status('10.0.0.2', 80))
+        self.assertIsNone(loaded.status('10.0.0.3', 80))
+        self.assertEqual(loaded.last_seen('10.0.0.1', 443), 2000)
+        self.assertIsNone(loaded.last_seen('10.0.0.1', 22))
+        self.assertAlmostEqual(loaded.result('10.0.0.1').latencies[80], 0.25)
+
+    def test_times_layout(self):
+        state = ScanState(self.path)
+        state.update('10.0.0.1', 1, 'OPEN', 0x01020304)
+        state.save()
+        with open(self.path, 'rb') as state_file:
+            data = state_file.read()
+        # the times are the last 2 ports * 4 bytes, little-endian whatever the platform
+        self.assertEqual(data[-8:], struct.pack('<II', 0, 0x01020304))
+
+    def test_invalid(self):
+        with open(self.path, 'wb') as state_file:
+            state_file.write(b'\0' * 14)
+        with self.assertRaises(ValueError):
+            ScanState(self.path)
+
+
+@patch('pyportscanner.pyscanner.read_input', autospec=True)
+class IncrementalScannerTest(ListenerTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'scan.state')
+        super().setUp()
+        self.ports = [self.open_port] + [port for port in range(1, 11)]
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.directory)
+
+    def test_incremental_scan(self, mock_read_input):
+        mock_read_input.return_value = {}
+        scanner = pyscanner.PortScanner(self.ports, 4, 2, discovery=False)
+        incremental = IncrementalScanner(scanner, self.path, sample=0.5)
+
+        report = incremental.scan('127.0.0.1')
+        self.assertEqual(report.probes, len(self.ports))
+        self.assertEqual(report.changes, [Change('127.0.0.1', self.open_port, None, 'OPEN')])
+        expected = dict((port, 'OPEN' if port == self.open_port else 'CLOSE') for port in self.ports)
+        self.assertEqual(report.results['127.0.0.1'], expected)
+
+        # the open port and half of the closed ports are probed again
+        report = IncrementalScanner(scanner, self.path, sample=0.5).scan('127.0.0.1')
+        self.assertEqual(report.probes, 1 + 5)
+        self.assertEqual(report.changes, [])
+        self.assertEqual(report.results['127.0.0.1'], expected)
+
+        self.listener.close()
+        report = IncrementalScanner(scanner, self.path, sample=0.5).scan('127.0.0.1')
+        self.assertEqual(report.probes, 1 + 5)
+        self.assertEqual(report.changes, [Change('127.0.0.1', self.open_port, 'OPEN', 'CLOSE')])
+        self.assertEqual(report.results['127.0.0.1'][self.open_port], 'CLOSE')
+
+    def test_max_age(self, mock_read_input):
+        mock_read_input.return_value = {}
+        scanner = pyscanner.PortScanner(self.ports, 4, 2, discovery=False)
+        IncrementalScanner(scanner, self.path, sample=0.1).scan('127.0.0.1')
+        report = IncrementalScanner(scanner, self.path, sample=0.1, max_age=-1).scan('127.0.0.1')
+        self.assertEqual(report.probes, len(self.ports))
+
+    def test_invalid_sample(self, mock_read_input):
+        mock_read_input.return_value = {}
+        scanner = pyscanner.PortScanner(self.ports, 4, 2, discovery=False)
+        with self.assertRaises(ValueError):
+            IncrementalScanner(scanner, self.path, sample=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
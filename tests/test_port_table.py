@@ -0,0 +1,58 @@
+import unittest
+
+from os import sys, path
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+from pyportscanner.etc.port_table import PortTable, PortMapView
+from pyportscanner.etc.service_port import ServicePort
+
+
+class PortTableTest(unittest.TestCase):
+    def setUp(self):
+        names = ['http', 'dns', 'https']
+        protos = ['tcp', 'udp']
+        ports = [53, 53, 80, 80, 443]
+        proto_idx = [0, 1, 0, 1, 0]
+        freqs = [0.05, 0.2, 0.5, 0.01, 0.2]
+        name_idx = [1, 1, 0, 0, 2]
+        self.table = PortTable(names, protos, ports, proto_idx, freqs, name_idx)
+
+    def test_top_ports(self):
+        # same frequency for 53/udp and 443/tcp, the smaller port comes first
+        self.assertEqual(self.table.top_ports(2), [80, 53])
+        self.assertEqual(self.table.top_ports(10), [80, 53, 443])
+        self.assertEqual(self.table.top_ports(10, 'udp'), [53, 80])
+        self.assertEqual(self.table.top_ports(10, 'sctp'), [])
+
+    def test_lookups(self):
+        self.assertEqual(len(self.table), 3)
+        self.assertIn(443, self.table)
+        self.assertNotIn(22, self.table)
+        self.assertEqual(list(self.table), [53, 80, 443])
+        self.assertEqual(self.table.rank(443), 2)
+        self.assertEqual(self.table.rank(80, 'udp'), 1)
+        self.assertIsNone(self.table.rank(22))
+        self.assertEqual(self.table.freq(53), 0.2)
+        self.assertEqual(self.table.freq(53, 'tcp'), 0.05)
+        self.assertIsNone(self.table.freq(443, 'udp'))
+        self.assertEqual(self.table.get(53).proto, 'udp')
+        self.assertEqual([service.proto for service in self.table.find_service('http')], ['tcp', 'udp'])
+
+    def test_port_map(self):
+        port_map = self.table.port_map
+        self.assertEqual(len(port_map), 3)
+        self.assertEqual(list(port_map), [53, 80, 443])
+        self.assertEqual(port_map[53].service_name, 'dns')
+        self.assertEqual(port_map[53].proto, 'udp')
+        self.assertIsNone(port_map.get(22))
+        self.assertRaises(KeyError, port_map.__getitem__, 22)
+
+    def test_from_port_map(self):
+        port_map = {
+            80: ServicePort('HTTP', 80, 'TCP', 0.1),
+            443: ServicePort('TLS', 443, 'TCP', 0.09),
+        }
+        table = PortTable.from_port_map(port_map)
+        self.assertEqual(table.top_ports(2), [80, 443])
+        self.assertIs(PortTable.from_port_map(table.port_map), table)
+        self.assertIsInstance(table.port_map, PortMapView)
@@ -0,0 +1,59 @@
+import unittest
+
+from os import sys, path
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+from pyportscanner.etc.port_table import PortTable
+from pyportscanner.portspec import PortSpec
+
+
+class PortSpecTest(unittest.TestCase):
+    def setUp(self):
+        names = ['http', 'dns', 'https', 'ssh']
+        protos = ['tcp', 'udp']
+        ports = [53, 80, 443, 22]
+        proto_idx = [1, 0, 0, 0]
+        freqs = [0.2, 0.5, 0.3, 0.1]
+        name_idx = [1, 0, 2, 3]
+        self.table = PortTable(names, protos, ports, proto_idx, freqs, name_idx)
+
+    def test_ranges(self):
+        spec = PortSpec('22,80,8000-9000, 8500-9001', self.table)
+        self.assertEqual(len(spec), 1004)
+        self.assertIn(8765, spec)
+        self.assertNotIn(81, spec)
+        ports = list(spec)
+        self.assertEqual(ports[:3], [22, 80, 8000])
+        self.assertEqual(ports[-1], 9001)
+        self.assertEqual(len(ports), 1004)
+
+    def test_full_range(self):
+        spec = PortSpec('1-65535')
+        self.assertEqual(len(spec), 65535)
+        self.assertIn(1, spec)
+        self.assertIn(65535, spec)
+        self.assertEqual(spec[0], 1)
+        self.assertEqual(spec[-1], 65535)
+
+    def test_top(self):
+        spec = PortSpec('top:2', self.table)
+        self.assertEqual(list(spec), [80, 443])
+        self.assertIn(443, spec)
+        self.assertNotIn(53, spec)
+        spec = PortSpec('proto:udp top:2', self.table)
+        self.assertEqual(spec.proto, 'udp')
+        self.assertEqual(list(spec), [53])
+
+    def test_top_and_ranges(self):
+        spec = PortSpec('top:3 440-444', self.table)
+        self.assertEqual(len(spec), 7)
+        self.assertEqual(list(spec), [53, 80, 440, 441, 442, 443, 444])
+        self.assertEqual([spec[i] for i in range(len(spec))], list(spec))
+        self.assertRaises(IndexError, spec.__getitem__, 7)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, PortSpec, '80-22')
+        self.assertRaises(ValueError, PortSpec, '0-22')
+        self.assertRaises(ValueError, PortSpec, '70000')
+        self.assertRaises(ValueError, PortSpec, 'top:ten')
+        self.assertRaises(ValueError, PortSpec, '')
@@ -0,0 +1,41 @@
+import socket
+import unittest
+from unittest.mock import Mock, patch
+
+from os import sys, path
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+from pyportscanner.probe import ProbeContext, reuse_option
+
+
+class ProbeContextTest(unittest.TestCase):
+    @patch('pyportscanner.probe.platform', autospec=True)
+    def test_reuse_option(self, mock_platform):
+        mock_platform.system.return_value = 'Windows'
+        self.assertEqual(reuse_option(), socket.SO_REUSEADDR)
+        mock_platform.system.return_value = 'Linux'
+        self.assertEqual(reuse_option(), socket.SO_REUSEPORT)
+
+    def test_no_message(self):
+        with ProbeContext() as context:
+            self.assertEqual(context.payload, b'')
+            self.assertIsNone(context.udp_socket)
+            context.notify(('127.0.0.1', 9))
+
+    @patch('pyportscanner.probe.socket', autospec=True)
+    def test_notify(self, mock_socket):
+        mock_udp_socket = Mock(spec=socket.socket)
+        mock_udp_socket.sendto.side_effect = [None, BlockingIOError]
+        mock_socket.socket.return_value = mock_udp_socket
+        with ProbeContext('héllo') as context:
+            context.notify(('127.0.0.1', 80))
+            # a full socket buffer drops the datagram
+            context.notify(('127.0.0.1', 443))
+        mock_socket.socket.assert_called_once_with(mock_socket.AF_INET, mock_socket.SOCK_DGRAM)
+        mock_udp_socket.setblocking.assert_called_once_with(False)
+        mock_udp_socket.sendto.assert_any_call('héllo'.encode('utf-8'), ('127.0.0.1', 80))
+        mock_udp_socket.close.assert_called_once_with()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,6 @@
+import errno
+import time
 import unittest
-import collections
 from unittest.mock import Mock, patch
 import socket
 from socket import error as socket_error
@@ -11,6 +12,10 @@ sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
 
 from pyportscanner import pyscanner
 from pyportscanner.etc.service_port import ServicePort
+from pyportscanner.probe import ProbeContext
+from pyportscanner.ratelimit import RateController
+from pyportscanner.resolver import Resolver
+from tests import ListenerTestCase
 
 
 @patch('pyportscanner.pyscanner.socket', autospec=True)
@@ -94,7 +99,7 @@ class PortScannerTest(unittest.TestCase):
         scanner._PortScanner__scan_ports = Mock(return_value=mock_scan_results)
         result = scanner.scan(self.test_host)
         self.assertEqual(result, mock_scan_results)
-        scanner._PortScanner__scan_ports.assert_called_once_with(self.test_ip, '')
+        scanner._PortScanner__scan_ports.assert_called_once_with(self.test_ip, '', None)
         mock_socket.gethostbyname.assert_called_once_with(self.test_domain)
 
     def test_scan_socket_error_success(self, mock_read_input, mock_socket):
@@ -111,7 +116,7 @@ class PortScannerTest(unittest.TestCase):
         scanner._PortScanner__scan_ports = Mock(return_value=mock_scan_results)
         result = scanner.scan(self.test_host)
         self.assertEqual(result, mock_scan_results)
-        scanner._PortScanner__scan_ports.assert_called_once_with(self.test_ip, '')
+        scanner._PortScanner__scan_ports.assert_called_once_with(self.test_ip, '', None)
         mock_socket.gethostbyname.assert_called_once_with(self.test_domain)
 
     def test_scan_server_unknown(self, mock_read_input, mock_socket):
@@ -131,15 +136,22 @@ class PortScannerTest(unittest.TestCase):
         scanner._PortScanner__scan_ports.assert_not_called()
         mock_socket.gethostbyname.assert_called_once_with(self.test_domain)
 
+    @staticmethod
+    def _mock_future(result=None, exception=None):
+        mock_future = Mock(spec=futures.Future)
+        if exception:
+            mock_future.result.side_effect = exception
+        else:
+            mock_future.result.return_value = result
+        # the future is already done, so the callback runs right away
+        mock_future.add_done_callback.side_effect = lambda callback: callback(mock_future)
+        return mock_future
+
     @patch('pyportscanner.pyscanner.concurrent.futures.ThreadPoolExecutor', autospec=True)
     def test_scan_ports_success(self, mock_executor, mock_read_input, mock_socket):
         mock_read_input.return_value = self.mock_port_list
-        mock_future1 = Mock(spec=futures.Future)
-        mock_future1.done.return_value = True
-        mock_future1.result.return_value = (80, 'OPEN')
-        mock_future2 = Mock(spec=futures.Future)
-        mock_future2.done.side_effect = [False, True]
-        mock_future2.result.return_value = (443, 'OPEN')
+        mock_future1 = self._mock_future((80, 'OPEN'))
+        mock_future2 = self._mock_future((443, 'OPEN'))
         mock_executor.return_value.__enter__.return_value.submit.side_effect = [mock_future1, mock_future2]
         scanner = pyscanner.PortScanner(self.target_ports, self.thread_limit, self.timeout)
         result = scanner._PortScanner__scan_ports(self.test_ip, '')
@@ -148,12 +160,8 @@ class PortScannerTest(unittest.TestCase):
     @patch('pyportscanner.pyscanner.concurrent.futures.ThreadPoolExecutor', autospec=True)
     def test_scan_ports_exception(self, mock_executor, mock_read_input, mock_socket):
         mock_read_input.return_value = self.mock_port_list
-        mock_future1 = Mock(spec=futures.Future)
-        mock_future1.done.return_value = True
-        mock_future1.result.return_value = (80, 'OPEN')
-        mock_future2 = Mock(spec=futures.Future)
-        mock_future2.done.side_effect = [False, True]
-        mock_future2.result.side_effect = socket_error
+        mock_future1 = self._mock_future((80, 'OPEN'))
+        mock_future2 = self._mock_future(exception=socket_error)
         mock_executor.return_value.__enter__.return_value.submit.side_effect = [mock_future1, mock_future2]
         scanner = pyscanner.PortScanner(self.target_ports, self.thread_limit, self.timeout)
         result = scanner._PortScanner__scan_ports(self.test_ip, '')
@@ -162,38 +170,16 @@ class PortScannerTest(unittest.TestCase):
     @patch('pyportscanner.pyscanner.concurrent.futures.ThreadPoolExecutor', autospec=True)
     def test_scan_ports_thread_limit(self, mock_executor, mock_read_input, mock_socket):
         mock_read_input.return_value = self.mock_port_list
-        mock_future1 = Mock(spec=futures.Future)
-        mock_future1.done.return_value = True
-        mock_future1.result.return_value = (80, 'OPEN')
-        mock_future2 = Mock(spec=futures.Future)
-        mock_future2.done.side_effect = [False, True]
-        mock_future2.result.side_effect = socket_error
+        mock_future1 = self._mock_future((80, 'OPEN'))
+        mock_future2 = self._mock_future(exception=socket_error)
         mock_executor.return_value.__enter__.return_value.submit.side_effect = [mock_future1, mock_future2]
         scanner = pyscanner.PortScanner(self.target_ports, 1, self.timeout)
         result = scanner._PortScanner__scan_ports(self.test_ip, '')
         self.assertEqual(result, {80: 'OPEN', 443: 'CLOSE'})
 
-    def test_check_futures_succes(self, mock_read_input, mock_socket):
-        mock_read_input.return_value = self.mock_port_list
-        mock_future1 = Mock(spec=futures.Future)
-        mock_future1.done.return_value = True
-        mock_future1.result.return_value = (80, 'OPEN')
-        mock_future2 = Mock(spec=futures.Future)
-        mock_future2.done.return_value = False
-        test_futures = collections.deque()
-        test_futures.append(mock_future1)
-        test_futures.append(mock_future2)
-        test_output = {
-            80: 'CLOSE',
-            443: 'CLOSE',
-        }
-        scanner = pyscanner.PortScanner(self.target_ports, self.thread_limit, self.timeout)
-        scanner._PortScanner__check_futures(test_output, test_futures)
-        self.assertEqual(len(test_futures), 1)
-        self.assertEqual(test_output, {80: 'OPEN', 443: 'CLOSE'})
-
-    @patch('pyportscanner.pyscanner.platform', autospec=True)
-    def test_TCP_connect_open(self, mock_platform, mock_read_input, mock_socket):
+    @patch('pyportscanner.probe.socket', autospec=True)
+    @patch('pyportscanner.probe.platform', autospec=True)
+    def test_TCP_connect_open(self, mock_platform, mock_probe_socket, mock_read_input, mock_socket):
         test_message = 'test_message_djiqojiocn'
         mock_platform.system.return_value = 'Linux'
         mock_tcp_socket = Mock(spec=socket.socket)
@@ -205,19 +191,26 @@ class PortScannerTest(unittest.TestCase):
         mock_tcp_socket.close.return_value = None
         mock_udp_socket = Mock(spec=socket.socket)
         mock_udp_socket.sendto.return_value = None
-        mock_socket.socket.side_effect = [mock_tcp_socket, mock_udp_socket]
+        mock_socket.socket.side_effect = [mock_tcp_socket]
+        mock_probe_socket.socket.side_effect = [mock_udp_socket]
         scanner = pyscanner.PortScanner(self.target_ports, self.thread_limit, self.timeout)
-        result = scanner._PortScanner__TCP_connect(self.test_ip, 80, test_message)
+        context = ProbeContext(test_message)
+        result = scanner._PortScanner__TCP_connect(self.test_ip, 80, context)
+        # the UDP socket is shared by the probes of a scan, and closed with its context
+        mock_udp_socket.close.assert_not_called()
+        context.close()
         self.assertEqual(result, (80, 'OPEN'))
         mock_tcp_socket.connect_ex.assert_called_once_with((self.test_ip, 80))
         mock_tcp_socket.sendall.assert_called_once_with(test_message.encode('utf8'))
         mock_tcp_socket.close.assert_called_once_with()
         mock_tcp_socket.settimeout.assert_called_once_with(self.timeout)
+        mock_tcp_socket.setsockopt.assert_called_once_with(mock_socket.SOL_SOCKET, mock_probe_socket.SO_REUSEPORT, 1)
         mock_udp_socket.sendto.assert_called_once_with(test_message.encode('utf8'), (self.test_ip, 80))
         mock_udp_socket.close.assert_called_once_with()
 
-    @patch('pyportscanner.pyscanner.platform', autospec=True)
-    def test_TCP_connect_close(self, mock_platform, mock_read_input, mock_socket):
+    @patch('pyportscanner.probe.socket', autospec=True)
+    @patch('pyportscanner.probe.platform', autospec=True)
+    def test_TCP_connect_close(self, mock_platform, mock_probe_socket, mock_read_input, mock_socket):
         test_message = 'test_message_djiqojiocn'
         mock_platform.system.return_value = 'Linux'
         mock_tcp_socket = Mock(spec=socket.socket)
@@ -229,19 +222,26 @@ class PortScannerTest(unittest.TestCase):
         mock_tcp_socket.close.return_value = None
         mock_udp_socket = Mock(spec=socket.socket)
         mock_udp_socket.sendto.return_value = None
-        mock_socket.socket.side_effect = [mock_tcp_socket, mock_udp_socket]
+        mock_socket.socket.side_effect = [mock_tcp_socket]
+        mock_probe_socket.socket.side_effect = [mock_udp_socket]
         scanner = pyscanner.PortScanner(self.target_ports, self.thread_limit, self.timeout)
-        result = scanner._PortScanner__TCP_connect(self.test_ip, 80, test_message)
+        context = ProbeContext(test_message)
+        result = scanner._PortScanner__TCP_connect(self.test_ip, 80, context)
+        # the UDP socket is shared by the probes of a scan, and closed with its context
+        mock_udp_socket.close.assert_not_called()
+        context.close()
         self.assertEqual(result, (80, 'CLOSE'))
         mock_tcp_socket.connect_ex.assert_called_once_with((self.test_ip, 80))
         mock_tcp_socket.sendall.assert_not_called()
         mock_tcp_socket.close.assert_called_once_with()
         mock_tcp_socket.settimeout.assert_called_once_with(self.timeout)
+        mock_tcp_socket.setsockopt.assert_called_once_with(mock_socket.SOL_SOCKET, mock_probe_socket.SO_REUSEPORT, 1)
         mock_udp_socket.sendto.assert_called_once_with(test_message.encode('utf8'), (self.test_ip, 80))
         mock_udp_socket.close.assert_called_once_with()
 
-    @patch('pyportscanner.pyscanner.platform', autospec=True)
-    def test_TCP_connect_socket_error(self, mock_platform, mock_read_input, mock_socket):
+    @patch('pyportscanner.probe.socket', autospec=True)
+    @patch('pyportscanner.probe.platform', autospec=True)
+    def test_TCP_connect_socket_error(self, mock_platform, mock_probe_socket, mock_read_input, mock_socket):
         test_message = 'test_message_djiqojiocn'
         mock_platform.system.return_value = 'Linux'
         mock_tcp_socket = Mock(spec=socket.socket)
@@ -253,12 +253,162 @@ class PortScannerTest(unittest.TestCase):
         mock_tcp_socket.close.return_value = None
         mock_udp_socket = Mock(spec=socket.socket)
         mock_udp_socket.sendto.return_value = None
-        mock_socket.socket.side_effect = [mock_tcp_socket, mock_udp_socket]
+        mock_socket.socket.side_effect = [mock_tcp_socket]
+        mock_probe_socket.socket.side_effect = [mock_udp_socket]
         scanner = pyscanner.PortScanner(self.target_ports, self.thread_limit, self.timeout)
-        result = scanner._PortScanner__TCP_connect(self.test_ip, 80, test_message)
+        context = ProbeContext(test_message)
+        result = scanner._PortScanner__TCP_connect(self.test_ip, 80, context)
+        # the UDP socket is shared by the probes of a scan, and closed with its context
+        mock_udp_socket.close.assert_not_called()
+        context.close()
         self.assertEqual(result, (80, 'CLOSE'))
         mock_tcp_socket.connect_ex.assert_called_once_with((self.test_ip, 80))
         mock_tcp_socket.close.assert_called_once_with()
         mock_tcp_socket.settimeout.assert_called_once_with(self.timeout)
+        mock_tcp_socket.setsockopt.assert_called_once_with(mock_socket.SOL_SOCKET, mock_probe_socket.SO_REUSEPORT, 1)
         mock_udp_socket.sendto.assert_called_once_with(test_message.encode('utf8'), (self.test_ip, 80))
         mock_udp_socket.close.assert_called_once_with()
+
+    def test_TCP_connect_exhausted(self, mock_read_input, mock_socket):
+        mock_tcp_socket = Mock(spec=socket.socket)
+        mock_tcp_socket.connect_ex.side_effect = [errno.EADDRNOTAVAIL, OSError(errno.ENOBUFS, 'No buffer space')]
+        mock_socket.socket.return_value = mock_tcp_socket
+        scanner = pyscanner.PortScanner(self.target_ports, self.thread_limit, self.timeout)
+        # both probes have to be sent again
+        self.assertEqual(scanner._PortScanner__TCP_connect(self.test_ip, 80, ProbeContext('')), (80, None))
+        self.assertEqual(scanner._PortScanner__TCP_connect(self.test_ip, 80, ProbeContext('')), (80, None))
+        self.assertEqual(mock_tcp_socket.close.call_count, 2)
+
+    def test_scan_exhausted(self, mock_read_input, mock_socket):
+        mock_read_input.return_value = self.mock_port_list
+        mock_tcp_socket = Mock(spec=socket.socket)
+        # the first probe runs out of local ports, then they are back
+        mock_tcp_socket.connect_ex.side_effect = [errno.EADDRNOTAVAIL, 0, 0]
+        mock_socket.socket.return_value = mock_tcp_socket
+        scanner = pyscanner.PortScanner([1, 2], 1, self.timeout)
+        self.assertEqual(scanner._PortScanner__scan_ports(self.test_ip, ''), {1: 'OPEN', 2: 'OPEN'})
+        self.assertEqual(mock_tcp_socket.connect_ex.call_count, 3)
+
+    def test_ranked_jobs(self, mock_read_input, mock_socket):
+        mock_read_input.return_value = self.mock_port_list
+        scanner = pyscanner.PortScanner([8080, 443, 80], self.thread_limit, self.timeout)
+        jobs = list(scanner._ranked_jobs(['ip1', 'ip2']))
+        self.assertEqual(jobs, [('ip1', 80), ('ip2', 80), ('ip1', 443), ('ip2', 443), ('ip1', 8080), ('ip2', 8080)])
+
+    @patch('pyportscanner.probe.socket', autospec=True)
+    @patch('pyportscanner.probe.platform', autospec=True)
+    def test_TCP_connect_filtered(self, mock_platform, mock_probe_socket, mock_read_input, mock_socket):
+        mock_platform.system.return_value = 'Linux'
+        mock_tcp_socket = Mock(spec=socket.socket)
+        # assume the handshake got no reply before the timeout
+        mock_tcp_socket.connect_ex.return_value = errno.EAGAIN
+        mock_socket.socket.side_effect = [mock_tcp_socket]
+        scanner = pyscanner.PortScanner(self.target_ports, self.thread_limit, self.timeout)
+        result = scanner._PortScanner__TCP_connect(self.test_ip, 80, ProbeContext(''))
+        # no UDP socket without a message
+        mock_probe_socket.socket.assert_not_called()
+        self.assertEqual(result, (80, 'FILTERED'))
+        mock_tcp_socket.close.assert_called_once_with()
+
+
+@patch('pyportscanner.pyscanner.read_input', autospec=True)
+class PortScannerLoopbackTest(ListenerTestCase):
+    def test_scan_more_ports_than_slots(self, mock_read_input):
+        mock_read_input.return_value = {}
+        # more ports than slots, so probes have to wait for completions
+        scanner = pyscanner.PortScanner([self.open_port] * 5, 2, 2)
+        result = scanner.scan('127.0.0.1')
+        self.assertEqual(result, {self.open_port: 'OPEN'})
+
+    def test_scan_iter(self, mock_read_input):
+        mock_read_input.return_value = {}
+        scanner = pyscanner.PortScanner([self.open_port], 2, 2)
+        result = list(scanner.scan_iter('127.0.0.1'))
+        self.assertEqual(len(result), 1)
+        port, status, latency = result[0]
+        self.assertEqual((port, status), (self.open_port, 'OPEN'))
+        self.assertGreaterEqual(latency, 0)
+
+    def test_scan_iter_probe_error(self, mock_read_input):
+        mock_read_input.return_value = {}
+        # an invalid port makes the probe raise, which has to reach the caller instead of hanging
+        scanner = pyscanner.PortScanner([self.open_port, 70000], 10, 1, discovery=False)
+        with self.assertRaises(OverflowError):
+            list(scanner.scan_iter('127.0.0.1'))
+        with self.assertRaises(OverflowError):
+            scanner.scan('127.0.0.1', deadline=5)
+
+    def test_scan_iter_server_unknown(self, mock_read_input):
+        mock_read_input.return_value = {}
+        scanner = pyscanner.PortScanner([self.open_port], 2, 2)
+        with patch.object(scanner, '_resolve', return_value=None):
+            self.assertEqual(list(scanner.scan_iter('unknown.invalid')), [])
+
+    def test_scan_many(self, mock_read_input):
+        mock_read_input.return_value = {}
+        lookup = Mock(side_effect=[socket.gaierror, '127.0.0.1'])
+        resolver = Resolver(lookup=lookup)
+        scanner = pyscanner.PortScanner([self.open_port], 2, 2, resolver=resolver)
+        result = scanner.scan_many(['127.0.0.1', 'unknown.invalid', 'localhost'])
+        self.assertEqual(result, {
+            '127.0.0.1': {self.open_port: 'OPEN'},
+            'unknown.invalid': {},
+            'localhost': {self.open_port: 'OPEN'},
+        })
+
+    def test_scan_many_iter(self, mock_read_input):
+        mock_read_input.return_value = {}
+        scanner = pyscanner.PortScanner([self.open_port], 2, 2)
+        result = [result[:3] for result in scanner.scan_many_iter('127.0.0.1/32')]
+        self.assertEqual(result, [('127.0.0.1', self.open_port, 'OPEN')])
+
+    def test_scan_port_spec(self, mock_read_input):
+        mock_read_input.return_value = {}
+        scanner = pyscanner.PortScanner('{0},{0}-{0}'.format(self.open_port), 2, 2)
+        self.assertEqual(len(scanner.get_target_ports()), 1)
+        self.assertEqual(scanner.scan('127.0.0.1'), {self.open_port: 'OPEN'})
+
+    def test_scan_rate(self, mock_read_input):
+        mock_read_input.return_value = {}
+        rate = RateController(rate=1000, window=1, increase=10)
+        for engine in pyscanner.ENGINES:
+            scanner = pyscanner.PortScanner([self.open_port], 2, 2, engine=engine, rate=rate)
+            self.assertEqual(scanner.scan('127.0.0.1'), {self.open_port: 'OPEN'})
+        # every answered probe closed a window without congestion
+        self.assertEqual(rate.rate, 1000 + 10 * len(pyscanner.ENGINES))
+
+    @patch('builtins.print')
+    def test_scan_deadline_verbose(self, mock_print, mock_read_input):
+        mock_read_input.return_value = {}
+        scanner = pyscanner.PortScanner('1-65535', 2, 1, verbose=True, engine='selector')
+        result = scanner.scan('127.0.0.1', deadline=0.1)
+        self.assertFalse(result.complete)
+        # only the probed ports are reported
+        printed = ''.join(str(call) for call in mock_print.call_args_list)
+        self.assertEqual('{}/UNKNOWN'.format(self.open_port) in printed, self.open_port in result)
+
+    def test_scan_deadline(self, mock_read_input):
+        mock_read_input.return_value = {}
+        for engine in pyscanner.ENGINES:
+            scanner = pyscanner.PortScanner([self.open_port, 1], 2, 2, engine=engine)
+            result = scanner.scan('127.0.0.1', deadline=5)
+            self.assertTrue(result.complete)
+            self.assertEqual(result, {1: 'CLOSE', self.open_port: 'OPEN'})
+
+            scanner = pyscanner.PortScanner('1-65535', 2, 2, engine=engine)
+            start_time = time.monotonic()
+            result = scanner.scan('127.0.0.1', deadline=0.2)
+            self.assertLess(time.monotonic() - start_time, 1)
+            self.assertFalse(result.complete)
+            # ports are probed by rank, and only the probed ones are reported
+            self.assertIn(1, result)
+            self.assertLess(len(result), 65535)
+
+    def test_scan_many_deadline(self, mock_read_input):
+        mock_read_input.return_value = {}
+        scanner = pyscanner.PortScanner('1-65535', 2, 2, discovery=False)
+        result = scanner.scan_many(['127.0.0.1', '127.0.0.2'], deadline=0.2)
+        self.assertFalse(result['127.0.0.1'].complete)
+        self.assertLessEqual(abs(len(result['127.0.0.1']) - len(result['127.0.0.2'])), 2)
+        with self.assertRaises(ValueError):
+            scanner.scan('127.0.0.1', deadline=0)
@@ -0,0 +1,102 @@
+import time
+import unittest
+from unittest.mock import patch
+
+from os import sys, path
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+from pyportscanner.ratelimit import RateController, TokenBucket
+
+
+@patch('pyportscanner.ratelimit.time', autospec=True)
+class TokenBucketTest(unittest.TestCase):
+    def test_reserve(self, mock_time):
+        mock_time.monotonic.return_value = 100.0
+        bucket = TokenBucket(rate=10, burst=2)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertAlmostEqual(bucket.reserve(), 0.1)
+        self.assertAlmostEqual(bucket.reserve(), 0.2)
+        # tokens are refilled over time, up to burst
+        mock_time.monotonic.return_value = 110.0
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertAlmostEqual(bucket.reserve(), 0.1)
+
+    def test_acquire(self, mock_time):
+        mock_time.monotonic.return_value = 100.0
+        bucket = TokenBucket(rate=4, burst=1)
+        bucket.acquire()
+        mock_time.sleep.assert_not_called()
+        bucket.acquire()
+        mock_time.sleep.assert_called_once_with(0.25)
+
+    def test_invalid_rate(self, mock_time):
+        with self.assertRaises(ValueError):
+            TokenBucket(rate=0)
+
+
+class RateControllerTest(unittest.TestCase):
+    def test_additive_increase(self):
+        rate = RateController(rate=100, window=10, increase=5)
+        for _ in range(10):
+            rate.record('10.0.0.1', 'CLOSE')
+        self.assertEqual(rate.rate, 105)
+
+    def test_multiplicative_decrease(self):
+        rate = RateController(rate=100, per_host_rate=40, window=10, decrease=0.5)
+        rate.reserve('10.0.0.1')
+        for i in range(10):
+            rate.record('10.0.0.1', 'FILTERED' if i < 3 else 'OPEN')
+        self.assertEqual(rate.rate, 50)
+        self.assertEqual(rate.host_rate('10.0.0.1'), 20)
+        self.assertEqual(rate.host_rate('10.0.0.2'), 40)
+
+    def test_bounds(self):
+        rate = RateController(rate=20, min_rate=15, max_rate=22, window=1, increase=5)
+        rate.record('10.0.0.1', 'OPEN')
+        self.assertEqual(rate.rate, 22)
+        rate.record('10.0.0.1', 'FILTERED')
+        rate.record('10.0.0.1', 'FILTERED')
+        self.assertEqual(rate.rate, 15)
+
+    @patch('pyportscanner.ratelimit.time', autospec=True)
+    def test_paced(self, mock_time):
+        clock = [100.0]
+        mock_time.monotonic.side_effect = lambda: clock[0]
+
+        def sleep(seconds):
+            clock[0] += seconds
+
+        mock_time.sleep.side_effect = sleep
+        rate = RateController(rate=10, per_host_rate=1)
+        jobs = [('10.0.0.1', 80), ('10.0.0.1', 443)]
+        self.assertEqual(list(rate.paced(jobs)), jobs)
+        mock_time.sleep.assert_called_once_with(1.0)
+
+    @patch('pyportscanner.ratelimit.time', autospec=True)
+    def test_paced_other_hosts(self, mock_time):
+        mock_time.monotonic.return_value = 100.0
+        rate = RateController(rate=100, per_host_rate=1)
+        jobs = [('10.0.0.1', 80), ('10.0.0.1', 443), ('10.0.0.2', 80), ('10.0.0.3', 80)]
+        # the throttled job of 10.0.0.1 does not hold back the other hosts
+        self.assertEqual(list(rate.paced(jobs)), [jobs[0], jobs[2], jobs[3], jobs[1]])
+        mock_time.sleep.assert_called_once_with(1.0)
+
+    def test_paced_per_host_rate(self):
+        rate = RateController(rate=10000, per_host_rate=20)
+        jobs = [('10.0.0.{}'.format(host), port) for port in range(20) for host in range(4)]
+        start_time = time.monotonic()
+        self.assertEqual(sorted(rate.paced(jobs)), sorted(jobs))
+        # about 18 / 20 seconds per host, the hosts being paced side by side
+        self.assertLess(time.monotonic() - start_time, 2)
+
+    def test_recorded(self):
+        rate = RateController(rate=10, window=2, increase=1)
+        results = [('10.0.0.1', 80, 'OPEN', 0.1), ('10.0.0.1', 81, 'CLOSE', 0.1)]
+        self.assertEqual(list(rate.recorded(results)), results)
+        self.assertEqual(rate.rate, 11)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import socket
+import unittest
+from unittest.mock import Mock, patch
+
+from os import sys, path
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+from pyportscanner.resolver import Resolver
+
+
+class ResolverTest(unittest.TestCase):
+    def test_resolve_cached(self):
+        lookup = Mock(return_value='10.0.0.1')
+        resolver = Resolver(lookup=lookup)
+        self.assertEqual(resolver.resolve('foo.com'), '10.0.0.1')
+        self.assertEqual(resolver.resolve('foo.com'), '10.0.0.1')
+        lookup.assert_called_once_with('foo.com')
+
+    def test_resolve_ip(self):
+        lookup = Mock()
+        resolver = Resolver(lookup=lookup)
+        self.assertEqual(resolver.resolve('10.0.0.1'), '10.0.0.1')
+        lookup.assert_not_called()
+
+    def test_negative_cache(self):
+        lookup = Mock(side_effect=socket.gaierror)
+        resolver = Resolver(negative_ttl=30, lookup=lookup)
+        self.assertIsNone(resolver.resolve('unknown.invalid'))
+        self.assertIsNone(resolver.resolve('unknown.invalid'))
+        lookup.assert_called_once_with('unknown.invalid')
+
+    @patch('pyportscanner.resolver.time', autospec=True)
+    def test_expiry(self, mock_time):
+        mock_time.monotonic.return_value = 100
+        lookup = Mock(side_effect=['10.0.0.1', '10.0.0.2'])
+        resolver = Resolver(ttl=10, lookup=lookup)
+        self.assertEqual(resolver.resolve('foo.com'), '10.0.0.1')
+        mock_time.monotonic.return_value = 111
+        self.assertEqual(resolver.resolve('foo.com'), '10.0.0.2')
+        self.assertEqual(lookup.call_count, 2)
+
+    def test_eviction(self):
+        lookup = Mock(side_effect=lambda host_name: '10.0.0.1')
+        resolver = Resolver(max_size=2, lookup=lookup)
+        resolver.resolve('a.com')
+        resolver.resolve('b.com')
+        resolver.resolve('a.com')
+        resolver.resolve('c.com')
+        self.assertEqual(len(resolver), 2)
+        # b.com was the least recently used name
+        resolver.resolve('b.com')
+        self.assertEqual([call[0][0] for call in lookup.call_args_list], ['a.com', 'b.com', 'c.com', 'b.com'])
+
+    def test_resolve_many(self):
+        addresses = {'a.com': '10.0.0.1', 'b.com': '10.0.0.2'}
+        lookup = Mock(side_effect=lambda host_name: self._lookup(addresses, host_name))
+        resolver = Resolver(max_workers=2, lookup=lookup)
+        items = ['http://a.com', 'http://unknown.invalid', 'http://10.0.0.9', 'http://b.com', 'http://a.com']
+        result = list(resolver.resolve_many(items, key=lambda item: item[7:]))
+        self.assertEqual(result, [
+            ('http://a.com', '10.0.0.1'),
+            ('http://unknown.invalid', None),
+            ('http://10.0.0.9', '10.0.0.9'),
+            ('http://b.com', '10.0.0.2'),
+            ('http://a.com', '10.0.0.1'),
+        ])
+
+    @staticmethod
+    def _lookup(addresses, host_name):
+        if host_name not in addresses:
+            raise socket.gaierror
+        return addresses[host_name]
@@ -0,0 +1,74 @@
+import errno
+import json
+import unittest
+
+from os import sys, path
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+from pyportscanner.result import ScanResult, connect_status
+
+
+class ScanResultTest(unittest.TestCase):
+    def test_mapping(self):
+        result = ScanResult()
+        result.fill([443, 80, 22])
+        result.set(80, 'OPEN', 0.01)
+        self.assertEqual(len(result), 3)
+        self.assertEqual(result, {22: 'CLOSE', 80: 'OPEN', 443: 'CLOSE'})
+        self.assertEqual(list(result), [22, 80, 443])
+        self.assertEqual(result[80], 'OPEN')
+        self.assertIn(443, result)
+        self.assertNotIn(81, result)
+        self.assertRaises(KeyError, result.__getitem__, 81)
+        self.assertIsNone(result.get(70000))
+        self.assertEqual(result.open_ports(), [80])
+        self.assertEqual(result.latencies, {80: 0.01})
+
+    def test_update_status(self):
+        result = ScanResult({80: 'OPEN'})
+        result.latencies[80] = 0.5
+        result[80] = 'CLOSE'
+        self.assertEqual(len(result), 1)
+        self.assertEqual(result.latencies, {})
+        del result[80]
+        self.assertEqual(len(result), 0)
+        self.assertRaises(ValueError, result.__setitem__, 80, 'MAYBE')
+        self.assertRaises(ValueError, result.__setitem__, 70000, 'OPEN')
+
+    def test_string_ports(self):
+        result = ScanResult({'80': 'OPEN'})
+        result['443'] = 'CLOSE'
+        self.assertEqual(list(result), [80, 443])
+        self.assertEqual(result['80'], 'OPEN')
+        self.assertIn('443', result)
+        self.assertNotIn('http', result)
+        self.assertRaises(KeyError, result.__getitem__, 'http')
+        self.assertRaises(ValueError, result.__setitem__, 'http', 'OPEN')
+        del result['443']
+        self.assertEqual(list(result), [80])
+
+    def test_to_dict(self):
+        result = ScanResult({22: 'CLOSE', 80: 'OPEN'})
+        self.assertIs(type(result.to_dict()), dict)
+        self.assertEqual(result.to_dict(), {22: 'CLOSE', 80: 'OPEN'})
+        self.assertEqual(json.loads(json.dumps(result.to_dict())), {'22': 'CLOSE', '80': 'OPEN'})
+
+    def test_filtered(self):
+        result = ScanResult({22: 'FILTERED', 80: 'OPEN', 23: 'CLOSE'})
+        self.assertEqual(result.filtered_ports(), [22])
+        self.assertEqual(connect_status(0), 'OPEN')
+        self.assertEqual(connect_status(errno.ECONNREFUSED), 'CLOSE')
+        self.assertEqual(connect_status(errno.ETIMEDOUT), 'FILTERED')
+
+    def test_serialization(self):
+        result = ScanResult()
+        result.fill(range(1, 65536))
+        result.set(8080, 'OPEN', 0.25)
+        data = result.to_bytes()
+        self.assertLess(len(data), 1024)
+        loaded = ScanResult.from_bytes(data)
+        self.assertEqual(len(loaded), 65535)
+        self.assertEqual(loaded.open_ports(), [8080])
+        self.assertEqual(loaded.latencies, {8080: 0.25})
+        self.assertEqual(loaded, result)
+        self.assertRaises(ValueError, ScanResult.from_bytes, b'XXXX' + data[4:])
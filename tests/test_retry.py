@@ -0,0 +1,60 @@
+import unittest
+from unittest.mock import Mock, call, patch
+
+from os import sys, path
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+from pyportscanner.retry import RetryPolicy
+
+
+class RetryPolicyTest(unittest.TestCase):
+    def test_delay(self):
+        policy = RetryPolicy(retries=3, backoff=0.5, multiplier=2)
+        self.assertEqual([policy.delay(attempt) for attempt in (1, 2, 3)], [0.5, 1.0, 2.0])
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            RetryPolicy(retries=-1)
+        with self.assertRaises(ValueError):
+            RetryPolicy(multiplier=0.5)
+
+    @patch('pyportscanner.retry.time', autospec=True)
+    def test_run_retries_filtered_only(self, mock_time):
+        probe = Mock(side_effect=[
+            [('ip', 22, 'FILTERED', 1.0), ('ip', 23, 'CLOSE', 0.1), ('ip', 80, 'OPEN', 0.1)],
+            [('ip', 22, 'FILTERED', 1.0)],
+            [('ip', 22, 'OPEN', 0.2)],
+        ])
+        policy = RetryPolicy(retries=2, backoff=0.5)
+        result = list(policy.run(probe, [('ip', 22), ('ip', 23), ('ip', 80)]))
+        self.assertEqual(result, [('ip', 23, 'CLOSE', 0.1), ('ip', 80, 'OPEN', 0.1), ('ip', 22, 'OPEN', 0.2)])
+        self.assertEqual(probe.call_args_list[1:], [call([('ip', 22)]), call([('ip', 22)])])
+        self.assertEqual(mock_time.sleep.call_args_list, [call(0.5), call(1.0)])
+
+    @patch('pyportscanner.retry.time', autospec=True)
+    def test_run_gives_up(self, mock_time):
+        probe = Mock(return_value=[('ip', 22, 'FILTERED', 1.0)])
+        result = list(RetryPolicy(retries=1).run(probe, [('ip', 22)]))
+        self.assertEqual(result, [('ip', 22, 'FILTERED', 1.0)])
+        self.assertEqual(probe.call_count, 2)
+
+    @patch('pyportscanner.retry.time', autospec=True)
+    def test_run_no_filtered(self, mock_time):
+        probe = Mock(return_value=[('ip', 23, 'CLOSE', 0.1)])
+        list(RetryPolicy(retries=3).run(probe, [('ip', 23)]))
+        probe.assert_called_once_with([('ip', 23)])
+        mock_time.sleep.assert_not_called()
+
+
+    @patch('pyportscanner.retry.time', autospec=True)
+    def test_run_deadline(self, mock_time):
+        mock_time.monotonic.return_value = 100.0
+        probe = Mock(return_value=[('ip', 22, 'FILTERED', 1.0)])
+        result = list(RetryPolicy(retries=2, backoff=1).run(probe, [('ip', 22)], deadline=100.5))
+        self.assertEqual(result, [('ip', 22, 'FILTERED', 1.0)])
+        probe.assert_called_once_with([('ip', 22)])
+        mock_time.sleep.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
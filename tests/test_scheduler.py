@@ -0,0 +1,63 @@
+import unittest
+from unittest.mock import patch
+
+from os import sys, path
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+from pyportscanner import pyscanner
+from pyportscanner.portspec import PortSpec
+from pyportscanner.scheduler import CyclicPermutation, InterleavedScheduler, _is_prime
+
+
+class CyclicPermutationTest(unittest.TestCase):
+    def test_permutation(self):
+        for n in (0, 1, 2, 3, 10, 1000, 4096):
+            permutation = CyclicPermutation(n, seed=n)
+            self.assertTrue(_is_prime(permutation.prime))
+            self.assertEqual(sorted(permutation), list(range(n)))
+            self.assertEqual(len(permutation), n)
+
+    def test_seeded(self):
+        self.assertEqual(list(CyclicPermutation(500, seed=1)), list(CyclicPermutation(500, seed=1)))
+        self.assertNotEqual(list(CyclicPermutation(500, seed=1)), list(CyclicPermutation(500, seed=2)))
+        self.assertNotEqual(list(CyclicPermutation(500, seed=1)), list(range(500)))
+
+    def test_large_space_is_lazy(self):
+        # 256 hosts times every port, never materialized
+        permutation = iter(CyclicPermutation(256 * 65535, seed=3))
+        first = [next(permutation) for _ in range(1000)]
+        self.assertEqual(len(set(first)), 1000)
+        self.assertTrue(all(0 <= index < 256 * 65535 for index in first))
+
+    def test_is_prime(self):
+        self.assertEqual([n for n in range(30) if _is_prime(n)], [2, 3, 5, 7, 11, 13, 17, 19, 23, 29])
+        self.assertTrue(_is_prime(2 ** 61 - 1))
+        self.assertFalse(_is_prime(3215031751))
+
+
+class InterleavedSchedulerTest(unittest.TestCase):
+    def test_jobs(self):
+        scheduler = InterleavedScheduler(seed=7)
+        ips = ['10.0.0.{}'.format(i) for i in range(1, 9)]
+        ports = PortSpec('1-100')
+        jobs = list(scheduler.jobs(ips, ports))
+        self.assertEqual(sorted(jobs), sorted((ip, port) for ip in ips for port in ports))
+        # consecutive probes rarely hit the same host
+        same_host = sum(a[0] == b[0] for a, b in zip(jobs, jobs[1:]))
+        self.assertLess(same_host, len(jobs) // 4)
+        self.assertEqual(jobs, list(scheduler.jobs(ips, ports)))
+
+    @patch('pyportscanner.pyscanner.read_input', autospec=True)
+    def test_scanner_schedule(self, mock_read_input):
+        mock_read_input.return_value = {}
+        scanner = pyscanner.PortScanner([1, 2, 3], 2, 1, schedule=InterleavedScheduler(seed=1), discovery=False)
+        jobs = list(scanner._PortScanner__many_jobs(['127.0.0.1-2'], lambda host, ip: True))
+        self.assertEqual(len(jobs), 6)
+        self.assertNotEqual(jobs, sorted(jobs))
+        self.assertEqual(sorted(scanner.scan('127.0.0.1')), [1, 2, 3])
+        with self.assertRaises(ValueError):
+            pyscanner.PortScanner([1], schedule='random')
+
+
+if __name__ == '__main__':
+    unittest.main()
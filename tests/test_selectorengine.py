@@ -0,0 +1,61 @@
+import errno
+from unittest.mock import patch
+
+from os import sys, path
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+from pyportscanner import pyscanner
+from pyportscanner.probe import ProbeContext
+from pyportscanner.selectorengine import SelectorEngine
+from tests import ListenerTestCase
+
+
+class SelectorEngineTest(ListenerTestCase):
+    def test_run_loopback(self):
+        engine = SelectorEngine(max_in_flight=10, timeout=2)
+        jobs = [('127.0.0.1', self.open_port), ('127.0.0.1', self.closed_port)]
+        result = {port: status for _, port, status, _ in engine.run(jobs, ProbeContext('hello'))}
+        self.assertEqual(result, {self.open_port: 'OPEN', self.closed_port: 'CLOSE'})
+
+    def test_run_more_ports_than_limit(self):
+        engine = SelectorEngine(max_in_flight=1, timeout=2, batch_size=1)
+        jobs = [('127.0.0.1', port) for port in (self.closed_port, self.open_port, self.closed_port)]
+        result = list(engine.run(jobs))
+        self.assertEqual(len(result), 3)
+        self.assertEqual({port: status for _, port, status, _ in result}, {self.open_port: 'OPEN', self.closed_port: 'CLOSE'})
+
+    def test_run_timeout(self):
+        engine = SelectorEngine(max_in_flight=10, timeout=0.05)
+        with patch('pyportscanner.selectorengine.selectors.DefaultSelector') as mock_selector:
+            mock_selector.return_value.select.return_value = []
+            with patch('pyportscanner.selectorengine.socket.socket') as mock_socket:
+                mock_socket.return_value.connect_ex.return_value = errno.EINPROGRESS
+                result = list(engine.run([('127.0.0.1', self.open_port)]))
+        self.assertEqual([result[0][:3]], [('127.0.0.1', self.open_port, 'FILTERED')])
+        self.assertGreaterEqual(result[0][3], 0.05)
+
+    @patch('pyportscanner.pyscanner.read_input', autospec=True)
+    def test_port_scanner_selector_engine(self, mock_read_input):
+        mock_read_input.return_value = {}
+        scanner = pyscanner.PortScanner([self.open_port, self.closed_port], 10, 2, engine='selector')
+        result = scanner.scan('127.0.0.1')
+        self.assertEqual(result, {self.open_port: 'OPEN', self.closed_port: 'CLOSE'})
+
+    @patch('pyportscanner.pyscanner.read_input', autospec=True)
+    def test_port_scanner_selector_scan_iter(self, mock_read_input):
+        mock_read_input.return_value = {}
+        scanner = pyscanner.PortScanner([self.open_port, self.closed_port], 10, 2, engine='selector')
+        result = {port: status for port, status, _ in scanner.scan_iter('127.0.0.1')}
+        self.assertEqual(result, {self.open_port: 'OPEN', self.closed_port: 'CLOSE'})
+
+    @patch('pyportscanner.pyscanner.read_input', autospec=True)
+    def test_port_scanner_selector_scan_many(self, mock_read_input):
+        mock_read_input.return_value = {}
+        scanner = pyscanner.PortScanner([self.open_port, self.closed_port], 10, 2, engine='selector')
+        result = scanner.scan_many(['127.0.0.1', 'localhost'])
+        expected = {self.open_port: 'OPEN', self.closed_port: 'CLOSE'}
+        self.assertEqual(result, {'127.0.0.1': expected, 'localhost': expected})
+
+    @patch('pyportscanner.pyscanner.read_input', autospec=True)
+    def test_port_scanner_invalid_engine(self, mock_read_input):
+        self.assertRaises(ValueError, pyscanner.PortScanner, [80], engine='nope')
@@ -0,0 +1,51 @@
+from unittest.mock import patch
+
+from os import sys, path
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+from pyportscanner.shardscanner import ShardedScanner
+from tests import ListenerTestCase
+
+
+class ShardedScannerTest(ListenerTestCase):
+    def test_scan_many(self):
+        scanner = ShardedScanner([self.open_port, self.closed_port], thread_limit=2, timeout=2,
+                                 workers=2, chunk_size=1)
+        result = scanner.scan_many(['127.0.0.1', '127.0.0.2-3', 'localhost'])
+        expected = {self.open_port: 'OPEN', self.closed_port: 'CLOSE'}
+        self.assertEqual(result['127.0.0.1'], expected)
+        self.assertEqual(result['localhost'], expected)
+        self.assertEqual(set(result), {'127.0.0.1', '127.0.0.2', '127.0.0.3', 'localhost'})
+        self.assertEqual(scanner.stats['workers'], 2)
+        self.assertEqual(scanner.stats['probes'], 6)
+
+    @patch('pyportscanner.discovery.HostDiscovery.alive', autospec=True)
+    def test_force_scan(self, mock_alive):
+        # no host answers the discovery, in the parent nor in forked workers
+        mock_alive.return_value = set()
+        scanner = ShardedScanner([self.open_port, self.closed_port], thread_limit=2, timeout=2, workers=1)
+        self.assertEqual(scanner.scan_many('127.0.0.1'), {'127.0.0.1': {}})
+        result = scanner.scan_many('127.0.0.1', force_scan=True)
+        self.assertEqual(result['127.0.0.1'], {self.open_port: 'OPEN', self.closed_port: 'CLOSE'})
+        self.assertEqual(scanner.stats['probes'], 2)
+
+    def test_configuration(self):
+        scanner = ShardedScanner([1, 2], thread_limit=2, workers=2, timing='adaptive', retry=1, rate=100,
+                                 discovery=False)
+        config = scanner._ShardedScanner__config
+        self.assertEqual(config['timing'], 'adaptive')
+        self.assertEqual(config['retry'], 1)
+        # the rate of the scan is shared by the workers
+        self.assertEqual(config['rate'], 50)
+        self.assertIsNone(scanner._ShardedScanner__scanner.discovery)
+
+    def test_worker_error(self):
+        # a port out of range makes the probes of the worker raise
+        scanner = ShardedScanner([self.open_port, 70000], thread_limit=2, timeout=2, workers=1, discovery=False)
+        with self.assertRaises(OverflowError):
+            list(scanner.scan_many_iter('127.0.0.1'))
+
+    def test_units(self):
+        scanner = ShardedScanner([1, 2, 3], thread_limit=2, workers=1)
+        units = list(scanner._ShardedScanner__units(['127.0.0.1', '127.0.0.1/32']))
+        self.assertEqual(units, [('127.0.0.1', [1, 2]), ('127.0.0.1', [3])])
@@ -0,0 +1,122 @@
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from os import sys, path
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+from pyportscanner import pyscanner
+from pyportscanner.sinks import BinarySink, CsvSink, FileSink, JsonLinesSink, ResultSink, open_sink, read_binary
+from tests import ListenerTestCase
+
+
+RESULTS = [
+    ('10.0.0.1', 22, 'OPEN', 0.5),
+    ('10.0.0.1', 23, 'CLOSE', 0.25),
+    ('10.0.0.2', 80, 'FILTERED', None),
+]
+
+
+class SinkTest(unittest.TestCase):
+    def test_jsonl(self):
+        output = io.StringIO()
+        with JsonLinesSink(output, buffer_size=2) as sink:
+            for result in RESULTS:
+                sink.write(*result)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(json.loads(lines[0]), {'ip': '10.0.0.1', 'port': 22, 'status': 'OPEN', 'latency': 0.5})
+        self.assertEqual([tuple(json.loads(line).values()) for line in lines], RESULTS)
+
+    def test_csv(self):
+        output = io.StringIO()
+        sink = CsvSink(output)
+        for result in RESULTS:
+            sink.write(*result)
+        # nothing is written before the buffer is full or flushed
+        self.assertEqual(output.getvalue().splitlines(), ['ip,port,status,latency'])
+        sink.flush()
+        rows = list(csv.reader(io.StringIO(output.getvalue())))
+        self.assertEqual(rows[1], ['10.0.0.1', '22', 'OPEN', '0.5'])
+        self.assertEqual(rows[3], ['10.0.0.2', '80', 'FILTERED', ''])
+
+    def test_binary(self):
+        output = io.BytesIO()
+        sink = BinarySink(output, buffer_size=1)
+        for result in RESULTS:
+            sink.write(*result)
+        self.assertEqual(sink.count, 3)
+        self.assertEqual(len(output.getvalue()), 6 + 3 * 11)
+        output.seek(0)
+        self.assertEqual(list(read_binary(output, chunk_size=2)), RESULTS)
+
+    def test_binary_invalid(self):
+        with self.assertRaises(ValueError):
+            list(read_binary(io.BytesIO(b'\0' * 17)))
+
+    def test_abstract(self):
+        class IncompleteSink(FileSink):
+            pass
+
+        with self.assertRaises(TypeError):
+            ResultSink()
+        with self.assertRaises(TypeError):
+            IncompleteSink(io.StringIO())
+
+
+@patch('pyportscanner.pyscanner.read_input', autospec=True)
+class ScannerSinkTest(ListenerTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        super().setUp()
+        self.ports = [self.open_port] + [port for port in range(1, 11)]
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.directory)
+
+    def test_export(self, mock_read_input):
+        mock_read_input.return_value = {}
+        path = os.path.join(self.directory, 'results.bin')
+        with open_sink(path) as sink:
+            scanner = pyscanner.PortScanner(self.ports, 4, 2, discovery=False, sink=sink)
+            self.assertEqual(scanner.export(['127.0.0.1', '127.0.0.2']), 2 * len(self.ports))
+        results = list(read_binary(path))
+        self.assertEqual(len(results), 2 * len(self.ports))
+        self.assertEqual([(ip, port) for ip, port, status, _ in results if status == 'OPEN'],
+                         [('127.0.0.1', self.open_port)])
+
+    def test_scan_sink(self, mock_read_input):
+        mock_read_input.return_value = {}
+        path = os.path.join(self.directory, 'results.jsonl')
+        scanner = pyscanner.PortScanner(self.ports, 4, 2, sink=path)
+        result = scanner.scan('127.0.0.1')
+        scanner.sink.close()
+        with open(path) as jsonl:
+            written = dict((row['port'], row['status']) for row in map(json.loads, jsonl))
+        self.assertEqual(written, result)
+
+    def test_string_ports(self, mock_read_input):
+        mock_read_input.return_value = {}
+        path = os.path.join(self.directory, 'results.bin')
+        journal = os.path.join(self.directory, 'scan.journal')
+        scanner = pyscanner.PortScanner([str(port) for port in self.ports], 4, 2, sink=path, checkpoint=journal)
+        result = scanner.scan('127.0.0.1')
+        self.assertEqual(result.open_ports(), [self.open_port])
+        self.assertEqual(list(scanner.probe_iter([('127.0.0.1', str(self.open_port))]))[0][1:3],
+                         (self.open_port, 'OPEN'))
+        scanner.sink.close()
+        self.assertEqual(sorted(port for _, port, _, _ in read_binary(path)), sorted(self.ports + [self.open_port]))
+
+    def test_export_without_sink(self, mock_read_input):
+        mock_read_input.return_value = {}
+        with self.assertRaises(ValueError):
+            pyscanner.PortScanner(self.ports, 4, 2).export('127.0.0.1')
+
+
+if __name__ == '__main__':
+    unittest.main()
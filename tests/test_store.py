@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from os import sys, path
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+from pyportscanner import pyscanner
+from pyportscanner.sinks import open_sink
+from pyportscanner.store import ResultStore
+from tests import ListenerTestCase
+
+
+class ResultStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'results.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    @patch('pyportscanner.store.time.time', autospec=True)
+    def test_query(self, mock_time):
+        store = ResultStore(self.path, buffer_size=2)
+        mock_time.return_value = 100
+        store.write('10.0.0.1', 3389, 'OPEN', 0.5)
+        store.write('10.0.0.2', 3389, 'CLOSE')
+        mock_time.return_value = 200
+        store.write('10.0.1.1', 3389, 'OPEN', 0.25)
+        store.write('10.0.0.2', 3389, 'OPEN', 0.25)
+        store.write('10.0.0.2', 22, 'FILTERED')
+        store.close()
+
+        store = ResultStore(self.path)
+        self.assertEqual(len(store), 5)
+        self.assertEqual(store.hosts(3389), ['10.0.0.1', '10.0.0.2', '10.0.1.1'])
+        self.assertEqual(store.hosts(3389, since=150), ['10.0.0.2', '10.0.1.1'])
+        self.assertEqual(store.hosts(3389, until=150), ['10.0.0.1'])
+        self.assertEqual(store.hosts(22, 'FILTERED'), ['10.0.0.2'])
+        records = list(store.query(ip='10.0.0.2'))
+        self.assertEqual([(record.time, record.port, record.status) for record in records],
+                         [(100, 3389, 'CLOSE'), (200, 3389, 'OPEN'), (200, 22, 'FILTERED')])
+        self.assertEqual(len(list(store.query(ip='10.0.0.0/24', port=3389))), 3)
+        self.assertEqual(list(store.query(port=80)), [])
+        with self.assertRaises(ValueError):
+            store.hosts(3389, 'UP')
+        store.close()
+
+    @patch('pyportscanner.store.time.time', autospec=True)
+    def test_arrival_time(self, mock_time):
+        store = ResultStore(self.path)
+        mock_time.return_value = 100
+        store.write('10.0.0.1', 22, 'OPEN')
+        mock_time.return_value = 200
+        store.write('10.0.0.1', 80, 'OPEN')
+        # the buffer is written later, each result keeps the time it arrived
+        mock_time.return_value = 300
+        self.assertEqual([(record.time, record.port) for record in store.query()], [(100, 22), (200, 80)])
+        store.close()
+
+    def test_open_sink(self):
+        store = open_sink(self.path)
+        self.assertIsInstance(store, ResultStore)
+        store.close()
+
+
+@patch('pyportscanner.pyscanner.read_input', autospec=True)
+class ScannerStoreTest(ListenerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.ports = [self.open_port] + [port for port in range(1, 11)]
+
+    def test_scan_store(self, mock_read_input):
+        mock_read_input.return_value = {}
+        with ResultStore(':memory:') as store:
+            scanner = pyscanner.PortScanner(self.ports, 4, 2, sink=store)
+            scanner.scan('127.0.0.1')
+            self.assertEqual(len(store), len(self.ports))
+            self.assertEqual(store.hosts(self.open_port), ['127.0.0.1'])
+            self.assertEqual(store.hosts(1), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
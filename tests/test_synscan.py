@@ -0,0 +1,88 @@
+import socket
+import struct
+import unittest
+from unittest.mock import patch
+
+from os import sys, path
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+from pyportscanner import pyscanner
+from pyportscanner.synscan import ACK, RST, SYN, SynEngine, checksum, parse_reply, syn_available, syn_packet
+from tests import ListenerTestCase
+
+
+class PacketTest(unittest.TestCase):
+    def test_syn_packet(self):
+        packet = syn_packet('10.0.0.1', '10.0.0.2', 40000, 443, 12345)
+        source_port, destination_port, sequence, ack, offset, flags = struct.unpack_from('!HHIIBB', packet)
+        self.assertEqual((source_port, destination_port, sequence, ack, offset >> 4, flags),
+                         (40000, 443, 12345, 0, 5, SYN))
+        # the checksum of a segment with its pseudo header is 0
+        pseudo = socket.inet_aton('10.0.0.1') + socket.inet_aton('10.0.0.2') + struct.pack('!BBH', 0, 6, len(packet))
+        self.assertEqual(checksum(pseudo + packet), 0)
+
+    def test_checksum(self):
+        # example of RFC 1071
+        self.assertEqual(checksum(bytes([0x00, 0x01, 0xf2, 0x03, 0xf4, 0xf5, 0xf6, 0xf7])), ~0xddf2 & 0xffff)
+        self.assertEqual(checksum(b'\x01'), ~0x0100 & 0xffff)
+
+    def test_parse_reply(self):
+        segment = struct.pack('!HHIIBBHHH', 443, 40000, 1, 12346, 5 << 4, SYN | ACK, 1024, 0, 0)
+        header = struct.pack('!BBHHHBBH4s4s', 0x45, 0, 20 + len(segment), 0, 0, 64, socket.IPPROTO_TCP, 0,
+                             socket.inet_aton('10.0.0.2'), socket.inet_aton('10.0.0.1'))
+        self.assertEqual(parse_reply(header + segment), ('10.0.0.2', 443, 40000, 12346, SYN | ACK))
+        rst = header + struct.pack('!HHIIBBHHH', 443, 40000, 0, 12346, 5 << 4, RST | ACK, 0, 0, 0)
+        self.assertTrue(parse_reply(rst)[4] & RST)
+        # not TCP
+        self.assertIsNone(parse_reply(header[:9] + bytes([socket.IPPROTO_UDP]) + header[10:] + segment))
+        # truncated
+        self.assertIsNone(parse_reply(header + segment[:10]))
+        self.assertIsNone(parse_reply(header[:10]))
+
+
+@unittest.skipUnless(syn_available(), 'raw sockets require root or CAP_NET_RAW')
+class SynEngineTest(ListenerTestCase):
+    def test_run(self):
+        engine = SynEngine(max_in_flight=10, timeout=2, batch_size=4)
+        jobs = [('127.0.0.1', self.open_port)] + [('127.0.0.1', port) for port in range(1, 21)]
+        result = {port: status for _, port, status, _ in engine.run(jobs)}
+        self.assertEqual(result, dict((port, 'OPEN' if port == self.open_port else 'CLOSE') for _, port in jobs))
+
+    def test_run_duplicates(self):
+        engine = SynEngine(max_in_flight=10, timeout=2)
+        jobs = [('127.0.0.1', self.open_port), ('127.0.0.1', 1), ('127.0.0.1', self.open_port)]
+        result = sorted((port, status) for _, port, status, _ in engine.run(jobs))
+        self.assertEqual(result, sorted([(self.open_port, 'OPEN'), (1, 'CLOSE'), (self.open_port, 'OPEN')]))
+
+    def test_run_send_error(self):
+        engine = SynEngine(max_in_flight=1, timeout=2)
+        # sending to the broadcast address is not permitted
+        jobs = [('255.255.255.255', 80), ('127.0.0.1', self.open_port)]
+        result = [(ip, status) for ip, _, status, _ in engine.run(jobs)]
+        self.assertEqual(result, [('255.255.255.255', 'CLOSE'), ('127.0.0.1', 'OPEN')])
+
+    @patch('pyportscanner.pyscanner.read_input', autospec=True)
+    def test_scan(self, mock_read_input):
+        mock_read_input.return_value = {}
+        scanner = pyscanner.PortScanner([self.open_port, 1, 2], 10, 2, engine='syn')
+        self.assertEqual(scanner.engine, 'syn')
+        self.assertEqual(scanner.scan('127.0.0.1'), {self.open_port: 'OPEN', 1: 'CLOSE', 2: 'CLOSE'})
+
+
+@patch('pyportscanner.pyscanner.read_input', autospec=True)
+class FallbackTest(unittest.TestCase):
+    @patch('pyportscanner.pyscanner.syn_available', autospec=True)
+    def test_fallback(self, mock_syn_available, mock_read_input):
+        mock_read_input.return_value = {}
+        mock_syn_available.return_value = False
+        scanner = pyscanner.PortScanner([80], 10, 2, engine='syn')
+        self.assertEqual(scanner.engine, 'thread')
+
+    @patch('pyportscanner.synscan.socket.socket', autospec=True)
+    def test_syn_unavailable(self, mock_socket, mock_read_input):
+        mock_socket.side_effect = PermissionError
+        self.assertFalse(syn_available())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import socket
+import threading
+import unittest
+
+from os import sys, path
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+from pyportscanner.pyscanner import PortScanner
+from pyportscanner.timing import AdaptiveTiming, RttEstimator
+
+
+class RttEstimatorTest(unittest.TestCase):
+    def test_initial_timeout(self):
+        estimator = RttEstimator(1.0, 0.1, 10.0)
+        self.assertEqual(estimator.timeout(), 1.0)
+
+    def test_first_sample(self):
+        estimator = RttEstimator(1.0, 0.01, 10.0)
+        estimator.observe(0.2)
+        self.assertAlmostEqual(estimator.srtt, 0.2)
+        self.assertAlmostEqual(estimator.rttvar, 0.1)
+        self.assertAlmostEqual(estimator.timeout(), 0.6)
+
+    def test_converges(self):
+        estimator = RttEstimator(1.0, 0.01, 10.0)
+        for _ in range(100):
+            estimator.observe(0.05)
+        self.assertAlmostEqual(estimator.srtt, 0.05)
+        self.assertLess(estimator.timeout(), 0.06)
+
+    def test_bounds(self):
+        estimator = RttEstimator(1.0, 0.1, 2.0)
+        estimator.observe(0.001)
+        self.assertEqual(estimator.timeout(), 0.1)
+        estimator.observe(30)
+        self.assertEqual(estimator.timeout(), 2.0)
+
+
+class AdaptiveTimingTest(unittest.TestCase):
+    def test_per_host(self):
+        timing = AdaptiveTiming(initial_timeout=1.0, min_timeout=0.01)
+        timing.observe('10.0.0.1', 0.02)
+        self.assertAlmostEqual(timing.timeout_for('10.0.0.1'), 0.06)
+        self.assertEqual(timing.timeout_for('10.0.0.2'), 1.0)
+        self.assertIsNone(timing.estimator('10.0.0.2'))
+
+    def test_invalid_bounds(self):
+        with self.assertRaises(ValueError):
+            AdaptiveTiming(min_timeout=0)
+        with self.assertRaises(ValueError):
+            AdaptiveTiming(min_timeout=5, max_timeout=1)
+
+    def test_scanner_timing(self):
+        scanner = PortScanner([80], timeout=2, timing='adaptive')
+        self.assertIsInstance(scanner.timing, AdaptiveTiming)
+        self.assertEqual(scanner.timing.max_timeout, 2)
+        scanner = PortScanner([80], timeout=0.05, timing='adaptive')
+        self.assertEqual(scanner.timing.min_timeout, 0.05)
+        self.assertEqual(scanner.timing.max_timeout, 0.05)
+        with self.assertRaises(ValueError):
+            PortScanner([80], timing='fast')
+
+    def test_scan_observes(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.bind(('127.0.0.1', 0))
+        server.listen(16)
+        port = server.getsockname()[1]
+        stop = threading.Event()
+
+        def accept():
+            server.settimeout(0.1)
+            while not stop.is_set():
+                try:
+                    server.accept()[0].close()
+                except socket.timeout:
+                    pass
+
+        thread = threading.Thread(target=accept)
+        thread.start()
+        try:
+            for engine in ('thread', 'selector'):
+                timing = AdaptiveTiming()
+                scanner = PortScanner([port], timeout=1, engine=engine, timing=timing)
+                self.assertEqual(scanner.scan('127.0.0.1')[port], 'OPEN')
+                self.assertIsNotNone(timing.estimator('127.0.0.1'))
+                self.assertLess(timing.timeout_for('127.0.0.1'), 1.0)
+        finally:
+            stop.set()
+            thread.join()
+            server.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
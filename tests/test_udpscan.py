@@ -0,0 +1,101 @@
+import errno
+import socket
+import threading
+import unittest
+from unittest.mock import patch
+
+from os import sys, path
+sys.path.append(path.dirname(path.dirname(path.abspath(__file__))))
+
+from pyportscanner import pyscanner
+from pyportscanner.probe import ProbeContext
+from pyportscanner.udpscan import UDP_PAYLOADS, UdpEngine, payload_for
+
+
+class UdpEngineTest(unittest.TestCase):
+    def setUp(self):
+        # a service answering every datagram, and one never answering
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.open_port = self.server.getsockname()[1]
+        self.silent = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.silent.bind(('127.0.0.1', 0))
+        self.silent_port = self.silent.getsockname()[1]
+        self.received = []
+        self.thread = threading.Thread(target=self._serve)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.sendto(b'', self.server.getsockname())
+        self.thread.join()
+        self.server.close()
+        self.silent.close()
+
+    def _serve(self):
+        while True:
+            data, address = self.server.recvfrom(65535)
+            if address == self.server.getsockname():
+                return
+            self.received.append(data)
+            self.server.sendto(b'pong', address)
+
+    def test_run(self):
+        engine = UdpEngine(max_in_flight=10, timeout=2, batch_size=4)
+        jobs = [('127.0.0.1', self.open_port)] + [('127.0.0.1', port) for port in range(1, 21)]
+        result = {port: status for _, port, status, _ in engine.run(jobs, ProbeContext('hello'))}
+        self.assertEqual(result, dict((port, 'OPEN' if port == self.open_port else 'CLOSE') for _, port in jobs))
+        self.assertEqual(self.received, [b'hello'])
+
+    def test_retransmissions(self):
+        engine = UdpEngine(max_in_flight=10, timeout=0.05, retransmissions=2)
+        result = list(engine.run([('127.0.0.1', self.silent_port)], ProbeContext('hello')))
+        self.assertEqual([status for _, _, status, _ in result], ['FILTERED'])
+        self.silent.setblocking(False)
+        datagrams = []
+        while True:
+            try:
+                datagrams.append(self.silent.recv(100))
+            except BlockingIOError:
+                break
+        self.assertEqual(datagrams, [b'hello'] * 3)
+
+    def test_retransmission_error(self):
+        engine = UdpEngine(max_in_flight=10, timeout=0.05, retransmissions=2)
+        # the port unreachable message of the first datagram is reported by the next send
+        with patch.object(UdpEngine, '_UdpEngine__send', side_effect=[None, 'CLOSE']) as mock_send:
+            result = list(engine.run([('127.0.0.1', self.silent_port)], ProbeContext('hello')))
+        self.assertEqual([status for _, _, status, _ in result], ['CLOSE'])
+        self.assertEqual(mock_send.call_count, 2)
+
+    def test_status(self):
+        status = UdpEngine._UdpEngine__status
+        self.assertEqual(status(errno.ECONNREFUSED), 'CLOSE')
+        # any other ICMP error is a filtered probe, and does not stop the sweep
+        for error in (errno.EHOSTUNREACH, errno.EHOSTDOWN, errno.ENOPROTOOPT, errno.EMSGSIZE):
+            self.assertEqual(status(error), 'FILTERED')
+
+    def test_payload_for(self):
+        self.assertEqual(payload_for(53), UDP_PAYLOADS[53])
+        self.assertEqual(len(payload_for(123)), 48)
+        self.assertEqual(payload_for(40000, b'hello'), b'hello')
+
+    @patch('pyportscanner.pyscanner.read_input', autospec=True)
+    def test_scan(self, mock_read_input):
+        mock_read_input.return_value = {}
+        scanner = pyscanner.PortScanner([self.open_port, 1, 2], 10, 2, protocol='udp')
+        self.assertEqual(scanner.scan('127.0.0.1'), {self.open_port: 'OPEN', 1: 'CLOSE', 2: 'CLOSE'})
+
+
+@patch('pyportscanner.pyscanner.read_input', autospec=True)
+class ProtocolTest(unittest.TestCase):
+    def test_protocol(self, mock_read_input):
+        mock_read_input.return_value = {}
+        self.assertEqual(pyscanner.PortScanner([53]).protocol, 'tcp')
+        self.assertEqual(pyscanner.PortScanner('proto:udp 53,161').protocol, 'udp')
+        self.assertEqual(pyscanner.PortScanner('proto:udp 53', protocol='tcp').protocol, 'tcp')
+        with self.assertRaises(ValueError):
+            pyscanner.PortScanner([53], protocol='icmp')
+
+
+if __name__ == '__main__':
+    unittest.main()